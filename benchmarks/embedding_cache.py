@@ -0,0 +1,123 @@
+"""
+Efecto de la caché de embeddings en ingesta y consultas, contra el stub.
+
+Con ``NumpyStore`` en un directorio temporal mide:
+- ingesta en frío de ``--chunks`` chunks y reingesta de los mismos textos
+  en un store vacío (aciertos en memoria);
+- la misma reingesta tras "reiniciar" (LRU vacío, aciertos en SQLite);
+- p50 de ``similarity_search`` con ``--queries`` consultas distintas, la
+  primera vez (fallos) y repetidas (sin llamada de embeddings).
+
+Uso:
+    python -m benchmarks.embedding_cache --chunks 500 --queries 50
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.load import RESULTS_DIR, Server, _free_port
+
+
+def _documents(count: int):
+    from langchain_core.documents import Document
+
+    return [
+        Document(page_content=f"Chunk {i}: ventas, márgenes y KPIs del trimestre. " * 12, metadata={"source": "a.pdf"})
+        for i in range(count)
+    ]
+
+
+def _timed(function) -> float:
+    started = time.perf_counter()
+    function()
+    return round(time.perf_counter() - started, 3)
+
+
+def _query_p50_ms(store, queries) -> float:
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        store.similarity_search(query, k=5)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(latencies), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latencia por llamada de embeddings")
+    parser.add_argument("--name", default=None)
+    args = parser.parse_args()
+
+    stub = Server("benchmarks.stubs:app", _free_port(), {
+        "STUB_LATENCY_MS": str(args.latency_ms),
+        "STUB_EMBEDDING_ITEM_MS": "0.2",
+    })
+    stub.start("/docs")
+    directory = Path(tempfile.mkdtemp(prefix="embedding-cache-bench-"))
+    # La configuración se lee al importar src
+    os.environ.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_API_BASE": f"{stub.url}/v1",
+        "LOG_LEVEL": "ERROR",
+    })
+    from langchain_openai import OpenAIEmbeddings
+
+    from src.agents.researcher.numpy_store import NumpyStore
+    from src.core.embeddings import CachedEmbeddings
+
+    def cached(max_size: int = 100000) -> CachedEmbeddings:
+        # Sin tokenizar con tiktoken: el stub acepta texto
+        embeddings = OpenAIEmbeddings(check_embedding_ctx_length=False)
+        return CachedEmbeddings(embeddings, embeddings.model, max_size=max_size, path=str(directory / "cache.sqlite"))
+
+    documents = _documents(args.chunks)
+    queries = [f"¿Cómo evolucionó el KPI {i} este trimestre?" for i in range(args.queries)]
+    results = {}
+    try:
+        embeddings = cached()
+        store = NumpyStore(str(directory / "a"), embeddings=embeddings)
+        results["ingest_cold_seconds"] = _timed(lambda: store.add_documents(documents))
+        results["query_cold_p50_ms"] = _query_p50_ms(store, queries)
+        results["query_repeated_p50_ms"] = _query_p50_ms(store, queries)
+        results["reingest_memory_seconds"] = _timed(
+            lambda: NumpyStore(str(directory / "b"), embeddings=embeddings).add_documents(documents)
+        )
+        results["stats"] = embeddings.stats()
+
+        # Otro proceso o un reinicio: LRU vacío, mismos vectores en SQLite
+        restarted = cached()
+        results["reingest_disk_seconds"] = _timed(
+            lambda: NumpyStore(str(directory / "c"), embeddings=restarted).add_documents(documents)
+        )
+        results["query_disk_p50_ms"] = _query_p50_ms(NumpyStore(str(directory / "a"), embeddings=restarted), queries)
+        results["stats_after_restart"] = restarted.stats()
+    finally:
+        stub.stop()
+
+    print(
+        f"ingesta   fría {results['ingest_cold_seconds']:>7} s  memoria {results['reingest_memory_seconds']:>7} s  "
+        f"disco {results['reingest_disk_seconds']:>7} s"
+    )
+    print(
+        f"consulta  fría {results['query_cold_p50_ms']:>7} ms repetida {results['query_repeated_p50_ms']:>6} ms  "
+        f"disco {results['query_disk_p50_ms']:>7} ms"
+    )
+    print(f"hit rate {results['stats']['hit_rate']}  tras reinicio {results['stats_after_restart']['hit_rate']}")
+
+    report = {"timestamp": datetime.now(timezone.utc).isoformat(), "args": vars(args), "results": results}
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"{args.name or datetime.now().strftime('embedding-cache-%Y%m%d-%H%M%S')}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Tiempo de ingesta de ``PineconeStore.add_documents`` contra el stub.
+
+Compara la ingesta anterior (un ``embed_query`` por chunk y un único
+upsert) con la actual (``embed_documents`` por lotes y upserts acotados en
+paralelo). El stub sirve los embeddings y el plano de datos del índice
+(``PINECONE_HOST``), con la latencia de un proveedor remoto.
+
+Uso:
+    python -m benchmarks.ingestion --chunks 500
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from benchmarks.load import RESULTS_DIR, Server, _free_port
+
+
+def _legacy_add_documents(store, documents) -> None:
+    """Ingesta previa: un embedding por chunk e IDs por posición."""
+    vectors = []
+    for i, doc in enumerate(documents):
+        embedding = store.embeddings.embed_query(doc.page_content)
+        vectors.append({"id": f"doc_{i}", "values": embedding, "metadata": {**doc.metadata, "text": doc.page_content}})
+    store.index.upsert(vectors=vectors)
+
+
+def _documents(count: int, source: str):
+    from langchain_core.documents import Document
+
+    return [
+        Document(page_content=f"Chunk {i} de {source}: ventas, márgenes y KPIs del trimestre. " * 12, metadata={"source": source})
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latencia por llamada de embeddings")
+    parser.add_argument("--upsert-latency-ms", type=float, default=30)
+    parser.add_argument("--name", default=None)
+    args = parser.parse_args()
+
+    stub = Server("benchmarks.stubs:app", _free_port(), {
+        "STUB_LATENCY_MS": str(args.latency_ms),
+        "STUB_EMBEDDING_ITEM_MS": "0.2",
+        "STUB_UPSERT_LATENCY_MS": str(args.upsert_latency_ms),
+    })
+    stub.start("/docs")
+    # La configuración se lee al importar src
+    os.environ.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_API_BASE": f"{stub.url}/v1",
+        "PINECONE_API_KEY": "bench",
+        "PINECONE_HOST": stub.url,
+        "LOG_LEVEL": "ERROR",
+        # Sin caché de embeddings: ambas variantes deben pedir todos los vectores
+        "EMBEDDING_CACHE_SIZE": "0",
+        "EMBEDDING_CACHE_PATH": "",
+    })
+    from src.agents.researcher.pinecone_store import PineconeStore
+
+    results = {}
+    try:
+        store = PineconeStore()
+        # Sin tokenizar con tiktoken: el stub acepta texto
+        store.embeddings.embeddings.check_embedding_ctx_length = False
+        variants = {
+            "legacy": lambda docs: _legacy_add_documents(store, docs),
+            "batched": store.add_documents,
+        }
+        for name, ingest in variants.items():
+            store.delete_index()
+            first, second = _documents(args.chunks, "a.pdf"), _documents(args.chunks, "b.pdf")
+            started = time.perf_counter()
+            ingest(first)
+            elapsed = time.perf_counter() - started
+            ingest(second)
+            stats = store.index.describe_index_stats()
+            results[name] = {
+                "seconds": round(elapsed, 3),
+                "chunks_per_second": round(args.chunks / elapsed, 1),
+                # Dos subidas distintas: con IDs por posición, la segunda pisa la primera
+                "vectors_after_two_uploads": stats["total_vector_count"],
+            }
+    finally:
+        stub.stop()
+
+    for name, summary in results.items():
+        print(
+            f"{name:<8} {summary['seconds']:>7} s  {summary['chunks_per_second']:>8} chunks/s  "
+            f"vectores tras 2 subidas: {summary['vectors_after_two_uploads']}"
+        )
+    print(f"speedup x{results['legacy']['seconds'] / results['batched']['seconds']:.1f}")
+
+    report = {"timestamp": datetime.now(timezone.utc).isoformat(), "args": vars(args), "results": results}
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"{args.name or datetime.now().strftime('ingestion-%Y%m%d-%H%M%S')}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
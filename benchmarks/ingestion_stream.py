@@ -0,0 +1,101 @@
+"""
+Memoria de la carga de documentos: todo de una vez frente a página a página.
+
+Genera un texto plano de ``--mb`` MB y mide, para la carga anterior
+(``load_and_split``: el archivo y todos sus chunks en memoria) y la actual
+(``iter_chunks`` en lotes de ``EMBEDDING_BATCH_SIZE``, como los recibe la
+ingesta), el pico de memoria de Python (tracemalloc), el tiempo total y el
+tiempo hasta tener el primer lote listo para embeber.
+
+Uso:
+    python -m benchmarks.ingestion_stream --mb 50
+"""
+
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.load import RESULTS_DIR
+
+
+def _write_text(path: Path, megabytes: float) -> None:
+    paragraph = "Informe trimestral: ventas, márgenes y KPIs por región y producto. " * 8
+    with open(path, "w", encoding="utf-8") as handle:
+        written, i = 0, 0
+        while written < megabytes * 1024 * 1024:
+            block = f"Sección {i}. {paragraph}\n\n"
+            handle.write(block)
+            written += len(block.encode())
+            i += 1
+
+
+def _measure(batches) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    first, chunks = None, 0
+    for batch in batches:
+        first = first or time.perf_counter() - started
+        chunks += len(batch)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": round(elapsed, 3),
+        "first_batch_seconds": round(first or 0, 3),
+        "peak_mb": round(peak / 1024 / 1024, 1),
+        "chunks": chunks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=50, help="Tamaño del documento generado")
+    parser.add_argument("--name", default=None)
+    args = parser.parse_args()
+
+    from src.api.services.vector_service import iter_chunks, load_and_split
+    from src.core.config import settings
+
+    size = settings.EMBEDDING_BATCH_SIZE
+    path = Path(tempfile.mkdtemp(prefix="ingestion-stream-bench-")) / "documento.txt"
+    _write_text(path, args.mb)
+
+    def load_all():
+        chunks = load_and_split(str(path), path.name)
+        for start in range(0, len(chunks), size):
+            yield chunks[start:start + size]
+
+    def streamed():
+        batch = []
+        for chunk in iter_chunks(str(path), path.name):
+            batch.append(chunk)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    try:
+        results = {"load_all": _measure(load_all()), "streamed": _measure(streamed())}
+    finally:
+        path.unlink()
+
+    for name, summary in results.items():
+        print(
+            f"{name:<9} {summary['seconds']:>7} s  primer lote {summary['first_batch_seconds']:>7} s  "
+            f"pico {summary['peak_mb']:>7} MB  chunks {summary['chunks']}"
+        )
+
+    report = {"timestamp": datetime.now(timezone.utc).isoformat(), "args": vars(args), "results": results}
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"{args.name or datetime.now().strftime('ingestion-stream-%Y%m%d-%H%M%S')}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
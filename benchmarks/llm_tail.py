@@ -0,0 +1,105 @@
+"""
+Latencia de cola y errores de /chat con la capa de resiliencia de LLMs.
+
+Escenarios (el stub inyecta la degradación):
+- ``tail``: una fracción de llamadas al LLM tarda ``--slow-ms`` de más;
+  compara sin hedging frente a ``LLM_HEDGE_DELAY_MS=--hedge-delay-ms``.
+- ``outage``: el modelo principal responde 503 siempre; compara sin
+  fallback frente a ``LLM_FALLBACK_MODEL`` (el circuit breaker deja de
+  llamar al principal tras ``LLM_BREAKER_FAILURES`` fallos).
+
+Uso:
+    python -m benchmarks.llm_tail --requests 200 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.load import RESULTS_DIR, Server, _free_port, bench_chat
+
+
+def _scenarios(args) -> dict:
+    return {
+        "tail": {
+            "stub": {"STUB_SLOW_RATIO": str(args.slow_ratio), "STUB_SLOW_MS": str(args.slow_ms)},
+            "variants": {
+                "baseline": {},
+                "hedged": {"LLM_HEDGE_DELAY_MS": str(args.hedge_delay_ms)},
+            },
+        },
+        "outage": {
+            "stub": {"STUB_ERROR_RATIO": "1", "STUB_ERROR_MODELS": "stub-model"},
+            "variants": {
+                "no_fallback": {"LLM_MAX_RETRIES": "0"},
+                "fallback": {"LLM_MAX_RETRIES": "0", "LLM_FALLBACK_MODEL": "stub-fallback"},
+            },
+        },
+    }
+
+
+def _run_variant(stub: Server, env: dict, requests: int, concurrency: int) -> dict:
+    app = Server("src.api.app:app", _free_port(), {
+        "OPENAI_API_KEY": "bench",
+        "PINECONE_API_KEY": "bench",
+        "OPENAI_API_BASE": f"{stub.url}/v1",
+        "OPENAI_MODEL_NAME": "stub-model",
+        "SEARCH_API_URL": f"{stub.url}/search",
+        "LOG_LEVEL": "ERROR",
+        **env,
+    })
+    app.start("/health")
+    try:
+        # Una petición previa para no medir la compilación de los grafos
+        httpx.post(f"{app.url}/chat", json={"message": "hola", "thread_id": "warmup"}, timeout=120)
+        return asyncio.run(bench_chat(app.url, requests, concurrency))
+    finally:
+        app.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=["tail", "outage"])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--slow-ratio", type=float, default=0.02, help="Fracción de llamadas lentas")
+    parser.add_argument("--slow-ms", type=float, default=2000)
+    parser.add_argument("--hedge-delay-ms", type=float, default=300)
+    parser.add_argument("--name", default=None)
+    args = parser.parse_args()
+
+    results = {}
+    for name, scenario in _scenarios(args).items():
+        if name not in args.scenarios:
+            continue
+        stub = Server("benchmarks.stubs:app", _free_port(), {
+            "STUB_LATENCY_MS": "50",
+            "STUB_TOKEN_DELAY_MS": "0",
+            "STUB_SEARCH_LATENCY_MS": "0",
+            **scenario["stub"],
+        })
+        stub.start("/docs")
+        try:
+            for variant, env in scenario["variants"].items():
+                results[f"{name}/{variant}"] = _run_variant(stub, env, args.requests, args.concurrency)
+        finally:
+            stub.stop()
+
+    for key, summary in results.items():
+        print(
+            f"{key:<20} p50 {summary['p50_ms']} ms  p95 {summary['p95_ms']} ms  "
+            f"p99 {summary['p99_ms']} ms  errores {summary['error_rate']:.1%}"
+        )
+
+    report = {"timestamp": datetime.now(timezone.utc).isoformat(), "args": vars(args), "results": results}
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"{args.name or datetime.now().strftime('llm-tail-%Y%m%d-%H%M%S')}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
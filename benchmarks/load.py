@@ -0,0 +1,381 @@
+"""
+Benchmark de carga HTTP/WebSocket de la API contra stubs locales.
+
+Arranca ``benchmarks.stubs`` (LLM OpenAI-compatible + búsqueda) y la app con
+uvicorn en subprocesos, ejecuta los escenarios con la concurrencia indicada
+y guarda un JSON con throughput, latencias p50/p95/p99, tiempo hasta el
+primer evento SSE y crecimiento de RSS de la app.
+
+Escenarios: chat, chat_stream, upload_frame, websocket (broadcaster +
+viewers en /ws/broadcast y /ws/viewer).
+
+Uso:
+    python -m benchmarks.load --concurrency 20 --requests 200
+    python -m benchmarks.load --scenarios chat_stream --compare benchmarks/results/base.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import struct
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import websockets
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+SCENARIOS = ["chat", "chat_stream", "upload_frame", "websocket"]
+
+# Métricas donde un valor mayor es peor (el resto: mayor es mejor)
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "ttfe_p50_ms", "ttfe_p95_ms", "ttfe_p99_ms", "error_rate")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summary(latencies: List[float], errors: int, elapsed: float, prefix: str = "") -> dict:
+    total = len(latencies) + errors
+    ms = [value * 1000 for value in latencies]
+    return {
+        f"{prefix}p50_ms": _round(_percentile(ms, 50)),
+        f"{prefix}p95_ms": _round(_percentile(ms, 95)),
+        f"{prefix}p99_ms": _round(_percentile(ms, 99)),
+        **({} if prefix else {
+            "requests": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0,
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        }),
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
+
+
+def _rss_kb(pid: int) -> Optional[int]:
+    """RSS del proceso en KB (Linux: /proc)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class Server:
+    """Proceso uvicorn gestionado por el benchmark."""
+
+    def __init__(self, app: str, port: int, env: Dict[str, str]):
+        self.app = app
+        self.port = port
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, health_path: str, timeout: float = 60) -> float:
+        """Arranca el servidor y devuelve el tiempo hasta responder ``health_path``."""
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", self.app, "--port", str(self.port), "--log-level", "warning"],
+            cwd=ROOT,
+            env={**os.environ, **self.env},
+        )
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.app} terminó al arrancar (código {self.process.returncode})")
+            try:
+                if httpx.get(self.url + health_path, timeout=1).status_code < 500:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+        raise TimeoutError(f"{self.app} no respondió en {timeout}s")
+
+    def stop(self) -> None:
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+async def _run_pool(total: int, concurrency: int, job: Callable[[int], "asyncio.Future"]) -> float:
+    """Ejecuta ``total`` trabajos con ``concurrency`` en vuelo; retorna el tiempo total."""
+    counter = iter(range(total))
+
+    async def worker():
+        for index in counter:
+            await job(index)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+async def bench_chat(base_url: str, total: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        async def job(index: int):
+            nonlocal errors
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/chat",
+                    json={"message": f"Analiza las ventas del mes {index}", "thread_id": f"bench-chat-{index}"},
+                    headers={"X-Client-Id": f"bench-{index % concurrency}"},
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+            except httpx.HTTPError:
+                errors += 1
+
+        elapsed = await _run_pool(total, concurrency, job)
+    return _summary(latencies, errors, elapsed)
+
+
+async def bench_chat_stream(base_url: str, total: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    first_event: List[float] = []
+    total_bytes = 0
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        async def job(index: int):
+            nonlocal errors, total_bytes
+            started = time.perf_counter()
+            try:
+                async with client.stream(
+                    "POST",
+                    "/chat/stream",
+                    json={"message": f"Analiza las ventas del mes {index}", "thread_id": f"bench-stream-{index}"},
+                    headers={"X-Client-Id": f"bench-{index % concurrency}"},
+                ) as response:
+                    response.raise_for_status()
+                    seen_first = False
+                    async for chunk in response.aiter_raw():
+                        if not seen_first and chunk:
+                            first_event.append(time.perf_counter() - started)
+                            seen_first = True
+                        total_bytes += len(chunk)
+                latencies.append(time.perf_counter() - started)
+            except httpx.HTTPError:
+                errors += 1
+
+        elapsed = await _run_pool(total, concurrency, job)
+    return {
+        **_summary(latencies, errors, elapsed),
+        **_summary(first_event, 0, elapsed, prefix="ttfe_"),
+        "bytes_per_stream": round(total_bytes / max(1, len(latencies))),
+    }
+
+
+def _frame(size: int) -> bytes:
+    """Frame falso con la marca de tiempo de envío en los primeros 8 bytes."""
+    return struct.pack("!d", time.time()) + b"\xff" * max(0, size - 8)
+
+
+async def bench_upload_frame(base_url: str, total: int, concurrency: int, frame_size: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        async def job(index: int):
+            nonlocal errors
+            started = time.perf_counter()
+            try:
+                response = await client.post("/api/upload_frame", content=_frame(frame_size))
+                response.raise_for_status()
+                if response.json().get("status") != "ok":
+                    raise httpx.HTTPError("upload rejected")
+                latencies.append(time.perf_counter() - started)
+            except httpx.HTTPError:
+                errors += 1
+
+        elapsed = await _run_pool(total, concurrency, job)
+    return _summary(latencies, errors, elapsed)
+
+
+async def bench_websocket(base_url: str, frames: int, viewers: int, fps: float, frame_size: int) -> dict:
+    """Un broadcaster emite ``frames`` a ``fps``; mide la latencia de entrega a cada viewer."""
+    ws_url = base_url.replace("http://", "ws://")
+    delivery: List[float] = []
+    received = 0
+
+    async def viewer(ready: asyncio.Event, done: asyncio.Event):
+        nonlocal received
+        async with websockets.connect(ws_url + "/ws/viewer", max_size=None) as socket_:
+            ready.set()
+            while not done.is_set():
+                try:
+                    message = await asyncio.wait_for(socket_.recv(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                if isinstance(message, bytes) and len(message) >= 8:
+                    delivery.append(time.time() - struct.unpack("!d", message[:8])[0])
+                    received += 1
+
+    done = asyncio.Event()
+    ready_events = [asyncio.Event() for _ in range(viewers)]
+    viewer_tasks = [asyncio.create_task(viewer(ready, done)) for ready in ready_events]
+    await asyncio.gather(*(event.wait() for event in ready_events))
+
+    started = time.perf_counter()
+    async with websockets.connect(ws_url + "/ws/broadcast", max_size=None) as broadcaster:
+        for _ in range(frames):
+            await broadcaster.send(_frame(frame_size))
+            await asyncio.sleep(1 / fps)
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.5)
+    done.set()
+    await asyncio.gather(*viewer_tasks, return_exceptions=True)
+
+    expected = frames * viewers
+    return {
+        **_summary(delivery, max(0, expected - received), elapsed),
+        "frames_sent": frames,
+        "viewers": viewers,
+        "delivered_ratio": round(received / expected, 4) if expected else None,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Lista de regresiones de ``current`` respecto a ``baseline``."""
+    regressions = []
+    for scenario, metrics in current.get("scenarios", {}).items():
+        base_metrics = baseline.get("scenarios", {}).get(scenario)
+        if not base_metrics:
+            continue
+        for name, value in metrics.items():
+            base_value = base_metrics.get(name)
+            if not isinstance(value, (int, float)) or not isinstance(base_value, (int, float)) or not base_value:
+                continue
+            if name in LOWER_IS_BETTER or name.endswith("_ms") or name.startswith("rss"):
+                worse = value > base_value * (1 + tolerance)
+            elif name.endswith("_rps") or name == "delivered_ratio":
+                worse = value < base_value * (1 - tolerance)
+            else:
+                continue
+            if worse:
+                regressions.append(f"{scenario}.{name}: {base_value} -> {value}")
+    return regressions
+
+
+async def run_scenarios(args, app_server: Server) -> Dict[str, dict]:
+    results: Dict[str, dict] = {}
+    for scenario in args.scenarios:
+        rss_before = _rss_kb(app_server.process.pid)
+        if scenario == "chat":
+            result = await bench_chat(app_server.url, args.requests, args.concurrency)
+        elif scenario == "chat_stream":
+            result = await bench_chat_stream(app_server.url, args.requests, args.concurrency)
+        elif scenario == "upload_frame":
+            result = await bench_upload_frame(app_server.url, args.frames, args.concurrency, args.frame_size)
+        else:
+            result = await bench_websocket(app_server.url, args.frames, args.viewers, args.fps, args.frame_size)
+        rss_after = _rss_kb(app_server.process.pid)
+        if rss_before and rss_after:
+            result["rss_before_kb"] = rss_before
+            result["rss_growth_kb"] = rss_after - rss_before
+        results[scenario] = result
+        print(f"[{scenario}] {json.dumps(result)}", flush=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por escenario de chat")
+    parser.add_argument("--frames", type=int, default=500, help="Frames por escenario de video")
+    parser.add_argument("--frame-size", type=int, default=20_000, help="Bytes por frame")
+    parser.add_argument("--viewers", type=int, default=10)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--token-delay-ms", type=float, default=5)
+    parser.add_argument("--research-ratio", type=float, default=0.2)
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Variables extra para la app (repetible)")
+    parser.add_argument("--name", default=None, help="Nombre del fichero de resultados")
+    parser.add_argument("--compare", type=Path, default=None, help="JSON de referencia")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Margen de regresión (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    stub = Server("benchmarks.stubs:app", _free_port(), {
+        "STUB_LATENCY_MS": str(args.llm_latency_ms),
+        "STUB_TOKEN_DELAY_MS": str(args.token_delay_ms),
+        "STUB_RESEARCH_RATIO": str(args.research_ratio),
+    })
+    app_env = {
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_API_BASE": f"{stub.url}/v1",
+        "OPENAI_MODEL_NAME": "stub-model",
+        "OPENROUTER_API_KEY": "bench",
+        "OPENROUTER_BASE_URL": f"{stub.url}/v1",
+        "PINECONE_API_KEY": "bench",
+        "SEARCH_API_URL": f"{stub.url}/search",
+        "LOG_LEVEL": "WARNING",
+    }
+    app_env.update(item.split("=", 1) for item in args.app_env)
+    app_server = Server("src.api.app:app", _free_port(), app_env)
+
+    try:
+        stub.start("/docs")
+        startup_seconds = app_server.start("/health")
+        scenarios = asyncio.run(run_scenarios(args, app_server))
+    finally:
+        app_server.stop()
+        stub.stop()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {key: (str(value) if isinstance(value, Path) else value) for key, value in vars(args).items()},
+        "startup_to_health_seconds": round(startup_seconds, 3),
+        "scenarios": scenarios,
+    }
+    RESULTS_DIR.mkdir(exist_ok=True)
+    name = args.name or datetime.now().strftime("load-%Y%m%d-%H%M%S")
+    output = RESULTS_DIR / f"{name}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Resultados guardados en {output}")
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"[REGRESIÓN] {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
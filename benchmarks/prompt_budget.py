@@ -0,0 +1,154 @@
+"""
+Regresiones de tamaño de prompt: tokens de entrada por nodo en escenarios fijos.
+
+Ejecuta cada escenario contra el stub de LLM (su uso es determinista:
+``len(json(messages + tools + response_format)) // 4``, así que añadir una
+tool con ``bind_tools`` también cuenta) y compara los tokens de prompt de cada nodo
+con ``benchmarks/prompt_baselines.json``. Termina con código 1 si alguno
+supera su baseline en más de ``--tolerance``; ``--update`` regraba los
+baselines tras un cambio intencionado de prompts.
+
+Escenarios:
+- ``greeting``, ``analysis``: un turno que enruta a business_intelligence.
+- ``research``: un turno que pasa por el researcher (modo agent y direct).
+- ``follow_up``: segundo turno del mismo hilo (historial incluido).
+- ``video``: ``analyze_video`` + ``decide_action`` con frames fijos.
+
+Uso:
+    python -m benchmarks.prompt_budget
+    python -m benchmarks.prompt_budget --update
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import httpx
+
+from benchmarks.load import Server, _free_port
+
+BASELINES = Path(__file__).resolve().parent / "prompt_baselines.json"
+
+# Mensajes que el stub enruta a business_intelligence y al researcher (STUB_RESEARCH_RATIO por defecto)
+CHAT_SCENARIOS = {
+    "greeting": ["hola"],
+    "analysis": ["Analiza el rendimiento del dashboard de ventas del último trimestre"],
+    "research": ["consulta de mercado 6"],
+    "follow_up": ["hola", "¿Qué KPIs recomiendas para el equipo comercial?"],
+}
+RESEARCHER_MODES = ["agent", "direct"]
+VIDEO_ANALYSIS = "Dos personas caminan por el pasillo con normalidad."
+
+
+def _chat_usage(app: Server, messages: list, thread_id: str) -> dict:
+    """Uso de tokens del ÚLTIMO turno de la conversación."""
+    usage = {}
+    for message in messages:
+        response = httpx.post(f"{app.url}/chat", json={"message": message, "thread_id": thread_id}, timeout=120)
+        response.raise_for_status()
+        usage = response.json()["usage"]
+    return usage
+
+
+def _run_chat(stub: Server) -> dict:
+    results = {}
+    for mode in RESEARCHER_MODES:
+        app = Server("src.api.app:app", _free_port(), {
+            "OPENAI_API_KEY": "bench",
+            "PINECONE_API_KEY": "bench",
+            "OPENAI_API_BASE": f"{stub.url}/v1",
+            "OPENAI_MODEL_NAME": "stub-model",
+            "SEARCH_API_URL": f"{stub.url}/search",
+            "RESEARCHER_MODE": mode,
+            "LOG_LEVEL": "ERROR",
+        })
+        app.start("/health")
+        try:
+            for name, messages in CHAT_SCENARIOS.items():
+                # El modo del researcher solo cambia los escenarios que pasan por él
+                if mode != "agent" and name != "research":
+                    continue
+                key = name if mode == "agent" else f"{name}_{mode}"
+                results[key] = _chat_usage(app, messages, thread_id=f"prompt-budget-{key}")
+        finally:
+            app.stop()
+    return results
+
+
+def _run_video(stub: Server) -> dict:
+    # video_analysis lee el endpoint al importarse
+    os.environ.update({
+        "OPENROUTER_BASE_URL": f"{stub.url}/v1",
+        "OPENROUTER_API_KEY": "bench",
+        "MODEL_NAME": "stub-model",
+        "LOG_LEVEL": "ERROR",
+    })
+    from src.agents.video_analysis import analyze_video, decide_action
+    from src.core.usage import usage_scope
+
+    frames = [bytes([index]) * 512 for index in range(4)]
+    with usage_scope("video", thread_id="prompt-budget") as usage:
+        analyze_video({"frame_data": frames})
+        decide_action({"analysis": VIDEO_ANALYSIS, "previous_risk_level": 1})
+    return {"video": usage.summary()}
+
+
+def _prompt_tokens(results: dict) -> dict:
+    return {
+        scenario: {node: totals["prompt_tokens"] for node, totals in sorted(usage["by_node"].items())}
+        for scenario, usage in results.items()
+    }
+
+
+def _compare(current: dict, baselines: dict, tolerance: float) -> list:
+    """Regresiones como (escenario, nodo, baseline, actual)."""
+    regressions = []
+    for scenario, nodes in current.items():
+        for node, tokens in nodes.items():
+            baseline = baselines.get(scenario, {}).get(node)
+            if baseline is None or tokens > baseline * (1 + tolerance):
+                regressions.append((scenario, node, baseline, tokens))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Crecimiento permitido sobre el baseline")
+    parser.add_argument("--update", action="store_true", help="Regrabar los baselines con los valores actuales")
+    args = parser.parse_args()
+
+    stub = Server("benchmarks.stubs:app", _free_port(), {
+        "STUB_LATENCY_MS": "0",
+        "STUB_TOKEN_DELAY_MS": "0",
+        "STUB_SEARCH_LATENCY_MS": "0",
+    })
+    stub.start("/docs")
+    try:
+        current = _prompt_tokens({**_run_chat(stub), **_run_video(stub)})
+    finally:
+        stub.stop()
+
+    if args.update:
+        BASELINES.write_text(json.dumps(current, indent=2, ensure_ascii=False) + "\n")
+        print(f"Baselines guardados en {BASELINES}")
+        return
+
+    baselines = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+    for scenario, nodes in current.items():
+        for node, tokens in nodes.items():
+            baseline = baselines.get(scenario, {}).get(node)
+            print(f"{scenario:<18} {node:<24} {tokens:>7} tokens  (baseline {baseline})")
+
+    regressions = _compare(current, baselines, args.tolerance)
+    for scenario, node, baseline, tokens in regressions:
+        reason = "sin baseline" if baseline is None else f"{tokens} > {baseline} (+{args.tolerance:.0%})"
+        print(f"REGRESIÓN {scenario}/{node}: {reason}")
+    if regressions:
+        sys.exit(1)
+    print("Prompts dentro de los baselines")
+
+
+if __name__ == "__main__":
+    main()
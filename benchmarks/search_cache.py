@@ -0,0 +1,124 @@
+"""
+Búsquedas repetidas en ``PineconeStore`` contra el stub, con y sin
+``CachedVectorStore``.
+
+Indexa ``--chunks`` chunks y repite ``--queries`` preguntas ``--rounds``
+veces (como las preguntas frecuentes entre dos ingestas), comparando:
+- ``uncached``: cada búsqueda embebe la consulta y consulta el índice;
+- ``cached``: la primera ronda llena la caché y las siguientes son aciertos.
+
+Después añade un chunk que responde una de las preguntas y comprueba que la
+siguiente búsqueda ya lo devuelve (la escritura invalida la entrada). Sin
+caché de embeddings, para medir las llamadas reales.
+
+Uso:
+    python -m benchmarks.search_cache --queries 20 --rounds 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+
+from benchmarks.load import RESULTS_DIR, Server, _free_port
+
+
+def _documents(count: int):
+    from langchain_core.documents import Document
+
+    return [
+        Document(
+            page_content=f"Chunk {i}: ventas, márgenes y KPIs del trimestre {i % 4 + 1}. " * 6,
+            metadata={"source": f"informe-{i % 8}.pdf"},
+        )
+        for i in range(count)
+    ]
+
+
+def _timed(search, queries, rounds):
+    """Latencia de cada búsqueda (ms), ronda a ronda."""
+    timings = []
+    for _ in range(rounds):
+        for query in queries:
+            started = time.perf_counter()
+            search(query)
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latencia por llamada de embeddings")
+    parser.add_argument("--query-latency-ms", type=float, default=30, help="Latencia por consulta al índice")
+    parser.add_argument("--name", default=None)
+    args = parser.parse_args()
+
+    stub = Server("benchmarks.stubs:app", _free_port(), {
+        "STUB_LATENCY_MS": str(args.latency_ms),
+        "STUB_UPSERT_LATENCY_MS": str(args.query_latency_ms),
+    })
+    stub.start("/docs")
+    # La configuración se lee al importar src
+    os.environ.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_API_BASE": f"{stub.url}/v1",
+        "PINECONE_API_KEY": "bench",
+        "PINECONE_HOST": stub.url,
+        "LOG_LEVEL": "ERROR",
+        "EMBEDDING_CACHE_SIZE": "0",
+        "EMBEDDING_CACHE_PATH": "",
+    })
+    from langchain_core.documents import Document
+
+    from src.agents.researcher.pinecone_store import PineconeStore
+    from src.core.search_cache import CachedVectorStore
+
+    queries = [f"¿Cómo evolucionó el KPI {i} del trimestre?" for i in range(args.queries)]
+    try:
+        store = PineconeStore()
+        # Sin tokenizar con tiktoken: el stub acepta texto
+        store.embeddings.embeddings.check_embedding_ctx_length = False
+        store.delete_index()
+        store.add_documents(_documents(args.chunks))
+        # El stub refleja las escrituras al momento
+        cached = CachedVectorStore(store, max_size=args.queries, freshness=0)
+
+        uncached_ms = _timed(lambda query: store.similarity_search(query, k=args.k), queries, args.rounds)
+        cached_ms = _timed(lambda query: cached.similarity_search(query, k=args.k), queries, args.rounds)
+
+        # Un chunk idéntico a la pregunta: tras la escritura debe ser el primer resultado
+        answer = Document(page_content=queries[0], metadata={"source": "nuevo.pdf"})
+        cached.add_documents([answer])
+        fresh = cached.similarity_search(queries[0], k=args.k)[0].page_content == queries[0]
+        stats = cached.stats()
+        store.delete_index()
+    finally:
+        stub.stop()
+
+    hits = cached_ms[args.queries:]
+    results = {
+        "uncached": {"p50_ms": round(statistics.median(uncached_ms), 3)},
+        "cached_miss": {"p50_ms": round(statistics.median(cached_ms[:args.queries]), 3)},
+        "cached_hit": {"p50_ms": round(statistics.median(hits), 4) if hits else None},
+        "fresh_after_write": fresh,
+        "cache": stats,
+    }
+    for name in ("uncached", "cached_miss", "cached_hit"):
+        print(f"{name:<12} p50 {results[name]['p50_ms']:>10} ms")
+    print(f"resultado actualizado tras la escritura: {fresh}  caché: {stats}")
+
+    report = {"timestamp": datetime.now(timezone.utc).isoformat(), "args": vars(args), "results": results}
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"{args.name or datetime.now().strftime('search-cache-%Y%m%d-%H%M%S')}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
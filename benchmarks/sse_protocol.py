@@ -0,0 +1,122 @@
+"""
+Bytes por conversación en /chat/stream según protocolo y compresión.
+
+Arranca el stub y la app (uvicorn), envía las mismas consultas (mezcla de
+rutas BI y researcher) con cada combinación de protocolo (v1/v2),
+``Accept-Encoding`` (identity/gzip/br), ``delta_window_ms`` y
+``max_tool_chars``, y cuenta los bytes recibidos antes de descomprimir.
+
+La respuesta del stub se alarga (``--answer-repeat``) y se emite con pausas
+entre tokens (``--token-delay-ms``) para parecerse a un LLM real.
+
+Uso:
+    python -m benchmarks.sse_protocol --conversations 20
+"""
+
+import argparse
+import asyncio
+import json
+import zlib
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.load import RESULTS_DIR, Server, _free_port
+
+VARIANTS = [
+    {"name": "v1", "protocol": 1, "encoding": "identity"},
+    {"name": "v1+gzip", "protocol": 1, "encoding": "gzip"},
+    {"name": "v2", "protocol": 2, "encoding": "identity"},
+    {"name": "v2+gzip", "protocol": 2, "encoding": "gzip"},
+    {"name": "v2+br", "protocol": 2, "encoding": "br"},
+    {"name": "v2+gzip+w250", "protocol": 2, "encoding": "gzip", "delta_window_ms": 250},
+    {"name": "v2+gzip+tools200", "protocol": 2, "encoding": "gzip", "max_tool_chars": 200},
+]
+
+
+async def _conversation(client: httpx.AsyncClient, message: str, variant: dict, thread_id: str) -> int:
+    body = {"message": message, "thread_id": thread_id, "protocol": variant["protocol"]}
+    for field in ("max_tool_chars", "delta_window_ms"):
+        if variant.get(field) is not None:
+            body[field] = variant[field]
+    headers = {"Accept-Encoding": variant["encoding"]}
+    async with client.stream("POST", "/chat/stream", json=body, headers=headers) as response:
+        response.raise_for_status()
+        if variant["encoding"] != "identity" and response.headers.get("content-encoding") != variant["encoding"]:
+            return -1
+        return sum([len(chunk) async for chunk in response.aiter_raw()])
+
+
+async def _run(base_url: str, conversations: int, research_ratio: float) -> list:
+    # Mismo reparto de rutas que el stub: crc32 del mensaje
+    messages = [f"consulta de mercado {i}" for i in range(conversations)]
+    researcher = sum((zlib.crc32(m.encode()) % 1000) / 1000 < research_ratio for m in messages)
+    results = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        for variant in VARIANTS:
+            sizes = [
+                await _conversation(client, message, variant, f"{variant['name']}-{i}")
+                for i, message in enumerate(messages)
+            ]
+            if -1 in sizes:
+                print(f"{variant['name']}: codificación no disponible en el servidor, se omite")
+                continue
+            results.append({
+                **variant,
+                "bytes_per_conversation": round(sum(sizes) / len(sizes), 1),
+                "researcher_conversations": researcher,
+            })
+    baseline = results[0]["bytes_per_conversation"]
+    for result in results:
+        result["ratio_vs_v1"] = round(baseline / result["bytes_per_conversation"], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--research-ratio", type=float, default=0.3)
+    parser.add_argument("--token-delay-ms", type=float, default=15, help="Pausa del stub entre tokens")
+    parser.add_argument("--answer-repeat", type=int, default=8, help="Longitud de la respuesta del stub")
+    parser.add_argument("--delta-window-ms", type=float, default=None, help="SSE_DELTA_WINDOW_MS de la app")
+    parser.add_argument("--name", default=None)
+    args = parser.parse_args()
+
+    stub = Server("benchmarks.stubs:app", _free_port(), {
+        "STUB_LATENCY_MS": "0",
+        "STUB_TOKEN_DELAY_MS": str(args.token_delay_ms),
+        "STUB_ANSWER_REPEAT": str(args.answer_repeat),
+        "STUB_SEARCH_LATENCY_MS": "0",
+        "STUB_RESEARCH_RATIO": str(args.research_ratio),
+    })
+    stub.start("/docs")
+    app = None
+    try:
+        app = Server("src.api.app:app", _free_port(), {
+            "OPENAI_API_KEY": "bench",
+            "PINECONE_API_KEY": "bench",
+            "OPENAI_API_BASE": f"{stub.url}/v1",
+            "OPENAI_MODEL_NAME": "stub-model",
+            "SEARCH_API_URL": f"{stub.url}/search",
+            "LOG_LEVEL": "WARNING",
+            **({"SSE_DELTA_WINDOW_MS": str(args.delta_window_ms)} if args.delta_window_ms is not None else {}),
+        })
+        app.start("/health")
+        results = asyncio.run(_run(app.url, args.conversations, args.research_ratio))
+    finally:
+        if app:
+            app.stop()
+        stub.stop()
+
+    for result in results:
+        print(f"{result['name']:<20} {result['bytes_per_conversation']:>10.1f} B  x{result['ratio_vs_v1']}")
+
+    report = {"timestamp": datetime.now(timezone.utc).isoformat(), "results": results}
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"{args.name or datetime.now().strftime('sse-%Y%m%d-%H%M%S')}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark de arranque en frío.
+
+1. Tiempo de import por módulo (``python -X importtime -c "import src.api.app"``),
+   ordenado por tiempo acumulado.
+2. Tiempo hasta el primer ``/health`` con uvicorn, y hasta que ``/ready``
+   responde (grafos compilados y vector store calentado) con la duración
+   del warmup del vector store.
+3. Opcional: tiempo hasta la primera respuesta de ``/chat`` contra el stub
+   (con ``--chat`` el vector store apunta también al stub).
+
+Uso:
+    python -m benchmarks.startup --top 25
+    python -m benchmarks.startup --runs 5 --chat --name startup-base
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.load import RESULTS_DIR, ROOT, Server, _free_port
+
+
+def import_times(module: str) -> List[Dict]:
+    """Ejecuta ``-X importtime`` en un proceso limpio y parsea la salida."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    return rows
+
+
+def _wait_ready(url: str, timeout: float = 60) -> None:
+    """Espera a que ``/ready`` deje de responder 503."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if httpx.get(url + "/ready", timeout=5).status_code != 503:
+            return
+        time.sleep(0.05)
+    raise TimeoutError(f"/ready no respondió en {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="src.api.app")
+    parser.add_argument("--top", type=int, default=20, help="Módulos a mostrar")
+    parser.add_argument("--runs", type=int, default=3, help="Arranques de uvicorn a promediar")
+    parser.add_argument("--chat", action="store_true", help="Mide también la primera respuesta de /chat")
+    parser.add_argument("--name", default=None)
+    args = parser.parse_args()
+
+    rows = import_times(args.module)
+    total = next((row["cumulative_ms"] for row in rows if row["module"] == args.module), None)
+    top = sorted(rows, key=lambda row: row["cumulative_ms"], reverse=True)[: args.top]
+    print(f"Import de {args.module}: {total} ms")
+    for row in top:
+        print(f"  {row['cumulative_ms']:>9.1f} ms  {row['self_ms']:>8.1f} ms  {row['module']}")
+
+    stub = None
+    app_env = {"OPENAI_API_KEY": "bench", "PINECONE_API_KEY": "bench", "LOG_LEVEL": "WARNING"}
+    if args.chat:
+        stub = Server("benchmarks.stubs:app", _free_port(), {"STUB_LATENCY_MS": "0"})
+        stub.start("/docs")
+        app_env.update({
+            "OPENAI_API_BASE": f"{stub.url}/v1",
+            "OPENAI_MODEL_NAME": "stub-model",
+            "SEARCH_API_URL": f"{stub.url}/search",
+            "PINECONE_HOST": stub.url,
+        })
+
+    health_times, ready_times, vector_warmups, chat_times = [], [], [], []
+    try:
+        for _ in range(args.runs):
+            server = Server("src.api.app:app", _free_port(), app_env)
+            launched = time.perf_counter()
+            try:
+                health_times.append(server.start("/health"))
+                if args.chat:
+                    started = time.perf_counter()
+                    httpx.post(server.url + "/chat", json={"message": "hola", "thread_id": "startup"}, timeout=60)
+                    chat_times.append(health_times[-1] + time.perf_counter() - started)
+                _wait_ready(server.url)
+                ready_times.append(time.perf_counter() - launched)
+                vector_warmups.append(httpx.get(server.url + "/ready").json()["vector_store"])
+            finally:
+                server.stop()
+    finally:
+        if stub:
+            stub.stop()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "module": args.module,
+        "import_total_ms": total,
+        "import_top": top,
+        "time_to_health_seconds": {
+            "median": round(statistics.median(health_times), 3),
+            "runs": [round(value, 3) for value in health_times],
+        },
+        "time_to_ready_seconds": {
+            "median": round(statistics.median(ready_times), 3),
+            "runs": [round(value, 3) for value in ready_times],
+        },
+        "vector_store": vector_warmups,
+    }
+    if chat_times:
+        report["time_to_first_chat_seconds"] = {
+            "median": round(statistics.median(chat_times), 3),
+            "runs": [round(value, 3) for value in chat_times],
+        }
+    print(json.dumps({key: value for key, value in report.items() if key != "import_top"}, indent=2))
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"{args.name or datetime.now().strftime('startup-%Y%m%d-%H%M%S')}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Prueba de carga concurrente de /chat/stream.
+
+Lanza N streams en paralelo contra la app (transporte ASGI en proceso, sin
+red ni LLM) con un agente falso que emite, por stream, una secuencia de
+nodos distinta y con pausas aleatorias para forzar el entrelazado. Verifica
+que la secuencia de eventos SSE de cada stream es exactamente la que produce
+un serializador aislado para ese mismo guion.
+
+Uso:
+    python -m benchmarks.stream_concurrency --streams 200
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Dict, Iterator, List
+
+import httpx
+from fastapi import FastAPI
+from langchain_core.messages import AIMessage, ToolMessage
+
+from src.api.controllers.chat_controller import get_chat_service, router as chat_router
+from src.api.services.agent_service import AgentService, StreamEventSerializer
+from src.api.services.chat_service import ChatService
+from src.core.tenants import thread_key
+
+# Guiones posibles: secuencias de nodos que produce el supervisor
+SCRIPTS = {
+    "bi": ["supervisor", "business_intelligence", "supervisor"],
+    "research": ["supervisor", "researcher", "tools", "researcher", "supervisor", "business_intelligence", "supervisor"],
+    "research_direct": ["supervisor", "researcher", "supervisor", "business_intelligence", "supervisor"],
+}
+
+
+def build_events(script: str, thread_id: str) -> List[dict]:
+    """Construye los eventos de grafo de un guion, etiquetados con el thread."""
+    events = []
+    nodes = SCRIPTS[script]
+    bi_done = False
+    for step, node in enumerate(nodes):
+        if node == "supervisor":
+            if bi_done:
+                next_node = "FINISH"
+            else:
+                next_node = nodes[step + 1]
+            events.append({"supervisor": {"next": next_node}})
+        elif node == "tools":
+            events.append({"tools": {"messages": [
+                ToolMessage(content=f"resultado {thread_id}", tool_call_id=f"call-{thread_id}", name="web_search")
+            ]}})
+        elif node == "researcher" and step + 1 < len(nodes) and nodes[step + 1] == "tools":
+            events.append({"researcher": {"messages": [AIMessage(
+                content="",
+                name="researcher",
+                tool_calls=[{"name": "web_search", "args": {"query": thread_id}, "id": f"call-{thread_id}"}],
+            )]}})
+        else:
+            events.append({node: {"messages": [AIMessage(content=f"{node} responde a {thread_id}", name=node)]}})
+            bi_done = bi_done or node == "business_intelligence"
+    return events
+
+
+class ScriptedAgent:
+    """Agente falso: reproduce el guion asociado a cada thread (clave ``thread_key``, con su tenant)."""
+
+    def __init__(self, scripts: Dict[str, str], max_delay: float):
+        self._scripts = scripts
+        self._max_delay = max_delay
+
+    def stream(self, inputs: dict, config: dict) -> Iterator[dict]:
+        thread_id = config["configurable"]["thread_id"]
+        for event in build_events(self._scripts[thread_id], thread_id):
+            time.sleep(random.uniform(0, self._max_delay))
+            yield event
+
+    async def astream(self, inputs: dict, config: dict):
+        thread_id = config["configurable"]["thread_id"]
+        for event in build_events(self._scripts[thread_id], thread_id):
+            await asyncio.sleep(random.uniform(0, self._max_delay))
+            yield event
+
+    async def ainvoke(self, inputs: dict, config: dict) -> dict:
+        events = build_events(self._scripts[config["configurable"]["thread_id"]], "")
+        return {"messages": [message for event in events for values in event.values() for message in values.get("messages", [])]}
+
+
+def expected_events(script: str, thread_id: str) -> List[dict]:
+    serializer = StreamEventSerializer()
+    events = []
+    for event in build_events(script, thread_id):
+        events.extend(serializer.serialize_event(event))
+    return events
+
+
+def parse_sse(body: str) -> List[dict]:
+    """Devuelve los eventos ``data:`` sin nombre (los eventos estructurados)."""
+    events = []
+    for block in body.split("\n\n"):
+        if block.startswith("data: "):
+            events.append(json.loads(block[len("data: "):]))
+    return events
+
+
+async def run(streams: int, max_delay: float) -> int:
+    # La mitad de los streams con tenant: mismo thread_id, claves de checkpoint distintas
+    requests = [(f"thread-{i // 2}", "acme" if i % 2 else None) for i in range(streams)]
+    scripts = {thread_key(tenant, thread_id): random.choice(list(SCRIPTS)) for thread_id, tenant in requests}
+    service = ChatService(
+        agents={"supervisor": ScriptedAgent(scripts, max_delay)},
+        agent_service=AgentService(),
+    )
+    app = FastAPI()
+    app.include_router(chat_router)
+    app.dependency_overrides[get_chat_service] = lambda: service
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(thread_id: str, tenant):
+            response = await client.post(
+                "/chat/stream", json={"message": "hola", "thread_id": thread_id, "tenant": tenant}
+            )
+            return thread_key(tenant, thread_id), response.status_code, response.text
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one(thread_id, tenant) for thread_id, tenant in requests))
+        elapsed = time.perf_counter() - start
+
+    failures = 0
+    for key, status, body in results:
+        got = parse_sse(body)
+        want = expected_events(scripts[key], key)
+        if status != 200 or got != want:
+            failures += 1
+            if failures <= 5:
+                print(f"[FAIL] {key} ({scripts[key]}): status={status}")
+                print(f"  esperado: {want}")
+                print(f"  recibido: {got}")
+
+    print(json.dumps({
+        "streams": streams,
+        "failures": failures,
+        "elapsed_seconds": round(elapsed, 3),
+    }))
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--max-delay", type=float, default=0.01, help="Pausa máxima entre eventos (s)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    sys.exit(asyncio.run(run(args.streams, args.max_delay)))
+
+
+if __name__ == "__main__":
+    main()
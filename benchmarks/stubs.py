@@ -0,0 +1,297 @@
+"""
+Servidor stub para benchmarks: API OpenAI-compatible y búsqueda web.
+
+- ``POST /v1/chat/completions``: responde con latencia configurable, con o
+  sin streaming, soporta ``response_format`` (routing del supervisor) y
+  emite una llamada a ``web_search`` cuando el researcher lo pide.
+- ``POST /v1/embeddings``: vectores deterministas a partir del texto.
+- ``GET /search``: resultados con el formato de duckduckgo_search.
+- ``POST /vectors/upsert``, ``/query``, ``/vectors/delete``: plano de datos
+  de un índice Pinecone en memoria (``PineconeStore`` con ``PINECONE_HOST``),
+  con filtros de metadata.
+
+Configuración por entorno:
+    STUB_LATENCY_MS        latencia antes de la primera respuesta (def. 50)
+    STUB_TOKEN_DELAY_MS    pausa entre tokens al hacer streaming (def. 5)
+    STUB_RESEARCH_RATIO    fracción de consultas enrutadas a researcher (def. 0.2)
+    STUB_SEARCH_LATENCY_MS latencia de /search (def. 30)
+    STUB_ANSWER_REPEAT     veces que se repite la respuesta de ejemplo (def. 1)
+    STUB_SLOW_RATIO        fracción de llamadas lentas (cola de latencia, def. 0)
+    STUB_SLOW_MS           latencia extra de las llamadas lentas (def. 2000)
+    STUB_ERROR_RATIO       fracción de llamadas que responden 503 (def. 0)
+    STUB_ERROR_MODELS      modelos afectados por STUB_ERROR_RATIO, separados por comas (def. todos)
+    STUB_EMBEDDING_ITEM_MS latencia extra de /v1/embeddings por texto (def. 0)
+    STUB_UPSERT_LATENCY_MS latencia de cada upsert en el índice Pinecone (def. 30)
+
+Uso:
+    uvicorn benchmarks.stubs:app --port 9100
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import struct
+import uuid
+import zlib
+from typing import List
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.requests import ClientDisconnect
+
+from src.core.vector_store import matches_filter
+
+LATENCY = float(os.getenv("STUB_LATENCY_MS", "50")) / 1000
+TOKEN_DELAY = float(os.getenv("STUB_TOKEN_DELAY_MS", "5")) / 1000
+RESEARCH_RATIO = float(os.getenv("STUB_RESEARCH_RATIO", "0.2"))
+SEARCH_LATENCY = float(os.getenv("STUB_SEARCH_LATENCY_MS", "30")) / 1000
+EMBEDDING_DIM = int(os.getenv("STUB_EMBEDDING_DIM", "1536"))
+ANSWER_REPEAT = int(os.getenv("STUB_ANSWER_REPEAT", "1"))
+SLOW_RATIO = float(os.getenv("STUB_SLOW_RATIO", "0"))
+SLOW_LATENCY = float(os.getenv("STUB_SLOW_MS", "2000")) / 1000
+ERROR_RATIO = float(os.getenv("STUB_ERROR_RATIO", "0"))
+EMBEDDING_ITEM_LATENCY = float(os.getenv("STUB_EMBEDDING_ITEM_MS", "0")) / 1000
+UPSERT_LATENCY = float(os.getenv("STUB_UPSERT_LATENCY_MS", "30")) / 1000
+ERROR_MODELS = {name.strip() for name in os.getenv("STUB_ERROR_MODELS", "").split(",") if name.strip()}
+
+ANSWER = (
+    "Según el análisis, las métricas muestran una tendencia estable con oportunidades "
+    "de mejora en conversión y retención. Recomiendo revisar los KPIs semanalmente."
+)
+VOCABULARY = (
+    "ventas ingresos margen cliente canal campaña trimestre crecimiento riesgo coste "
+    "precio demanda mercado competencia inventario pedido región producto segmento "
+    "tendencia objetivo equipo estrategia inversión retorno volumen cuota semana mes "
+    "aumentó bajó se mantuvo conviene priorizar revisar ajustar medir comparar con "
+    "el la los las un una en de por para según respecto frente al del sobre durante"
+).split()
+
+
+def _answer(seed: str) -> str:
+    """Respuesta de ejemplo; con STUB_ANSWER_REPEAT > 1 se alarga con texto variado."""
+    if ANSWER_REPEAT <= 1:
+        return ANSWER
+    rng = random.Random(seed)
+    extra = " ".join(rng.choice(VOCABULARY) for _ in range(22 * (ANSWER_REPEAT - 1)))
+    return f"{ANSWER} {extra}."
+
+app = FastAPI(title="benchmark stubs")
+
+
+def _last_user_text(messages: List[dict]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content")
+            return content if isinstance(content, str) else json.dumps(content)
+    return ""
+
+
+def _routes_to_researcher(text: str) -> bool:
+    # Determinista por mensaje: misma consulta, misma ruta
+    return (zlib.crc32(text.encode()) % 1000) / 1000 < RESEARCH_RATIO
+
+
+def _decide(body: dict) -> dict:
+    messages = body.get("messages", [])
+    user_text = _last_user_text(messages)
+    history = json.dumps(messages, ensure_ascii=False)
+
+    response_format = body.get("response_format")
+    if response_format:
+        schema = (response_format.get("json_schema") or {}).get("schema") or {}
+        already_researched = '"name": "researcher"' in history
+        route = (
+            "researcher"
+            if _routes_to_researcher(user_text) and not already_researched
+            else "business_intelligence"
+        )
+        decision = {"next": route}
+        if "search_query" in schema.get("properties", {}):
+            decision["search_query"] = user_text[:80]
+        return {"content": json.dumps(decision)}
+
+    wants_search = any(
+        tool.get("function", {}).get("name") == "web_search" for tool in body.get("tools") or []
+    ) and "web_search" in json.dumps(messages[:1], ensure_ascii=False)
+    if wants_search and messages and messages[-1].get("role") != "tool":
+        return {"tool_calls": [{
+            "id": "call_" + uuid.uuid4().hex[:12],
+            "type": "function",
+            "function": {"name": "web_search", "arguments": json.dumps({"query": user_text[:80]})},
+        }]}
+    return {"content": _answer(user_text + str(len(messages)))}
+
+
+def _usage(body: dict, completion: str) -> dict:
+    # Como en la API real, los esquemas de las tools y del response_format también son prompt
+    prompt = [body.get("messages", []), body.get("tools") or [], body.get("response_format") or {}]
+    prompt_tokens = len(json.dumps(prompt)) // 4
+    completion_tokens = max(1, len(completion) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason=None, usage=None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage:
+        payload["usage"] = usage
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    try:
+        body = await request.json()
+    except ClientDisconnect:
+        # El cliente canceló (ej. hedge perdedor) antes de enviar el cuerpo
+        return Response(status_code=499)
+    model = body.get("model", "stub")
+    await asyncio.sleep(LATENCY + (SLOW_LATENCY if random.random() < SLOW_RATIO else 0))
+    if (not ERROR_MODELS or model in ERROR_MODELS) and random.random() < ERROR_RATIO:
+        return JSONResponse({"error": {"message": "stub: fallo inyectado", "type": "server_error"}}, status_code=503)
+    decision = _decide(body)
+    completion_id = "chatcmpl-" + uuid.uuid4().hex
+    usage = _usage(body, decision.get("content") or "")
+
+    if body.get("stream"):
+        async def stream():
+            if "tool_calls" in decision:
+                call = decision["tool_calls"][0]
+                yield _chunk(completion_id, model, {"role": "assistant", "tool_calls": [{"index": 0, **call}]})
+                finish_reason = "tool_calls"
+            else:
+                for index, token in enumerate(decision["content"].split(" ")):
+                    delta = {"content": token + " "}
+                    if index == 0:
+                        delta["role"] = "assistant"
+                    yield _chunk(completion_id, model, delta)
+                    if TOKEN_DELAY:
+                        await asyncio.sleep(TOKEN_DELAY)
+                finish_reason = "stop"
+            yield _chunk(completion_id, model, {}, finish_reason, usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    message = {"role": "assistant", "content": decision.get("content")}
+    if "tool_calls" in decision:
+        message["tool_calls"] = decision["tool_calls"]
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": 0,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": message,
+            "finish_reason": "tool_calls" if "tool_calls" in decision else "stop",
+        }],
+        "usage": usage,
+    }
+
+
+def _embed(text: str) -> List[float]:
+    seed = hashlib.sha256(text.encode()).digest()
+    values = [((seed[i % len(seed)] + i) % 255) / 255 - 0.5 for i in range(EMBEDDING_DIM)]
+    norm = sum(v * v for v in values) ** 0.5 or 1.0
+    return [v / norm for v in values]
+
+
+def _encode(values: List[float], encoding_format: str = None):
+    # Como la API real: el SDK de openai pide base64 (float32) salvo que se indique "float"
+    if encoding_format == "base64":
+        return base64.b64encode(struct.pack(f"<{len(values)}f", *values)).decode()
+    return values
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    await asyncio.sleep(LATENCY + EMBEDDING_ITEM_LATENCY * len(inputs))
+    return {
+        "object": "list",
+        "model": body.get("model", "stub-embedding"),
+        "data": [
+            {"object": "embedding", "index": i, "embedding": _encode(_embed(str(text)), body.get("encoding_format"))}
+            for i, text in enumerate(inputs)
+        ],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }
+
+
+# Índice Pinecone en memoria: {namespace: {id: (values, metadata)}}
+VECTORS: dict = {}
+
+
+@app.post("/vectors/upsert")
+async def vectors_upsert(request: Request):
+    body = await request.json()
+    await asyncio.sleep(UPSERT_LATENCY)
+    namespace = VECTORS.setdefault(body.get("namespace", ""), {})
+    for vector in body.get("vectors", []):
+        namespace[vector["id"]] = (vector["values"], vector.get("metadata", {}))
+    return {"upsertedCount": len(body.get("vectors", []))}
+
+
+@app.post("/query")
+async def vectors_query(request: Request):
+    body = await request.json()
+    await asyncio.sleep(UPSERT_LATENCY)
+    query = body.get("vector", [])
+    scored = [
+        (sum(a * b for a, b in zip(query, values)), vector_id, metadata)
+        for vector_id, (values, metadata) in VECTORS.get(body.get("namespace", ""), {}).items()
+        if matches_filter(metadata, body.get("filter"))
+    ]
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return {
+        "namespace": body.get("namespace", ""),
+        "matches": [
+            {"id": vector_id, "score": score, **({"metadata": metadata} if body.get("includeMetadata") else {})}
+            for score, vector_id, metadata in scored[: body.get("topK", 10)]
+        ],
+    }
+
+
+@app.post("/vectors/delete")
+async def vectors_delete(request: Request):
+    body = await request.json()
+    namespace = VECTORS.setdefault(body.get("namespace", ""), {})
+    if body.get("deleteAll"):
+        namespace.clear()
+    for vector_id in body.get("ids", []):
+        namespace.pop(vector_id, None)
+    return {}
+
+
+@app.api_route("/describe_index_stats", methods=["GET", "POST"])
+async def describe_index_stats():
+    return {
+        "namespaces": {name: {"vectorCount": len(vectors)} for name, vectors in VECTORS.items()},
+        "dimension": EMBEDDING_DIM,
+        "totalVectorCount": sum(len(vectors) for vectors in VECTORS.values()),
+    }
+
+
+@app.get("/search")
+async def search(q: str, max_results: int = 5):
+    await asyncio.sleep(SEARCH_LATENCY)
+    return [
+        {"title": f"Resultado {i} para {q}", "body": f"Contenido de ejemplo número {i} sobre {q}."}
+        for i in range(1, max_results + 1)
+    ]
@@ -0,0 +1,136 @@
+"""
+Búsqueda de varias consultas en ``PineconeStore`` contra el stub.
+
+Indexa ``--chunks`` chunks repartidos entre ``--sources`` fuentes y busca
+``--queries`` subpreguntas restringidas a una fuente, comparando:
+- ``serial``: un ``similarity_search`` por consulta (un embedding y una
+  consulta al índice cada una) y el filtro aplicado después en Python;
+- ``batch``: ``similarity_search_batch`` (un embedding por lotes, consultas
+  en paralelo y el filtro en el índice);
+- ``async_batch``: ``asimilarity_search_batch`` con el cliente async.
+
+Reporta tiempo por ronda y documentos útiles (de la fuente pedida) en el
+resultado. Sin caché de embeddings, para medir las llamadas reales.
+
+Uso:
+    python -m benchmarks.vector_search_batch --queries 8 --rounds 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+
+from benchmarks.load import RESULTS_DIR, Server, _free_port
+
+
+def _documents(count: int, sources: int):
+    from langchain_core.documents import Document
+
+    return [
+        Document(
+            page_content=f"Chunk {i}: ventas, márgenes y KPIs del trimestre {i % 4 + 1}. " * 6,
+            metadata={"source": f"informe-{i % sources}.pdf", "ingested_at": 1700000000 + i},
+        )
+        for i in range(count)
+    ]
+
+
+def _serial(store, queries, k, metadata_filter):
+    docs, seen = [], set()
+    for query in queries:
+        for doc in store.similarity_search(query, k=k):
+            if doc.metadata.get("source") == metadata_filter["source"] and doc.page_content not in seen:
+                seen.add(doc.page_content)
+                docs.append(doc)
+    return docs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--sources", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=8)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latencia por llamada de embeddings")
+    parser.add_argument("--query-latency-ms", type=float, default=30, help="Latencia por consulta al índice")
+    parser.add_argument("--name", default=None)
+    args = parser.parse_args()
+
+    stub = Server("benchmarks.stubs:app", _free_port(), {
+        "STUB_LATENCY_MS": str(args.latency_ms),
+        "STUB_UPSERT_LATENCY_MS": str(args.query_latency_ms),
+    })
+    stub.start("/docs")
+    # La configuración se lee al importar src
+    os.environ.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_API_BASE": f"{stub.url}/v1",
+        "PINECONE_API_KEY": "bench",
+        "PINECONE_HOST": stub.url,
+        "LOG_LEVEL": "ERROR",
+        "EMBEDDING_CACHE_SIZE": "0",
+        "EMBEDDING_CACHE_PATH": "",
+    })
+    from src.agents.researcher.pinecone_store import PineconeStore
+
+    metadata_filter = {"source": "informe-3.pdf"}
+    timings = {"serial": [], "batch": [], "async_batch": []}
+    useful = {}
+    try:
+        store = PineconeStore()
+        # Sin tokenizar con tiktoken: el stub acepta texto
+        store.embeddings.embeddings.check_embedding_ctx_length = False
+        store.delete_index()
+        store.add_documents(_documents(args.chunks, args.sources))
+
+        rounds = [
+            # Consultas distintas en cada ronda
+            [f"¿Cómo evolucionó el KPI {round_number}-{i} del trimestre?" for i in range(args.queries)]
+            for round_number in range(args.rounds)
+        ]
+        variants = {
+            "serial": lambda queries: _serial(store, queries, args.k, metadata_filter),
+            "batch": lambda queries: store.similarity_search_batch(queries, k=args.k, filter=metadata_filter),
+        }
+        for name, search in variants.items():
+            for queries in rounds:
+                started = time.perf_counter()
+                useful[name] = len(search(queries))
+                timings[name].append(time.perf_counter() - started)
+
+        async def run_async():
+            # Un solo event loop: el cliente async de embeddings queda ligado al primero
+            try:
+                for queries in rounds:
+                    started = time.perf_counter()
+                    docs = await store.asimilarity_search_batch(queries, k=args.k, filter=metadata_filter)
+                    timings["async_batch"].append(time.perf_counter() - started)
+                    useful["async_batch"] = len(docs)
+            finally:
+                await store.aclose()
+
+        asyncio.run(run_async())
+    finally:
+        stub.stop()
+
+    results = {
+        name: {"p50_ms": round(statistics.median(values) * 1000, 1), "useful_documents": useful[name]}
+        for name, values in timings.items()
+    }
+    for name, summary in results.items():
+        print(f"{name:<12} p50 {summary['p50_ms']:>8} ms  documentos de la fuente: {summary['useful_documents']}")
+
+    report = {"timestamp": datetime.now(timezone.utc).isoformat(), "args": vars(args), "results": results}
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"{args.name or datetime.now().strftime('vector-search-batch-%Y%m%d-%H%M%S')}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Latencia de consulta y memoria de ``NumpyStore`` según el tamaño del corpus.
+
+Para cada tamaño genera vectores sintéticos agrupados (como los embeddings
+reales, que no son uniformes) y mide cada configuración de almacenamiento:
+float32/float16/int8 exactos y float32/int8 con IVF. Reporta p50/p95 de una
+consulta, consultas/s en lotes de ``--batch``, recall@k frente a la
+búsqueda exacta en float32, tamaño en disco y RSS tras consultar.
+
+Uso:
+    python -m benchmarks.vector_store --sizes 10000 100000 --dim 384
+"""
+
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.load import RESULTS_DIR
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as handle:
+        return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _corpus(size: int, dim: int, rng) -> np.ndarray:
+    centers = rng.standard_normal((max(size // 500, 8), dim)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=size)] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _configs(size: int, nprobe: int) -> dict:
+    lists = max(int(4 * size ** 0.5), 16)
+    return {
+        "float32": {"dtype": "float32", "ivf_lists": 0},
+        "float16": {"dtype": "float16", "ivf_lists": 0},
+        "int8": {"dtype": "int8", "ivf_lists": 0},
+        f"float32+ivf{lists}": {"dtype": "float32", "ivf_lists": lists, "nprobe": nprobe},
+        f"int8+ivf{lists}": {"dtype": "int8", "ivf_lists": lists, "nprobe": nprobe},
+    }
+
+
+def _bench(path: Path, config: dict, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, args) -> dict:
+    from langchain_core.documents import Document
+
+    from src.agents.researcher.numpy_store import NumpyStore
+
+    store = NumpyStore(str(path), embeddings=object(), **config)
+    started = time.perf_counter()
+    for start in range(0, len(vectors), 10000):
+        items = [(f"{i:064d}", Document(page_content=f"chunk {i}")) for i in range(start, min(start + 10000, len(vectors)))]
+        store.add_embeddings(items, vectors[start:start + 10000])
+    store._maybe_train()
+    build_seconds = time.perf_counter() - started
+    del store
+    gc.collect()
+
+    # Store reabierto en frío, como tras reiniciar la API
+    rss_before = _rss_mb()
+    store = NumpyStore(str(path), embeddings=object(), ivf_lists=config["ivf_lists"], nprobe=config.get("nprobe"))
+    latencies = []
+    hits = []
+    for query in queries:
+        started = time.perf_counter()
+        hits.append([row for row, _ in store.search_vectors(query[None, :], args.k)[0]])
+        latencies.append((time.perf_counter() - started) * 1000)
+    started = time.perf_counter()
+    for start in range(0, len(queries), args.batch):
+        store.search_vectors(queries[start:start + args.batch], args.k)
+    batch_qps = len(queries) / (time.perf_counter() - started)
+    rss = _rss_mb() - rss_before
+
+    recall = np.mean([len(set(found) & set(expected)) / args.k for found, expected in zip(hits, truth)])
+    # Bloques ocupados: la capacidad reservada sin usar no ocupa disco (ficheros dispersos)
+    disk = sum(file.stat().st_blocks * 512 for file in path.iterdir() if file.suffix in (".bin", ".npz"))
+    return {
+        "build_seconds": round(build_seconds, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "batch_qps": round(batch_qps, 1),
+        f"recall@{args.k}": round(float(recall), 3),
+        "vectors_mb": round(disk / 2**20, 1),
+        "rss_mb": round(rss, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--name", default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = {}
+    for size in args.sizes:
+        vectors = _corpus(size, args.dim, rng)
+        # Consultas cercanas a documentos del corpus, como una pregunta sobre un chunk
+        queries = vectors[rng.integers(size, size=args.queries)] + 0.3 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+        for name, config in _configs(size, args.nprobe).items():
+            with tempfile.TemporaryDirectory(prefix="vector-bench-") as directory:
+                summary = _bench(Path(directory), config, vectors, queries, truth, args)
+            results[f"{size}/{name}"] = summary
+            print(
+                f"{size:>8} {name:<18} p50 {summary['p50_ms']:>7} ms  p95 {summary['p95_ms']:>7} ms  "
+                f"lote {summary['batch_qps']:>8} q/s  recall {summary[f'recall@{args.k}']:.3f}  "
+                f"disco {summary['vectors_mb']:>7} MB  rss {summary['rss_mb']:>7} MB"
+            )
+
+    report = {"timestamp": datetime.now(timezone.utc).isoformat(), "args": vars(args), "results": results}
+    RESULTS_DIR.mkdir(exist_ok=True)
+    output = RESULTS_DIR / f"{args.name or datetime.now().strftime('vector-store-%Y%m%d-%H%M%S')}.json"
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
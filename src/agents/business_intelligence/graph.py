@@ -1,14 +1,22 @@
+from functools import lru_cache
+
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableLambda
 from langgraph.prebuilt import ToolNode
+from src.core.metrics import instrument_node
 from src.core.state import AgentState
 from src.tools.search import global_tools
-from src.agents.business_intelligence.nodes import call_business_intelligence_model
+from src.agents.business_intelligence.nodes import (
+    call_business_intelligence_model,
+    acall_business_intelligence_model,
+)
 
 def create_bi_graph():
     workflow = StateGraph(AgentState)
     
-    workflow.add_node("bi_analyst", call_business_intelligence_model)
-    workflow.add_node("tools", ToolNode(global_tools))
+    analyst = RunnableLambda(call_business_intelligence_model, afunc=acall_business_intelligence_model, name="bi_analyst")
+    workflow.add_node("bi_analyst", instrument_node("bi", "bi_analyst", analyst))
+    workflow.add_node("tools", instrument_node("bi", "tools", ToolNode(global_tools)))
     
     workflow.add_edge("__start__", "bi_analyst")
     
@@ -24,4 +32,13 @@ def create_bi_graph():
     
     return workflow.compile()
 
-business_intelligence_agent = create_bi_graph()
+@lru_cache(maxsize=None)
+def get_business_intelligence_agent():
+    """Compila el grafo de BI la primera vez que se necesita."""
+    return create_bi_graph()
+
+def __getattr__(name):
+    # Compatibilidad: ``business_intelligence_agent`` se compila al primer acceso
+    if name == "business_intelligence_agent":
+        return get_business_intelligence_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,13 +1,14 @@
+import logging
 from langchain_core.messages import SystemMessage, AIMessage
+from src.core.logger import get_logger
 from src.core.models import get_model
-from src.core.state import AgentState
+from src.core.state import AgentState, turn_update
 from src.tools.search import global_tools
 
-def call_business_intelligence_model(state: AgentState):
-    print("[DEBUG] business_intelligence: INICIANDO")
-    model = get_model().bind_tools(global_tools)
+logger = get_logger(__name__)
 
-    prompt = SystemMessage(content=(
+def _bi_prompt() -> SystemMessage:
+    return SystemMessage(content=(
         "Eres un asistente de Business Intelligence experto y amigable. "
         "\n\nTUS RESPONSABILIDADES:"
         "\n1. CONVERSACIÓN GENERAL: Responde saludos, preguntas generales y mantén conversaciones naturales"
@@ -22,28 +23,69 @@ def call_business_intelligence_model(state: AgentState):
         "\n\nRecuerda: Eres el agente principal del sistema, maneja todo tipo de conversaciones con profesionalismo."
     ))
 
-    messages = state.get("messages", [])
-    if not messages:
-        print("[DEBUG] business_intelligence: No hay mensajes, retornando vacío")
-        return {"messages": []}
-    
-    print(f"[DEBUG] business_intelligence: Procesando {len(messages)} mensajes")
-    
-    full_messages = [prompt] + messages
-    response = model.invoke(full_messages)
-    
-    print(f"[DEBUG] business_intelligence: Respuesta del modelo:")
-    print(f"  - Content: {getattr(response, 'content', 'N/A')[:150] if hasattr(response, 'content') else 'N/A'}")
-    print(f"  - tool_calls: {len(getattr(response, 'tool_calls', []))} llamadas")
+
+def _bi_update(state: AgentState, response) -> dict:
+    """Actualización de estado a partir de la respuesta del modelo."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "business_intelligence: Respuesta del modelo",
+            extra={
+                "content": str(getattr(response, "content", "N/A"))[:150],
+                "tool_call_count": len(getattr(response, "tool_calls", None) or []),
+            },
+        )
     
     # NO validar contenido si hay tool_calls
     if not response:
-        print("[DEBUG] business_intelligence: No hay respuesta, retornando vacío")
+        logger.debug("business_intelligence: No hay respuesta, retornando vacío")
         return {"messages": []}
     
     # Agregar metadata para identificar el agente
     if isinstance(response, AIMessage):
         response.name = "business_intelligence"
     
-    print(f"[DEBUG] business_intelligence: Retornando mensaje")
-    return {"messages": [response]}
+    logger.debug("business_intelligence: Retornando mensaje")
+    return {
+        "messages": [response],
+        "turn_counts": turn_update(state, "business_intelligence"),
+        "active_agent": "business_intelligence",
+    }
+
+
+def call_business_intelligence_model(state: AgentState):
+    logger.debug("business_intelligence: INICIANDO")
+    
+    # Respuesta ya calculada en paralelo con el routing del supervisor
+    speculative = state.get("speculative_bi")
+    if speculative is not None:
+        logger.debug("business_intelligence: Usando respuesta especulativa")
+        return {**_bi_update(state, speculative), "speculative_bi": None}
+    
+    messages = state.get("messages", [])
+    if not messages:
+        logger.debug("business_intelligence: No hay mensajes, retornando vacío")
+        return {"messages": []}
+    
+    logger.debug("business_intelligence: Procesando mensajes", extra={"total_messages": len(messages)})
+    
+    model = get_model().bind_tools(global_tools)
+    response = model.invoke([_bi_prompt()] + messages)
+    return _bi_update(state, response)
+
+
+async def acall_business_intelligence_model(state: AgentState, config=None):
+    """Versión async del nodo (hedging y cancelación completos en la capa de resiliencia)."""
+    speculative = state.get("speculative_bi")
+    if speculative is not None:
+        logger.debug("business_intelligence: Usando respuesta especulativa")
+        return {**_bi_update(state, speculative), "speculative_bi": None}
+    
+    if not state.get("messages"):
+        return {"messages": []}
+    return _bi_update(state, await generate_business_intelligence_response(state, config))
+
+
+async def generate_business_intelligence_response(state: AgentState, config=None):
+    """Llamada async al modelo de BI (nodo async y ejecución especulativa)."""
+    model = get_model().bind_tools(global_tools)
+    return await model.ainvoke([_bi_prompt()] + state.get("messages", []), config)
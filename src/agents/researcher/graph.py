@@ -1,18 +1,20 @@
+from functools import lru_cache
+
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableLambda
 from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
+from src.core.checkpoint import get_checkpointer
+from src.core.metrics import instrument_node
 from src.core.state import AgentState
 from src.tools.search import global_tools
-from src.agents.researcher.nodes import call_researcher_model
-
-# Inicializar el checkpointer para memoria persistente
-memory = MemorySaver()
+from src.agents.researcher.nodes import call_researcher_model, acall_researcher_model
 
 def create_researcher_graph():
     workflow = StateGraph(AgentState)
     
-    workflow.add_node("researcher", call_researcher_model)
-    workflow.add_node("tools", ToolNode(global_tools))
+    researcher = RunnableLambda(call_researcher_model, afunc=acall_researcher_model, name="researcher")
+    workflow.add_node("researcher", instrument_node("researcher", "researcher", researcher))
+    workflow.add_node("tools", instrument_node("researcher", "tools", ToolNode(global_tools)))
     
     workflow.add_edge("__start__", "researcher")
     
@@ -36,8 +38,16 @@ def create_researcher_graph():
     workflow.add_conditional_edges("researcher", should_continue)
     workflow.add_edge("tools", "researcher")
     
-    # Compilar con memoria persistente
-    return workflow.compile(checkpointer=memory)
+    # Compilar con memoria persistente (ver CHECKPOINT_BACKEND)
+    return workflow.compile(checkpointer=get_checkpointer("researcher"))
+
+@lru_cache(maxsize=None)
+def get_researcher_agent():
+    """Compila el grafo del investigador la primera vez que se necesita."""
+    return create_researcher_graph()
 
-# Exportamos la instancia compilada
-researcher_agent = create_researcher_graph()
+def __getattr__(name):
+    # Compatibilidad: ``researcher_agent`` se compila al primer acceso
+    if name == "researcher_agent":
+        return get_researcher_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,71 +1,176 @@
+import logging
+import uuid
 from langchain_core.messages import SystemMessage, AIMessage
+from src.core.logger import get_logger
 from src.core.models import get_model
-from src.core.state import AgentState
+from src.core.state import AgentState, is_new_turn, turn_update
 from src.tools.search import global_tools
 
-def call_researcher_model(state: AgentState):
-    """Lógica del nodo principal del investigador con instrucciones de sistema."""
-    model = get_model().bind_tools(global_tools)
-    
+logger = get_logger(__name__)
+
+def _researcher_messages(state: AgentState):
+    """Prompt del investigador según lo que ya hizo en el turno (None si no hay mensajes)."""
     messages = state.get("messages", [])
     if not messages:
-        print("[DEBUG] researcher: No hay mensajes, retornando vacío")
-        return {"messages": []}
+        logger.debug("researcher: No hay mensajes, retornando vacío")
+        return None
     
-    # Contar cuántas veces este agente ya actuó (mensajes con name='researcher')
-    researcher_calls = sum(
-        1 for msg in messages 
-        if hasattr(msg, "name") and msg.name == "researcher"
-    )
+    # Veces que este agente ya actuó en el turno actual
+    turn_counts = {} if is_new_turn(state) else state.get("turn_counts") or {}
+    researcher_calls = turn_counts.get("researcher", 0)
     
-    # Verificar si hay un ToolMessage (resultado de web_search) en los últimos mensajes
-    last_tool_message = None
-    for msg in reversed(messages):
-        if hasattr(msg, "type") and msg.type == "tool":
-            last_tool_message = msg
-            break
+    # Tras ejecutar una tool, tools vuelve a este nodo: el resultado es el último mensaje
+    last_tool_message = messages[-1] if getattr(messages[-1], "type", None) == "tool" else None
     
-    print(f"[DEBUG] researcher: researcher_calls={researcher_calls}, last_tool_message={'Sí' if last_tool_message else 'No'}")
+    logger.debug(
+        "researcher: estado",
+        extra={"researcher_calls": researcher_calls, "has_tool_result": last_tool_message is not None},
+    )
     
-    if last_tool_message and researcher_calls > 0:
+    if last_tool_message and researcher_calls > 0 and last_tool_message.name == "internal_search":
+        if _no_internal_results(last_tool_message):
+            # Sin datos internos: buscar en la web
+            logger.debug("researcher: Sin documentos internos, pasando a web_search")
+            prompt = SystemMessage(content=(
+                "No hay documentos internos sobre el tema. Llama ahora a web_search con la consulta del usuario."
+            ))
+        else:
+            logger.debug("researcher: Hay documentos internos, resumiendo o buscando en la web")
+            prompt = SystemMessage(content=(
+                "Eres un investigador. Tienes fragmentos de documentos internos de la empresa. "
+                "Si responden la pregunta, resume los datos en 2-3 oraciones citando la fuente: "
+                "'Según los documentos internos ([fuente]): [contenido]'. "
+                "Si no son relevantes para la pregunta, llama a web_search."
+            ))
+    elif last_tool_message and researcher_calls > 0:
         # Ya ejecutamos web_search y ya respondimos antes, reportar resultados finales
-        print("[DEBUG] researcher: Ya hay resultados de tool Y ya actuamos antes, reportando finalmente")
+        logger.debug("researcher: Ya hay resultados de tool Y ya actuamos antes, reportando finalmente")
         prompt = SystemMessage(content=(
             "Eres un investigador. Tienes los resultados de la búsqueda web. "
             "Resume brevemente los datos encontrados en 2-3 oraciones. "
             "Di algo como: 'Según la búsqueda realizada: [contenido del resultado]'"
         ))
     elif researcher_calls == 0:
-        # Primera vez que actúa, DEBE llamar web_search
-        print("[DEBUG] researcher: Primera actuación, DEBE llamar web_search")
+        # Primera vez que actúa, DEBE llamar a una herramienta de búsqueda
+        logger.debug("researcher: Primera actuación, DEBE buscar")
         prompt = SystemMessage(content=(
-            "Eres un investigador especializado. Tu ÚNICA tarea ahora es usar la herramienta web_search. "
+            "Eres un investigador especializado. Tu ÚNICA tarea ahora es buscar el tema clave de la pregunta. "
             "\n\nOBLIGATORIO:"
-            "\n- Identifica el tema clave de la pregunta del usuario"
-            "\n- Llama a web_search con ese tema como query"
-            "\n- NO intentes responder sin llamar primero a web_search"
+            "\n- Datos de la empresa (ventas, KPIs, informes): llama a internal_search"
+            "\n- Información pública o en tiempo real: llama a web_search"
+            "\n- NO intentes responder sin buscar primero"
             "\n\nEjemplo: Si preguntan 'precio de Apple', debes llamar web_search('precio de Apple')"
         ))
     else:
         # Caso extraño: ya actuamos pero no hay tool_message, reportar que no se encontró info
-        print("[DEBUG] researcher: Situación inesperada, reportando sin datos")
+        logger.debug("researcher: Situación inesperada, reportando sin datos")
         prompt = SystemMessage(content=(
             "No se pudieron obtener resultados de la búsqueda. Informa brevemente que no se pudo obtener la información."
         ))
     
-    full_messages = [prompt] + messages
-    response = model.invoke(full_messages)
-    
-    print(f"[DEBUG] researcher: Respuesta del modelo:")
-    print(f"  - Content: {getattr(response, 'content', 'N/A')[:150] if hasattr(response, 'content') else 'N/A'}")
-    print(f"  - tool_calls: {len(getattr(response, 'tool_calls', []))} llamadas")
+    return [prompt] + messages
+
+
+def _researcher_update(state: AgentState, response) -> dict:
+    """Actualización de estado a partir de la respuesta del modelo."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "researcher: Respuesta del modelo",
+            extra={
+                "content": str(getattr(response, "content", "N/A"))[:150],
+                "tool_call_count": len(getattr(response, "tool_calls", None) or []),
+            },
+        )
     
     if not response:
-        print("[DEBUG] researcher: No hay respuesta, retornando vacío")
+        logger.debug("researcher: No hay respuesta, retornando vacío")
         return {"messages": []}
     
     # Agregar metadata para identificar el agente
     if isinstance(response, AIMessage):
         response.name = "researcher"
     
-    return {"messages": [response]}
+    return {
+        "messages": [response],
+        "turn_counts": turn_update(state, "researcher"),
+        "active_agent": "researcher",
+    }
+
+
+def call_researcher_model(state: AgentState):
+    """Lógica del nodo principal del investigador con instrucciones de sistema."""
+    full_messages = _researcher_messages(state)
+    if full_messages is None:
+        return {"messages": []}
+    model = get_model().bind_tools(global_tools)
+    return _researcher_update(state, model.invoke(full_messages))
+
+
+async def acall_researcher_model(state: AgentState, config=None):
+    """Versión async del nodo (hedging y cancelación completos en la capa de resiliencia)."""
+    full_messages = _researcher_messages(state)
+    if full_messages is None:
+        return {"messages": []}
+    model = get_model().bind_tools(global_tools)
+    return _researcher_update(state, await model.ainvoke(full_messages, config))
+
+
+def _no_internal_results(message) -> bool:
+    from src.tools.retrieval import NO_INTERNAL_RESULTS
+
+    content = str(message.content)
+    return content == NO_INTERNAL_RESULTS or content.startswith("Error al buscar en documentos internos")
+
+
+def _last_user_text(messages: list) -> str:
+    for msg in reversed(messages):
+        if getattr(msg, "type", None) == "human":
+            return str(msg.content)
+    return ""
+
+
+def run_direct_research(state: AgentState):
+    """
+    Researcher sin LLM (RESEARCHER_MODE=direct).
+    
+    Busca con la consulta que extrajo el supervisor (o, si no la hay, con el
+    último mensaje del usuario) y deja la llamada y su resultado en el
+    historial para que business_intelligence los use directamente.
+    
+    Primero en los documentos internos: si algún chunk coincide por palabras
+    clave (BM25) se usan esos resultados; si no, web_search.
+    """
+    from langchain_core.messages import ToolMessage
+    from src.tools.retrieval import format_documents, internal_search, search_documents
+    from src.tools.search import web_search
+    
+    messages = state.get("messages", [])
+    query = (state.get("search_query") or _last_user_text(messages)).strip()[:200]
+    logger.debug("researcher: Búsqueda directa", extra={"query": query})
+    
+    try:
+        docs = search_documents(query, require_keyword_match=True)
+    except Exception as e:
+        logger.warning("researcher: Error en búsqueda interna", extra={"error": str(e)})
+        docs = []
+    # Solo hay resultados si algún chunk coincide por palabras clave
+    internal = bool(docs)
+    search_tool = internal_search if internal else web_search
+    
+    tool_call = {"name": search_tool.name, "args": {"query": query}, "id": f"call_{uuid.uuid4().hex[:24]}"}
+    call_message = AIMessage(content="", tool_calls=[tool_call], name="researcher")
+    try:
+        result = format_documents(docs) if internal else web_search.invoke(tool_call["args"])
+    except Exception as e:
+        logger.warning("researcher: Error en búsqueda directa", extra={"error": str(e)})
+        result = f"No se pudieron obtener resultados de la búsqueda: {e}"
+    
+    return {
+        "messages": [
+            call_message,
+            ToolMessage(content=str(result), tool_call_id=tool_call["id"], name=search_tool.name),
+        ],
+        "turn_counts": turn_update(state, "researcher"),
+        "active_agent": "researcher",
+        "search_query": None,
+    }
@@ -0,0 +1,507 @@
+"""
+Vector store local sobre NumPy, persistido en un directorio.
+
+Ficheros de ``path``:
+- ``vectors.bin``: matriz (capacidad, dim) contigua, abierta como memmap,
+  en float32, float16 o int8 (``LOCAL_VECTOR_DTYPE``). Con int8 cada vector
+  tiene su escala en ``scales.bin``.
+- ``ids.bin``: ID de cada fila (``document_id``); vacío en las filas borradas,
+  que se excluyen de la búsqueda y se reutilizan al añadir.
+- ``docs.jsonl`` + ``offsets.bin``: texto y metadata en JSON, solo añadiendo;
+  cada fila guarda (offset, longitud) de su línea vigente y se lee con
+  ``os.pread`` únicamente para los resultados.
+- ``meta.json``: dimensión, tipo y número de filas.
+- ``ivf.npz``: índice aproximado opcional (centroides y lista de cada fila).
+- ``namespaces/<nombre>/``: los mismos ficheros para cada namespace distinto
+  del por defecto (ver ``src.core.tenants``).
+
+Los vectores se guardan normalizados, así que el producto escalar es la
+similitud coseno. La búsqueda exacta recorre la matriz por bloques con un
+producto matricial para todas las consultas a la vez; con
+``LOCAL_VECTOR_IVF_LISTS > 0`` se agrupan los vectores con k-means y solo
+se puntúan las ``LOCAL_VECTOR_NPROBE`` listas más cercanas a la consulta.
+
+Los filtros de metadata se evalúan dentro del store (``matches_filter``):
+se piden más candidatos de los necesarios y se amplían hasta reunir ``k``
+que cumplan el filtro o recorrer todo el store.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.core.tenants import check_namespace
+from src.core.vector_store import BaseVectorStore, MetadataFilter, document_id, matches_filter, merge_results
+
+logger = get_logger(__name__)
+
+_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+_ID_DTYPE = np.dtype("S64")
+# Filas por bloque en la búsqueda exacta (acota la memoria de la conversión a float32)
+_BLOCK_ROWS = 32768
+# Iteraciones de k-means y muestra de entrenamiento por lista del IVF
+_KMEANS_ITERATIONS = 10
+_TRAIN_SAMPLES_PER_LIST = 64
+# Con filtro: candidatos por resultado pedido, multiplicados en cada ampliación
+_FILTER_OVERSAMPLE = 4
+# Subdirectorio con un store por namespace
+_NAMESPACES_DIR = "namespaces"
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Los ``k`` mejores por fila de ``scores`` (m, n), ordenados de mayor a menor."""
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, part, axis=1)
+        rows = np.take_along_axis(rows, part, axis=1)
+    order = np.argsort(-scores, axis=1)
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+
+class NumpyStore(BaseVectorStore):
+    def __init__(
+        self,
+        path: str = None,
+        dtype: Optional[str] = None,
+        ivf_lists: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        embeddings: Optional[Embeddings] = None,
+    ):
+        self.path = Path(path or settings.LOCAL_VECTOR_DIR)
+        self.path.mkdir(parents=True, exist_ok=True)
+        if embeddings is None:
+            from src.core.embeddings import get_embeddings
+
+            embeddings = get_embeddings()
+        self.embeddings = embeddings
+        self.ivf_lists = settings.LOCAL_VECTOR_IVF_LISTS if ivf_lists is None else ivf_lists
+        self.nprobe = nprobe or settings.LOCAL_VECTOR_NPROBE
+        self._lock = threading.RLock()
+
+        meta = self._read_meta()
+        requested = (dtype or settings.LOCAL_VECTOR_DTYPE).lower()
+        if requested not in _DTYPES:
+            raise ValueError(f"LOCAL_VECTOR_DTYPE no soportado: {requested}")
+        if meta and dtype and meta["dtype"] != requested:
+            raise ValueError(f"{self.path} guarda vectores {meta['dtype']}, no {requested}")
+        self.dtype = meta.get("dtype", requested)
+        self.dim: Optional[int] = meta.get("dim")
+        self.count: int = meta.get("count", 0)
+
+        self._capacity = 0
+        self._vectors = self._scales = self._ids = self._offsets = None
+        self._centroids = self._assign = self._order = self._bounds = None
+        self._row_of: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._namespaces: Dict[str, "NumpyStore"] = {}
+        if self.dim:
+            self._reserve(self.count)
+            for row, row_id in enumerate(self._ids[:self.count]):
+                if row_id:
+                    self._row_of[row_id.decode()] = row
+                else:
+                    self._free.append(row)
+        self._docs_fd = os.open(self.path / "docs.jsonl", os.O_RDWR | os.O_CREAT | os.O_APPEND)
+        self._load_ivf()
+
+    def _namespace(self, namespace: str) -> "NumpyStore":
+        """Store de ``namespace``: este mismo para el por defecto, uno en ``namespaces/<nombre>`` para el resto."""
+        if not namespace:
+            return self
+        with self._lock:
+            store = self._namespaces.get(namespace)
+            if store is None:
+                store = self._namespaces[namespace] = NumpyStore(
+                    str(self.path / _NAMESPACES_DIR / check_namespace(namespace)),
+                    dtype=self.dtype,
+                    ivf_lists=self.ivf_lists,
+                    nprobe=self.nprobe,
+                    embeddings=self.embeddings,
+                )
+            return store
+
+    # ------------------------------------------------------------------ ficheros
+
+    def _read_meta(self) -> dict:
+        meta_path = self.path / "meta.json"
+        return json.loads(meta_path.read_text()) if meta_path.exists() else {}
+
+    def _write_meta(self) -> None:
+        meta = {"dim": self.dim, "dtype": self.dtype, "count": self.count}
+        tmp_path = self.path / "meta.json.tmp"
+        tmp_path.write_text(json.dumps(meta))
+        tmp_path.replace(self.path / "meta.json")
+
+    def _memmap(self, name: str, dtype, shape: tuple) -> np.memmap:
+        file_path = self.path / name
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(file_path, "ab") as handle:
+            if handle.tell() < nbytes:
+                handle.truncate(nbytes)
+        return np.memmap(file_path, dtype=dtype, mode="r+", shape=shape)
+
+    def _reserve(self, rows: int) -> None:
+        """Asegura capacidad para ``rows`` filas, duplicándola al crecer."""
+        if rows <= self._capacity and self._vectors is not None:
+            return
+        capacity = max(rows, 2 * self._capacity, 1024)
+        self._flush()
+        self._vectors = self._memmap("vectors.bin", _DTYPES[self.dtype], (capacity, self.dim))
+        self._ids = self._memmap("ids.bin", _ID_DTYPE, (capacity,))
+        self._offsets = self._memmap("offsets.bin", np.int64, (capacity, 2))
+        if self.dtype == "int8":
+            self._scales = self._memmap("scales.bin", np.float32, (capacity,))
+        if self._assign is not None:
+            self._assign = np.concatenate([self._assign, np.full(capacity - len(self._assign), -1, dtype=np.int32)])
+        self._capacity = capacity
+
+    def _flush(self) -> None:
+        for array in (self._vectors, self._ids, self._offsets, self._scales):
+            if array is not None:
+                array.flush()
+
+    def _read_document(self, row: int) -> Document:
+        offset, length = self._offsets[row]
+        record = json.loads(os.pread(self._docs_fd, int(length), int(offset)))
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+    # ------------------------------------------------------------------ escritura
+
+    def add_documents(self, documents: List[Document], namespace: str = "") -> None:
+        """Añade documentos (o reemplaza los que ya existen con el mismo ``document_id``)."""
+        if namespace:
+            return self._namespace(namespace).add_documents(documents)
+        unique = list({document_id(doc): doc for doc in documents}.items())
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        for start in range(0, len(unique), batch_size):
+            batch = unique[start:start + batch_size]
+            vectors = self.embeddings.embed_documents([doc.page_content for _, doc in batch])
+            self.add_embeddings(batch, np.asarray(vectors, dtype=np.float32))
+        self._maybe_train()
+
+    def add_embeddings(self, items: List[Tuple[str, Document]], vectors: np.ndarray) -> None:
+        """Guarda pares (id, documento) con sus embeddings ya calculados."""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Dimensión {vectors.shape[1]} distinta de la del store ({self.dim})")
+
+            rows = np.empty(len(items), dtype=np.int64)
+            new_rows = 0
+            for i, (doc_id, _) in enumerate(items):
+                row = self._row_of.get(doc_id)
+                if row is None:
+                    # Primero las filas borradas, luego al final de la matriz
+                    if self._free:
+                        row = self._free.pop()
+                    else:
+                        row = self.count + new_rows
+                        new_rows += 1
+                    self._row_of[doc_id] = row
+                rows[i] = row
+            self._reserve(self.count + new_rows)
+
+            # Metadata: una línea por documento al final de docs.jsonl
+            lines = [
+                json.dumps({"id": doc_id, "text": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False).encode() + b"\n"
+                for doc_id, doc in items
+            ]
+            offset = os.fstat(self._docs_fd).st_size
+            os.write(self._docs_fd, b"".join(lines))
+            for row, line in zip(rows, lines):
+                self._offsets[row] = (offset, len(line))
+                offset += len(line)
+
+            self._ids[rows] = [doc_id.encode() for doc_id, _ in items]
+            if self.dtype == "int8":
+                scales = np.abs(vectors).max(axis=1) / 127
+                scales[scales == 0] = 1
+                self._vectors[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+                self._scales[rows] = scales
+            else:
+                self._vectors[rows] = vectors.astype(_DTYPES[self.dtype])
+
+            if self._centroids is not None:
+                self._assign[rows] = self._nearest_list(vectors)
+                self._order = None
+            self.count += new_rows
+            self._flush()
+            self._write_meta()
+
+    def delete(self, ids: List[str], namespace: str = "") -> None:
+        """Marca como borradas las filas de esos IDs (vector a cero, fuera de la búsqueda)."""
+        if namespace:
+            return self._namespace(namespace).delete(ids)
+        with self._lock:
+            rows = [self._row_of.pop(doc_id) for doc_id in ids if doc_id in self._row_of]
+            if not rows:
+                return
+            self._ids[rows] = b""
+            self._vectors[rows] = 0
+            self._free.extend(rows)
+            if self._centroids is not None:
+                self._assign[rows] = -1
+                self._order = None
+                self._persist_ivf()
+            self._flush()
+
+    def delete_index(self, namespace: str = "") -> None:
+        """Borra todos los vectores y documentos del namespace (los de otros namespaces se conservan)."""
+        if namespace:
+            return self._namespace(namespace).delete_index()
+        with self._lock:
+            os.close(self._docs_fd)
+            self._vectors = self._scales = self._ids = self._offsets = None
+            for entry in self.path.iterdir():
+                # Los otros namespaces están dentro del directorio: se conservan
+                if entry.name == _NAMESPACES_DIR:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    entry.unlink()
+            self.dim, self.count, self._capacity, self._row_of, self._free = None, 0, 0, {}, []
+            self._docs_fd = os.open(self.path / "docs.jsonl", os.O_RDWR | os.O_CREAT | os.O_APPEND)
+            self._load_ivf()
+
+    # ------------------------------------------------------------------ índice IVF
+
+    def _load_ivf(self) -> None:
+        self._centroids = self._assign = self._order = self._bounds = None
+        self._trained_count = 0
+        ivf_path = self.path / "ivf.npz"
+        if self.ivf_lists and ivf_path.exists():
+            data = np.load(ivf_path)
+            self._centroids = data["centroids"]
+            self._trained_count = int(data["trained_count"])
+            self._assign = np.full(self._capacity, -1, dtype=np.int32)
+            self._assign[:len(data["assign"])] = data["assign"][:self._capacity]
+
+    def _decode(self, rows) -> np.ndarray:
+        decoded = self._vectors[rows].astype(np.float32)
+        if self.dtype == "int8":
+            decoded *= self._scales[rows][:, None]
+        return decoded
+
+    def _nearest_list(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+
+    def _maybe_train(self) -> None:
+        """Entrena el IVF al superar 8 vectores por lista y lo reentrena si el corpus se duplica."""
+        with self._lock:
+            if not self.ivf_lists or self.count < 8 * self.ivf_lists:
+                return
+            if self._centroids is not None and self.count < 2 * self._trained_count:
+                self._persist_ivf()
+                return
+            rng = np.random.default_rng(0)
+            live = np.setdiff1d(np.arange(self.count), self._free)
+            sample_size = min(len(live), self.ivf_lists * _TRAIN_SAMPLES_PER_LIST)
+            sample = self._decode(np.sort(rng.choice(live, sample_size, replace=False)))
+            centroids = sample[rng.choice(sample_size, self.ivf_lists, replace=False)]
+            # k-means esférico: asignar por coseno y renormalizar los centroides
+            for _ in range(_KMEANS_ITERATIONS):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                empty = np.bincount(labels, minlength=self.ivf_lists) == 0
+                sums[empty] = centroids[empty]
+                centroids = _normalize(sums)
+            self._centroids = centroids
+            self._assign = np.full(self._capacity, -1, dtype=np.int32)
+            for start in range(0, self.count, _BLOCK_ROWS):
+                stop = min(start + _BLOCK_ROWS, self.count)
+                self._assign[start:stop] = self._nearest_list(self._decode(slice(start, stop)))
+            self._assign[self._free] = -1
+            self._trained_count = self.count
+            self._order = None
+            self._persist_ivf()
+            logger.info("Índice IVF entrenado", extra={"lists": self.ivf_lists, "vectors": self.count})
+
+    def _persist_ivf(self) -> None:
+        np.savez(
+            self.path / "ivf.npz",
+            centroids=self._centroids,
+            assign=self._assign[:self.count],
+            trained_count=self._trained_count,
+        )
+
+    def _ivf_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Filas ordenadas por lista y límites de cada lista (recalculados tras escribir)."""
+        if self._order is None or len(self._order) != self.count:
+            assign = self._assign[:self.count]
+            self._order = np.argsort(assign, kind="stable")
+            self._bounds = np.searchsorted(assign[self._order], np.arange(self.ivf_lists + 1))
+        return self._order, self._bounds
+
+    # ------------------------------------------------------------------ búsqueda
+
+    def _scores(self, queries: np.ndarray, rows, snapshot: dict) -> np.ndarray:
+        """Similitud (m, filas) de las consultas con ``rows`` de la instantánea."""
+        # float32: sin copia para un slice del memmap; int8: la escala se aplica a las similitudes
+        scores = queries @ np.asarray(snapshot["vectors"][rows], dtype=np.float32).T
+        if self.dtype == "int8":
+            scores *= snapshot["scales"][rows]
+        return scores
+
+    def _exact_search(self, queries: np.ndarray, k: int, snapshot: dict) -> Tuple[np.ndarray, np.ndarray]:
+        count = snapshot["count"]
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, count, _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, count)
+            scores = self._scores(queries, slice(start, stop), snapshot)
+            deleted = snapshot["deleted"]
+            deleted = deleted[(deleted >= start) & (deleted < stop)]
+            if len(deleted):
+                scores[:, deleted - start] = -np.inf
+            rows = np.broadcast_to(np.arange(start, stop), scores.shape)
+            best_scores, best_rows = _top_k(
+                np.concatenate([best_scores, scores], axis=1), np.concatenate([best_rows, rows], axis=1), k
+            )
+        return best_scores, best_rows
+
+    def _ivf_search(self, queries: np.ndarray, k: int, snapshot: dict) -> List[Tuple[np.ndarray, np.ndarray]]:
+        order, bounds = snapshot["order"], snapshot["bounds"]
+        centroids = snapshot["centroids"]
+        nprobe = min(self.nprobe, len(centroids))
+        probes = np.argpartition(-(queries @ centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for query, lists in zip(queries, probes):
+            # Filas en orden creciente: lectura secuencial del memmap
+            rows = np.sort(np.concatenate([order[bounds[i]:bounds[i + 1]] for i in lists]))
+            scores = self._scores(query[None, :], rows, snapshot)
+            top_scores, top_rows = _top_k(scores, rows[None, :], k)
+            results.append((top_scores[0], top_rows[0]))
+        return results
+
+    def search_vectors(self, queries: np.ndarray, k: int = 4) -> List[List[Tuple[int, float]]]:
+        """(fila, similitud) de los ``k`` vecinos de cada consulta, de mayor a menor similitud."""
+        # Instantánea bajo el lock; el cálculo no lo retiene (NumPy libera el GIL en el producto)
+        with self._lock:
+            snapshot = {
+                "count": self.count,
+                "vectors": self._vectors,
+                "scales": self._scales,
+                "centroids": self._centroids,
+                "deleted": np.array(self._free, dtype=np.int64),
+            }
+            if self._centroids is not None and self.count:
+                snapshot["order"], snapshot["bounds"] = self._ivf_lists()
+        if not snapshot["count"]:
+            return [[] for _ in queries]
+        queries = _normalize(np.asarray(queries, dtype=np.float32))
+        if snapshot["centroids"] is not None:
+            results = self._ivf_search(queries, k, snapshot)
+        else:
+            results = zip(*self._exact_search(queries, min(k, snapshot["count"]), snapshot))
+        # Filas borradas (similitud -inf) si k supera los documentos vigentes
+        return [
+            [(int(row), float(score)) for score, row in zip(scores, rows) if score != -np.inf]
+            for scores, rows in results
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        """Busca documentos similares en el store local."""
+        if namespace:
+            return self._namespace(namespace).similarity_search(query, k, filter)
+        return self._search_documents(self.embeddings.embed_query(query), k, filter)
+
+    def similarity_search_batch(
+        self, queries: List[str], k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        """Varias consultas: un embedding por lotes y un solo recorrido de la matriz."""
+        if namespace:
+            return self._namespace(namespace).similarity_search_batch(queries, k, filter)
+        if not queries:
+            return []
+        return merge_results(self._search_matches(self._embed_queries(queries), k, filter))
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        # ``CachedEmbeddings`` las embebe en una llamada; otros ``Embeddings``, una a una
+        if hasattr(self.embeddings, "embed_queries"):
+            return self.embeddings.embed_queries(queries)
+        return [self.embeddings.embed_query(query) for query in queries]
+
+    def _search_documents(
+        self, query_embedding: List[float], k: int, filter: Optional[MetadataFilter] = None
+    ) -> List[Document]:
+        return [doc for _, doc, _ in self._search_matches([query_embedding], k, filter)[0]]
+
+    def _search_matches(
+        self, query_embeddings: List[List[float]], k: int, filter: Optional[MetadataFilter] = None
+    ) -> List[List[Tuple[str, Document, float]]]:
+        """(id, documento, similitud) de los ``k`` vecinos de cada consulta que cumplen ``filter``."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        fetch = k * _FILTER_OVERSAMPLE if filter else k
+        documents: Dict[int, Document] = {}
+        while True:
+            results = []
+            for hits in self.search_vectors(queries, fetch):
+                matches = []
+                for row, score in hits:
+                    if row not in documents:
+                        documents[row] = self._read_document(row)
+                    if matches_filter(documents[row].metadata, filter):
+                        matches.append((document_id(documents[row]), documents[row], score))
+                        if len(matches) == k:
+                            break
+                results.append(matches)
+            # Sin filtro, o con todos completos, o ya sin más candidatos: listo
+            if not filter or fetch >= self.count or all(len(matches) == k for matches in results):
+                return results
+            fetch *= _FILTER_OVERSAMPLE
+
+    async def _aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        if hasattr(self.embeddings, "aembed_queries"):
+            return await self.embeddings.aembed_queries(queries)
+        return [await self.embeddings.aembed_query(query) for query in queries]
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        """Embedding con el cliente async; el producto matricial, en un thread."""
+        if namespace:
+            return await self._namespace(namespace).asimilarity_search(query, k, filter)
+        query_embedding = await self.embeddings.aembed_query(query)
+        return await asyncio.to_thread(self._search_documents, query_embedding, k, filter)
+
+    async def asimilarity_search_batch(
+        self, queries: List[str], k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        if namespace:
+            return await self._namespace(namespace).asimilarity_search_batch(queries, k, filter)
+        if not queries:
+            return []
+        query_embeddings = await self._aembed_queries(queries)
+        return merge_results(await asyncio.to_thread(self._search_matches, query_embeddings, k, filter))
+
+    async def aadd_documents(self, documents: List[Document], namespace: str = "") -> None:
+        if namespace:
+            return await self._namespace(namespace).aadd_documents(documents)
+        unique = list({document_id(doc): doc for doc in documents}.items())
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        for start in range(0, len(unique), batch_size):
+            batch = unique[start:start + batch_size]
+            vectors = await self.embeddings.aembed_documents([doc.page_content for _, doc in batch])
+            await asyncio.to_thread(self.add_embeddings, batch, np.asarray(vectors, dtype=np.float32))
+        await asyncio.to_thread(self._maybe_train)
@@ -1,47 +1,218 @@
+import asyncio
 import os
-from typing import List
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from pinecone import Pinecone
-from langchain_openai import OpenAIEmbeddings
+from pinecone.exceptions import NotFoundException
 from langchain_core.documents import Document
-from src.core.vector_store import BaseVectorStore
+from src.core.config import settings
+from src.core.embeddings import get_embeddings
+from src.core.vector_store import BaseVectorStore, MetadataFilter, document_id, merge_results
 
 class PineconeStore(BaseVectorStore):
-    def __init__(self, index_name: str = None):
+    def __init__(
+        self,
+        index_name: str = None,
+        embedding_batch_size: Optional[int] = None,
+        upsert_batch_size: Optional[int] = None,
+        upsert_concurrency: Optional[int] = None,
+    ):
         api_key = os.getenv("PINECONE_API_KEY")
         self.pc = Pinecone(api_key=api_key)
         self.index_name = index_name or os.getenv("PINECONE_INDEX_NAME")
-        self.index = self.pc.Index(self.index_name)
-        self.embeddings = OpenAIEmbeddings()
-
-    def add_documents(self, documents: List[Document]) -> None:
-        """Añade documentos convirtiéndolos primero a vectores."""
-        vectors = []
-        for i, doc in enumerate(documents):
-            # Generar embedding del contenido
-            embedding = self.embeddings.embed_query(doc.page_content)
-            vectors.append({
-                "id": f"doc_{i}", # O un ID más robusto
-                "values": embedding,
-                "metadata": {**doc.metadata, "text": doc.page_content}
-            })
-        self.index.upsert(vectors=vectors)
-
-    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
-        """Busca documentos similares usando el cliente nativo."""
+        if settings.PINECONE_HOST:
+            self.index = self.pc.Index(host=settings.PINECONE_HOST)
+        else:
+            self.index = self.pc.Index(self.index_name)
+        self.embedding_batch_size = embedding_batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.upsert_batch_size = upsert_batch_size or settings.PINECONE_UPSERT_BATCH_SIZE
+        self.upsert_concurrency = upsert_concurrency or settings.PINECONE_UPSERT_CONCURRENCY
+        self.query_concurrency = settings.PINECONE_QUERY_CONCURRENCY
+        # Compartidos con la búsqueda y otros stores: textos ya embebidos salen de la caché
+        self.embeddings = get_embeddings()
+        # Cliente async (pool aiohttp propio): se abre en el event loop en el primer uso o en el warmup
+        self._async_index = None
+
+    def add_documents(self, documents: List[Document], namespace: str = "") -> None:
+        """
+        Añade documentos convirtiéndolos primero a vectores, en el namespace de Pinecone ``namespace``.
+
+        Los embeddings se piden por lotes de ``embedding_batch_size`` textos y
+        los vectores se suben en upserts de ``upsert_batch_size``, con hasta
+        ``upsert_concurrency`` en vuelo mientras se calcula el lote siguiente.
+        Los IDs son hashes del contenido (``document_id``).
+        """
+        unique = _unique(documents)
+
+        with ThreadPoolExecutor(max_workers=self.upsert_concurrency, thread_name_prefix="pinecone-upsert") as executor:
+            pending = deque()
+            for start in range(0, len(unique), self.embedding_batch_size):
+                batch = unique[start:start + self.embedding_batch_size]
+                embeddings = self.embeddings.embed_documents([doc.page_content for _, doc in batch])
+                vectors = _vectors(batch, embeddings)
+                for offset in range(0, len(vectors), self.upsert_batch_size):
+                    # Acotar los upserts en vuelo (y la memoria de vectores pendientes)
+                    while len(pending) >= self.upsert_concurrency:
+                        pending.popleft().result()
+                    chunk = vectors[offset:offset + self.upsert_batch_size]
+                    pending.append(executor.submit(self.index.upsert, vectors=chunk, namespace=namespace))
+            # Propagar el primer error de los upserts restantes
+            for future in pending:
+                future.result()
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        """Busca documentos similares usando el cliente nativo (el filtro y el namespace los aplica Pinecone)."""
         query_embedding = self.embeddings.embed_query(query)
         results = self.index.query(
             vector=query_embedding,
             top_k=k,
+            filter=filter,
+            namespace=namespace,
             include_metadata=True
         )
-        
-        docs = []
-        for match in results["matches"]:
-            metadata = match["metadata"]
-            text = metadata.pop("text", "")
-            docs.append(Document(page_content=text, metadata=metadata))
-        return docs
-
-    def delete_index(self) -> None:
-        """Limpia todos los vectores en el namesapce actual (simplificado)."""
-        self.index.delete(delete_all=True)
+        return _documents(results)
+
+    def similarity_search_batch(
+        self, queries: List[str], k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        """
+        Varias consultas: un embedding por lotes y hasta ``query_concurrency``
+        consultas al índice en paralelo, con el filtro aplicado en Pinecone.
+        """
+        if not queries:
+            return []
+        embeddings = self.embeddings.embed_queries(queries)
+        workers = min(len(embeddings), self.query_concurrency)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pinecone-query") as executor:
+            results = executor.map(
+                lambda vector: self.index.query(
+                    vector=vector, top_k=k, filter=filter, namespace=namespace, include_metadata=True
+                ),
+                embeddings,
+            )
+            return merge_results([_matches(result) for result in results])
+
+    def delete(self, ids: List[str], namespace: str = "") -> None:
+        """Borra vectores por ID, en lotes del tamaño de los upserts."""
+        for start in range(0, len(ids), self.upsert_batch_size):
+            self.index.delete(ids=ids[start:start + self.upsert_batch_size], namespace=namespace)
+
+    def delete_index(self, namespace: str = "") -> None:
+        """Limpia todos los vectores de ``namespace``."""
+        try:
+            self.index.delete(delete_all=True, namespace=namespace)
+        except NotFoundException:
+            # Namespace sin vectores: no hay nada que borrar
+            pass
+
+    async def _aindex(self):
+        if self._async_index is None:
+            host = settings.PINECONE_HOST or await asyncio.to_thread(
+                lambda: self.pc.describe_index(self.index_name).host
+            )
+            if self._async_index is None:
+                self._async_index = self.pc.IndexAsyncio(host=host)
+        return self._async_index
+
+    async def aadd_documents(self, documents: List[Document], namespace: str = "") -> None:
+        """Como ``add_documents``, con el cliente async: los upserts en vuelo no ocupan threads."""
+        index = await self._aindex()
+        unique = _unique(documents)
+        pending = deque()
+        try:
+            for start in range(0, len(unique), self.embedding_batch_size):
+                batch = unique[start:start + self.embedding_batch_size]
+                embeddings = await self.embeddings.aembed_documents([doc.page_content for _, doc in batch])
+                vectors = _vectors(batch, embeddings)
+                for offset in range(0, len(vectors), self.upsert_batch_size):
+                    while len(pending) >= self.upsert_concurrency:
+                        await pending.popleft()
+                    chunk = vectors[offset:offset + self.upsert_batch_size]
+                    pending.append(
+                        asyncio.create_task(index.upsert(vectors=chunk, namespace=namespace, show_progress=False))
+                    )
+            while pending:
+                await pending.popleft()
+        finally:
+            # Tras un error, no dejar upserts huérfanos
+            for task in pending:
+                task.cancel()
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        index = await self._aindex()
+        query_embedding = await self.embeddings.aembed_query(query)
+        results = await index.query(
+            vector=query_embedding, top_k=k, filter=filter, namespace=namespace, include_metadata=True
+        )
+        return _documents(results)
+
+    async def asimilarity_search_batch(
+        self, queries: List[str], k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        if not queries:
+            return []
+        index = await self._aindex()
+        embeddings = await self.embeddings.aembed_queries(queries)
+        semaphore = asyncio.Semaphore(self.query_concurrency)
+
+        async def query(vector: List[float]):
+            async with semaphore:
+                return await index.query(
+                    vector=vector, top_k=k, filter=filter, namespace=namespace, include_metadata=True
+                )
+
+        results = await asyncio.gather(*(query(vector) for vector in embeddings))
+        return merge_results([_matches(result) for result in results])
+
+    async def adelete(self, ids: List[str], namespace: str = "") -> None:
+        index = await self._aindex()
+        for start in range(0, len(ids), self.upsert_batch_size):
+            await index.delete(ids=ids[start:start + self.upsert_batch_size], namespace=namespace)
+
+    async def adelete_index(self, namespace: str = "") -> None:
+        index = await self._aindex()
+        try:
+            await index.delete(delete_all=True, namespace=namespace)
+        except NotFoundException:
+            pass
+
+    async def awarmup(self) -> None:
+        """Abre el cliente async y sus conexiones, y resuelve un embedding de consulta."""
+        index = await self._aindex()
+        await index.describe_index_stats()
+        await self.embeddings.aembed_query("warmup")
+
+    async def aclose(self) -> None:
+        if self._async_index is not None:
+            await self._async_index.close()
+            self._async_index = None
+
+
+def _unique(documents: List[Document]) -> list:
+    # Chunks repetidos en la misma subida: un solo vector
+    return list({document_id(doc): doc for doc in documents}.items())
+
+
+def _vectors(batch: list, embeddings: list) -> List[dict]:
+    return [
+        {"id": doc_id, "values": embedding, "metadata": {**doc.metadata, "text": doc.page_content}}
+        for (doc_id, doc), embedding in zip(batch, embeddings)
+    ]
+
+
+def _matches(results) -> List[Tuple[str, Document, float]]:
+    matches = []
+    for match in results["matches"]:
+        metadata = dict(match["metadata"] or {})
+        text = metadata.pop("text", "")
+        matches.append((match["id"], Document(page_content=text, metadata=metadata), match["score"]))
+    return matches
+
+
+def _documents(results) -> List[Document]:
+    return [doc for _, doc, _ in _matches(results)]
@@ -1,23 +1,48 @@
 
 import os
+import time
 import base64
+from functools import lru_cache
 
 from typing import TypedDict, Literal, List
-from openai import OpenAI
+from urllib.parse import urlparse
 from dotenv import load_dotenv
+from src.core import resilience
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.core.metrics import LLM_ERRORS, LLM_REQUEST_SECONDS
+from src.core.usage import record_usage
 from src.services.action_service import ActionService
 
 load_dotenv()
 
-# Initialize OpenAI client pointing to OpenRouter
-# Users can still use standard OpenAI by not setting OPENROUTER_BASE_URL (defaults to openai.com)
-client = OpenAI(
-    base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"),
-    api_key=os.getenv("OPENROUTER_API_KEY", os.getenv("GOOGLE_API_KEY")) # Fallback to GOOGLE_KEY if that's what they set
-)
+logger = get_logger(__name__)
+
+BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+@lru_cache(maxsize=None)
+def get_client():
+    """
+    OpenAI client pointing to OpenRouter, created on first use.
+    Users can still use standard OpenAI by not setting OPENROUTER_BASE_URL (defaults to openai.com)
+    """
+    from openai import OpenAI
+
+    return OpenAI(
+        base_url=BASE_URL,
+        api_key=os.getenv("OPENROUTER_API_KEY", os.getenv("GOOGLE_API_KEY")), # Fallback to GOOGLE_KEY if that's what they set
+        max_retries=settings.LLM_MAX_RETRIES,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+    )
 
 MODEL_NAME = os.getenv("MODEL_NAME", "google/gemini-2.0-flash-001")
 
+def _endpoints() -> list:
+    """Vision model plus the optional fallback, as (endpoint, model) pairs for the resilience layer."""
+    host = urlparse(BASE_URL).netloc
+    models = [MODEL_NAME] + ([settings.VIDEO_FALLBACK_MODEL] if settings.VIDEO_FALLBACK_MODEL else [])
+    return [(f"{model}@{host}", model) for model in models]
+
 class AgentState(TypedDict):
     frame_data: List[bytes]
     analysis: str
@@ -25,6 +50,37 @@ class AgentState(TypedDict):
     previous_risk_level: int # Memory
     action_result: dict
 
+def _completion_fields(response) -> dict:
+    """Summarizes a completion for logging instead of dumping the whole object."""
+    usage = getattr(response, "usage", None)
+    return {
+        "completion_id": getattr(response, "id", None),
+        "model": getattr(response, "model", None),
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+    }
+
+def _create_completion(role: str, messages: list):
+    """
+    Calls the vision model with hedging, fallback, circuit breaking and a
+    deadline (see src.core.resilience), recording latency, tokens and errors.
+    """
+    def attempt(model: str, is_hedge: bool):
+        start = time.perf_counter()
+        try:
+            response = get_client().chat.completions.create(model=model, messages=messages)
+        except Exception:
+            LLM_ERRORS.inc(model=model, role=role)
+            raise
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, model=model, role=role)
+
+        usage = getattr(response, "usage", None)
+        if usage:
+            record_usage(role, model, usage.prompt_tokens, usage.completion_tokens)
+        return response
+
+    return resilience.call(_endpoints(), attempt, key=role)
+
 def analyze_video(state: AgentState):
     frames = state["frame_data"]
     
@@ -34,7 +90,7 @@ def analyze_video(state: AgentState):
         step = len(frames) // max_frames
         frames = frames[::step][:max_frames]
     
-    print(f"Analyzing video chunk with {len(frames)} frames...")
+    logger.info("Analyzing video chunk", extra={"frame_count": len(frames)})
 
     content_parts = [{"type": "text", "text": "Describe objetivamente qué está sucediendo en esta secuencia de video. Sé detallado sobre cualquier movimiento, personas, o anomalías."}]
     
@@ -48,14 +104,11 @@ def analyze_video(state: AgentState):
         })
     
     try:
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": content_parts}],
-        )
-        print(f"--- ANALYZE_VIDEO RESPONSE ---\n{response}\n------------------------------")
+        response = _create_completion("analyze", [{"role": "user", "content": content_parts}])
+        logger.debug("analyze_video response", extra=_completion_fields(response))
         analysis_text = response.choices[0].message.content
     except Exception as e:
-        print(f"Analysis Error: {e}")
+        logger.error("Analysis error", extra={"error": str(e)})
         analysis_text = "Error analyzing video frames."
         
     return {"analysis": analysis_text}
@@ -90,13 +143,8 @@ def decide_action(state: AgentState):
     """
     
     try:
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        print(f"--- DECIDE_ACTION RESPONSE ---\n{response}\n------------------------------")
+        response = _create_completion("decide", [{"role": "user", "content": prompt}])
+        logger.debug("decide_action response", extra=_completion_fields(response))
         content = response.choices[0].message.content
         import re
         match = re.search(r'\d+', content)
@@ -106,7 +154,7 @@ def decide_action(state: AgentState):
             risk_level = prev_level # Maintain level if unsure
             
     except Exception as e:
-        print(f"Decision Error: {e}")
+        logger.error("Decision error", extra={"error": str(e)})
         risk_level = prev_level
 
     # Clamp to 0-5
@@ -4,22 +4,95 @@ load_dotenv()
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from contextlib import AsyncExitStack, asynccontextmanager
 from pathlib import Path
 import asyncio
 import json
+import os
+import time
 
+from src.core.checkpoint import open_checkpointers
 from src.core.config import settings
-from src.api.controllers import chat_router, health_router, admin_router
+from src.core.logger import configure_logging, get_logger
+from src.core.metrics import ANALYSIS_SECONDS
+from src.core.usage import usage_scope
+from src.api.controllers import chat_router, health_router, admin_router, metrics_router
+from src.api.dependencies import get_container
 from src.services.stream_service import stream_service
-from src.workflows.streaming_graph import streaming_graph
+
+logger = get_logger(__name__)
+
+
+def _warmup_graphs() -> None:
+    """Importa dependencias pesadas y compila los grafos."""
+    from src.workflows.streaming_graph import get_streaming_graph
+    
+    started = time.perf_counter()
+    try:
+        get_container().warmup()
+        get_streaming_graph()
+        logger.info("Grafos compilados", extra={"seconds": round(time.perf_counter() - started, 3)})
+    except Exception as e:
+        # No es fatal: los grafos se compilarán en la primera petición
+        logger.error("Error compilando grafos en el arranque", extra={"error": str(e)})
+
+
+async def _warmup_vectors(app: FastAPI) -> None:
+    """Crea el VectorService compartido (en un thread) y calienta sus clientes async."""
+    try:
+        vector_service = await asyncio.to_thread(get_container().get_vector_service)
+    except Exception as e:
+        # Sin vector store configurado: /ready lo reporta y la API sigue sirviendo el chat
+        app.state.vector_error = str(e)
+        logger.error("No se pudo crear el vector store", extra={"error": str(e)})
+        return
+    await vector_service.warmup()
+
+
+async def _close_vectors(app: FastAPI) -> None:
+    task = getattr(app.state, "vector_warmup", None)
+    if task is not None and not task.done():
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    container = get_container()
+    if container.has_vector_service():
+        await container.get_vector_service().close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranque de la aplicación.
+    
+    Abre los checkpointers, el estado compartido entre workers y la cola
+    de ingesta de documentos. La compilación de grafos y el warmup del
+    vector store se lanzan en segundo plano para que /health responda de
+    inmediato; /ready indica cuándo terminaron.
+    """
+    async with AsyncExitStack() as stack:
+        await open_checkpointers(stack)
+        await stream_service.start(run_analysis)
+        stack.push_async_callback(stream_service.stop)
+        ingestion_service = get_container().get_ingestion_service()
+        await ingestion_service.start()
+        stack.push_async_callback(ingestion_service.stop)
+        if settings.EAGER_GRAPH_COMPILE:
+            app.state.warmup = asyncio.create_task(asyncio.to_thread(_warmup_graphs))
+        if settings.VECTOR_WARMUP:
+            app.state.vector_warmup = asyncio.create_task(_warmup_vectors(app))
+        stack.push_async_callback(_close_vectors, app)
+        yield
 
 
 def create_app() -> FastAPI:
     """Factory para crear y configurar la aplicación FastAPI."""
+    configure_logging()
+    
     app = FastAPI(
         title=settings.PROJECT_NAME,
         version="0.1.0",
-        description="Sistema multi-agente con LangGraph para BI e investigación"
+        description="Sistema multi-agente con LangGraph para BI e investigación",
+        lifespan=lifespan,
     )
     
     # Middleware CORS
@@ -39,6 +112,7 @@ def create_app() -> FastAPI:
     app.include_router(health_router)
     app.include_router(chat_router)
     app.include_router(admin_router)
+    app.include_router(metrics_router)
 
     
     return app
@@ -57,12 +131,12 @@ async def broadcast_endpoint(websocket: WebSocket):
         while True:
             data = await websocket.receive_bytes()
             # New centralized logic
-            await stream_service.process_frame(data, run_analysis)
+            await stream_service.process_frame(data, source="websocket")
             
     except WebSocketDisconnect:
         stream_service.disconnect_broadcaster()
     except Exception as e:
-        print(f"Broadcaster error: {e}")
+        logger.error("Broadcaster error", extra={"error": str(e)})
         stream_service.disconnect_broadcaster()
 
 @app.post("/api/upload_frame")
@@ -76,10 +150,10 @@ async def upload_frame(request: Request):
         if not data:
             return {"status": "error", "message": "empty body"}
         
-        await stream_service.process_frame(data, run_analysis)
+        await stream_service.process_frame(data, source="http")
         return {"status": "ok"}
     except Exception as e:
-        print(f"HTTP Upload Error: {e}")
+        logger.error("HTTP upload error", extra={"error": str(e)})
         return {"status": "error", "detail": str(e)}
 
 @app.websocket("/ws/viewer")
@@ -103,30 +177,86 @@ async def run_analysis(frame_data: List[bytes]):
     # Run the graph
     try:
         # Inject memory: Pass the current (now previous) risk level
-        current_level = stream_service.current_risk_level
-        print(f"Running analysis. Previous Risk Level: {current_level}")
+        current_level = await stream_service.get_risk_level()
+        logger.info("Running analysis", extra={"previous_risk_level": current_level})
         
-        result = await streaming_graph.ainvoke({
-            "frame_data": frame_data,
-            "previous_risk_level": current_level
-        })
+        from src.workflows.streaming_graph import get_streaming_graph
+        
+        with usage_scope("video", thread_id="video"), ANALYSIS_SECONDS.time():
+            result = await get_streaming_graph().ainvoke({
+                "frame_data": frame_data,
+                "previous_risk_level": current_level
+            })
         
         # Extract action result and updated risk level
         action_result = result.get("action_result")
         new_risk_level = result.get("risk_level", 0)
         
-        # Update persistent state
-        stream_service.current_risk_level = new_risk_level
+        # Update persistent state (compartido entre workers)
+        await stream_service.set_risk_level(new_risk_level)
         
         if action_result:
             await stream_service.broadcast_alert(action_result)
             
     except Exception as e:
-        print(f"Analysis error: {e}")
+        logger.error("Analysis error", extra={"error": str(e)})
+
+def _hub_listening(path: str) -> bool:
+    """Si hay un hub de estado compartido aceptando conexiones en ``path``."""
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except OSError:
+            return False
+    return True
+
 
 def run_server():
     import uvicorn
-    uvicorn.run("src.api.app:app", host="0.0.0.0", port=8000, reload=True)
+    
+    workers = settings.API_WORKERS
+    if settings.API_RELOAD and workers > 1:
+        logger.warning("API_RELOAD solo admite un worker; se ignora API_WORKERS")
+        workers = 1
+    
+    hub = None
+    if workers > 1:
+        if settings.SHARED_STATE_BACKEND == "local":
+            # Los workers necesitan un estado compartido: lanzar el hub local
+            import multiprocessing
+            from src.core.shared_state import run_hub
+            
+            hub = multiprocessing.Process(
+                target=run_hub, args=(settings.SHARED_STATE_SOCKET,), daemon=True, name="shared-state-hub"
+            )
+            hub.start()
+            os.environ["SHARED_STATE_BACKEND"] = "socket"
+            os.environ["SHARED_STATE_SOCKET"] = settings.SHARED_STATE_SOCKET
+        elif settings.SHARED_STATE_BACKEND == "socket" and not _hub_listening(settings.SHARED_STATE_SOCKET):
+            # Con "socket" el hub es externo: sin él, los workers no comparten estado
+            logger.warning(
+                "SHARED_STATE_BACKEND=socket sin hub escuchando; arráncalo con python -m src.core.shared_state",
+                extra={"socket": settings.SHARED_STATE_SOCKET},
+            )
+        if settings.CHECKPOINT_BACKEND == "memory":
+            logger.warning(
+                "Con varios workers CHECKPOINT_BACKEND=memory no comparte conversaciones; usa sqlite",
+                extra={"workers": workers},
+            )
+    
+    try:
+        uvicorn.run(
+            "src.api.app:app",
+            host=settings.API_HOST,
+            port=settings.API_PORT,
+            reload=settings.API_RELOAD,
+            workers=workers,
+        )
+    finally:
+        if hub is not None:
+            hub.terminate()
 
 if __name__ == "__main__":
     run_server()
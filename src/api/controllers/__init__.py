@@ -1,5 +1,6 @@
 from .chat_controller import router as chat_router
 from .health_controller import router as health_router
 from .admin_controller import router as admin_router
+from .metrics_controller import router as metrics_router
 
-__all__ = ["chat_router", "health_router", "admin_router"]
+__all__ = ["chat_router", "health_router", "admin_router", "metrics_router"]
@@ -1,16 +1,42 @@
-from typing import List
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
 from fastapi.responses import FileResponse
 from pathlib import Path
 
+from src.api.dependencies import get_container, DependencyContainer
+from src.api.services.ingestion_service import IngestionQueueFull, IngestionService
 from src.api.services.vector_service import VectorService
+from src.core.tenants import TENANT_PATTERN, check_namespace
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+# Segundos sugeridos al cliente cuando la cola de ingesta está llena
+_QUEUE_FULL_RETRY_AFTER = 10
 
-def get_vector_service() -> VectorService:
-    """Dependency injection para VectorService."""
-    return VectorService()
+# Tenant de los documentos (namespace del vector store); sin él, el namespace por defecto
+TenantQuery = Query(default=None, pattern=TENANT_PATTERN, description="Tenant de los documentos")
+
+
+def get_vector_service(
+    container: DependencyContainer = Depends(get_container)
+) -> VectorService:
+    """Dependency injection para VectorService (compartido, creado en el lifespan)."""
+    return container.get_vector_service()
+
+
+def get_ingestion_service(
+    container: DependencyContainer = Depends(get_container)
+) -> IngestionService:
+    """Dependency injection para IngestionService."""
+    return container.get_ingestion_service()
+
+
+def _queue_full() -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Ingestion queue is full, retry later",
+        headers={"Retry-After": str(_QUEUE_FULL_RETRY_AFTER)},
+    )
 
 
 @router.get("/")
@@ -22,40 +48,118 @@ async def admin_page():
     return FileResponse(static_path)
 
 
-@router.post("/upload-documents")
-async def upload_documents(files: List[UploadFile] = File(...)):
+@router.post("/upload-documents", status_code=202)
+async def upload_documents(
+    files: List[UploadFile] = File(...),
+    tenant: Optional[str] = TenantQuery,
+    service: IngestionService = Depends(get_ingestion_service),
+):
     """
     Endpoint para subir documentos y procesarlos en la vector DB.
     
+    Los archivos se guardan en disco y se procesan en un job en segundo
+    plano; la respuesta incluye ``job_id`` y ``status_url`` para seguirlo.
+    Con ``?tenant=`` se indexan en el namespace de ese tenant.
+    
     ADVERTENCIA: Este endpoint permite cargar documentos a la base vectorial.
     Debe estar protegido o comentado en producción.
     """
     if not files:
         raise HTTPException(status_code=400, detail="No files provided")
     
-    vector_service = get_vector_service()
-    
-    # Leer contenido de archivos
-    file_data = []
-    for file in files:
-        content = await file.read()
-        file_data.append((file.filename, content))
+    try:
+        job = service.new_job(tenant)
+    except IngestionQueueFull:
+        raise _queue_full()
     
+    # Copiar las subidas a disco por bloques (sin leerlas enteras en memoria)
     try:
-        result = await vector_service.process_and_store_files(file_data)
-        return {
-            "message": "Documents processed successfully",
-            **result
-        }
+        for file in files:
+            await service.add_file(job, file.filename, file.file)
+        service.submit(job)
+    except IngestionQueueFull:
+        raise _queue_full()
     except Exception as e:
+        service.discard(job)
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "message": "Documents queued for processing",
+        "status_url": f"{router.prefix}/jobs/{job.job_id}",
+        **job.to_dict(),
+    }
+
+
+@router.get("/jobs")
+async def list_jobs(
+    tenant: Optional[str] = TenantQuery,
+    service: IngestionService = Depends(get_ingestion_service),
+):
+    """Jobs de ingesta recientes, del más nuevo al más antiguo (solo los de ``tenant`` si se indica)."""
+    jobs = service.list_jobs()
+    if tenant is not None:
+        jobs = [job for job in jobs if job.tenant == tenant]
+    return {"jobs": [job.to_dict() for job in jobs]}
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str, service: IngestionService = Depends(get_ingestion_service)):
+    """Estado de un job de ingesta y de cada uno de sus archivos."""
+    job = service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 
 @router.get("/vector-stats")
-async def vector_stats():
-    """Obtiene estadísticas de la base de datos vectorial."""
-    # Implementar según tu vector store
-    return {
+async def vector_stats(
+    tenant: Optional[str] = TenantQuery,
+    container: DependencyContainer = Depends(get_container),
+):
+    """Obtiene estadísticas de la base de datos vectorial (y de las fuentes de ``tenant`` si se indica)."""
+    from src.core.embeddings import get_embeddings
+    from src.core.keyword_index import get_keyword_index
+
+    stats = {
         "status": "ok",
-        "message": "Vector DB stats endpoint - implement based on your vector store"
+        # Chunks en el índice BM25 de internal_search (todos los tenants)
+        "keyword_index_chunks": get_keyword_index().count(),
+        # Aciertos de la caché de embeddings en este worker
+        "embedding_cache": get_embeddings().stats(),
     }
+    # Caché de búsquedas de este worker (si el vector store ya se creó)
+    from src.core.search_cache import CachedVectorStore
+    from src.core.vector_factory import get_shared_vector_store
+    if get_shared_vector_store.cache_info().currsize and isinstance(get_shared_vector_store(), CachedVectorStore):
+        stats["search_cache"] = get_shared_vector_store().stats()
+    if tenant is not None:
+        stats["tenant"] = {"name": tenant, **container.get_vector_service().namespace_stats(tenant)}
+    return stats
+
+
+@router.delete("/documents")
+async def clear_documents(
+    tenant: Optional[str] = TenantQuery,
+    vector_service: VectorService = Depends(get_vector_service),
+):
+    """
+    Borra todos los documentos de un tenant (vectores, índice BM25 y
+    manifest) para reconstruirlo; los de los demás tenants no se tocan.
+    Sin ``tenant``, vacía el namespace por defecto.
+    """
+    namespace = check_namespace(tenant)
+    deleted = await vector_service.aclear_namespace(namespace)
+    return {"tenant": tenant, "deleted_chunks": deleted}
+
+
+@router.delete("/documents/{source}")
+async def delete_document(
+    source: str,
+    tenant: Optional[str] = TenantQuery,
+    vector_service: VectorService = Depends(get_vector_service),
+):
+    """Borra un documento (todos sus chunks) del namespace de ``tenant``."""
+    deleted = await vector_service.adelete_source(source, check_namespace(tenant))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"tenant": tenant, "source": source, "deleted_chunks": deleted}
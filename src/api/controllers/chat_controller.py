@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import StreamingResponse
 
-from src.api.schemas.chat_schemas import ChatRequest, ChatResponse
+from src.api.schemas.chat_schemas import ChatRequest, ChatResponse, ChatBatchRequest
 from src.api.services.chat_service import ChatService
 from src.api.dependencies import get_container, DependencyContainer
 
@@ -15,23 +15,56 @@ def get_chat_service(
     return container.get_chat_service()
 
 
+def get_client_id(http_request: Request) -> str:
+    """Identifica al cliente para el reparto justo de la cola de admisión."""
+    client_id = http_request.headers.get("x-client-id")
+    if client_id:
+        return client_id
+    return http_request.client.host if http_request.client else "anonymous"
+
+
 @router.post("", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
-    service: ChatService = Depends(get_chat_service)
+    service: ChatService = Depends(get_chat_service),
+    client_id: str = Depends(get_client_id),
 ) -> ChatResponse:
     """
     Endpoint para interactuar con el sistema multi-agente vía supervisor.
     """
-    return await service.chat(request, agent_type="supervisor")
+    return await service.chat(request, agent_type="supervisor", client_id=client_id)
 
 
 @router.post("/stream")
 async def chat_stream(
     request: ChatRequest,
-    service: ChatService = Depends(get_chat_service)
+    http_request: Request,
+    service: ChatService = Depends(get_chat_service),
+    client_id: str = Depends(get_client_id),
 ) -> StreamingResponse:
     """
     Stream del sistema multi-agente con supervisor.
+    
+    ``protocol: 2`` activa el formato compacto; la respuesta se comprime
+    (gzip/br) si el cliente lo acepta.
+    """
+    return await service.chat_stream(
+        request,
+        agent_type="supervisor",
+        client_id=client_id,
+        accept_encoding=http_request.headers.get("accept-encoding", ""),
+    )
+
+
+@router.post("/batch")
+async def chat_batch(
+    batch: ChatBatchRequest,
+    service: ChatService = Depends(get_chat_service),
+    client_id: str = Depends(get_client_id),
+) -> StreamingResponse:
+    """
+    Procesa muchas peticiones independientes (análisis offline).
+    
+    Responde NDJSON: una línea por petición a medida que terminan.
     """
-    return service.chat_stream(request, agent_type="supervisor")
+    return await service.chat_batch(batch, agent_type="supervisor", client_id=client_id)
@@ -1,4 +1,7 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+from src.api.dependencies import get_container
 from src.core.config import settings
 
 router = APIRouter(prefix="", tags=["health"])
@@ -8,3 +11,35 @@ router = APIRouter(prefix="", tags=["health"])
 async def health():
     """Health check endpoint."""
     return {"status": "ok", "project": settings.PROJECT_NAME}
+
+
+def _task_state(task) -> str:
+    if task is None:
+        return "skipped"
+    return "done" if task.done() else "running"
+
+
+@router.get("/ready")
+async def ready(request: Request):
+    """
+    Readiness: 503 mientras los warmups del arranque siguen en curso.
+    
+    Un vector store que falló al calentar no bloquea el tráfico (el chat
+    funciona sin él): responde 200 con ``status: degraded`` y el error.
+    """
+    graphs = _task_state(getattr(request.app.state, "warmup", None))
+    vectors = {"warmup": _task_state(getattr(request.app.state, "vector_warmup", None))}
+    container = get_container()
+    error = getattr(request.app.state, "vector_error", None)
+    if container.has_vector_service():
+        vector_service = container.get_vector_service()
+        vectors["warmup_seconds"] = vector_service.warmup_seconds
+        error = error or vector_service.warmup_error
+    if error:
+        vectors["error"] = error
+    
+    if "running" in (graphs, vectors["warmup"]):
+        status, code = "starting", 503
+    else:
+        status, code = ("degraded" if error else "ready"), 200
+    return JSONResponse({"status": status, "graphs": graphs, "vector_store": vectors}, status_code=code)
@@ -1,38 +1,111 @@
-from typing import Dict
+import asyncio
+import threading
+from typing import Callable, Dict, Iterator, Mapping
 from functools import lru_cache
 
 from src.api.interfaces import Agent
 from src.api.services.agent_service import AgentService
+from src.api.services.admission_service import AdmissionController
 from src.api.services.chat_service import ChatService
-from src.supervisor.graph import supervisor_agent
-from src.agents.business_intelligence.graph import business_intelligence_agent
-from src.agents.researcher.graph import researcher_agent
+from src.api.services.ingestion_service import IngestionService
+from src.api.services.vector_service import VectorService
+from src.core.config import settings
+
+
+def _supervisor_agent() -> Agent:
+    from src.supervisor.graph import get_supervisor_agent
+    return get_supervisor_agent()
+
+
+def _business_intelligence_agent() -> Agent:
+    from src.agents.business_intelligence.graph import get_business_intelligence_agent
+    return get_business_intelligence_agent()
+
+
+def _researcher_agent() -> Agent:
+    from src.agents.researcher.graph import get_researcher_agent
+    return get_researcher_agent()
+
+
+class LazyAgents(Mapping[str, Agent]):
+    """
+    Registro de agentes que importa y compila cada grafo en el primer acceso.
+    
+    Así importar la API no carga langchain/langgraph ni compila grafos; la
+    compilación ocurre en el warmup del lifespan o en la primera petición.
+    Desde el event loop se usa ``aget``: compilar (o esperar a que el warmup
+    termine de compilar ese grafo) tarda más de un segundo y bloquearía el loop.
+    """
+    
+    def __init__(self, factories: Dict[str, Callable[[], Agent]]):
+        self._factories = factories
+        self._agents: Dict[str, Agent] = {}
+        # Un lock por agente: compilar uno no hace esperar a quien pide otro ya listo
+        self._locks = {agent_type: threading.Lock() for agent_type in factories}
+    
+    def __getitem__(self, agent_type: str) -> Agent:
+        agent = self._agents.get(agent_type)
+        if agent is not None:
+            return agent
+        factory = self._factories[agent_type]
+        with self._locks[agent_type]:
+            if agent_type not in self._agents:
+                self._agents[agent_type] = factory()
+            return self._agents[agent_type]
+    
+    async def aget(self, agent_type: str) -> Agent:
+        """Como ``self[agent_type]``, pero compila o espera la compilación en un thread."""
+        agent = self._agents.get(agent_type)
+        if agent is not None:
+            return agent
+        if agent_type not in self._factories:
+            raise KeyError(agent_type)
+        return await asyncio.to_thread(self.__getitem__, agent_type)
+    
+    def __contains__(self, agent_type: object) -> bool:
+        return agent_type in self._factories
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._factories)
+    
+    def __len__(self) -> int:
+        return len(self._factories)
 
 
 class DependencyContainer:
     """Contenedor de dependencias para la aplicación."""
     
     def __init__(self):
-        self._agents: Dict[str, Agent] = {}
+        self._agents: Mapping[str, Agent] = {}
         self._agent_service: AgentService | None = None
         self._chat_service: ChatService | None = None
+        self._ingestion_service: IngestionService | None = None
+        self._vector_service: VectorService | None = None
+        self._vector_lock = threading.Lock()
         self._initialize()
     
     def _initialize(self):
         """Inicializa las dependencias."""
-        # Registrar agentes
-        self._agents = {
-            "supervisor": supervisor_agent,
-            "bi": business_intelligence_agent,
-            "researcher": researcher_agent,
-        }
+        # Registrar agentes (se compilan bajo demanda)
+        self._agents = LazyAgents({
+            "supervisor": _supervisor_agent,
+            "bi": _business_intelligence_agent,
+            "researcher": _researcher_agent,
+        })
         
         # Registrar servicios
         self._agent_service = AgentService()
+        self._admission = AdmissionController(
+            max_concurrency=settings.CHAT_MAX_CONCURRENCY,
+            max_queue=settings.CHAT_MAX_QUEUE,
+            queue_timeout=settings.CHAT_QUEUE_TIMEOUT_SECONDS,
+        )
         self._chat_service = ChatService(
             agents=self._agents,
-            agent_service=self._agent_service
+            agent_service=self._agent_service,
+            admission=self._admission,
         )
+        self._ingestion_service = IngestionService(vector_service=self.get_vector_service)
     
     def get_agent(self, agent_type: str) -> Agent:
         """Obtiene un agente por tipo."""
@@ -40,6 +113,11 @@ class DependencyContainer:
             raise ValueError(f"Agent type '{agent_type}' not found")
         return self._agents[agent_type]
     
+    def warmup(self) -> None:
+        """Compila todos los grafos (se ejecuta en segundo plano al arrancar)."""
+        for agent_type in self._agents:
+            self.get_agent(agent_type)
+    
     def get_agent_service(self) -> AgentService:
         """Obtiene el servicio de agentes."""
         if self._agent_service is None:
@@ -51,6 +129,28 @@ class DependencyContainer:
         if self._chat_service is None:
             raise RuntimeError("ChatService not initialized")
         return self._chat_service
+    
+    def get_vector_service(self) -> VectorService:
+        """
+        Obtiene el servicio vectorial compartido (lo crea en el primer uso).
+        
+        Crear el vector store importa su cliente y abre conexiones: llamar
+        fuera del event loop (warmup del lifespan o dependencias síncronas).
+        """
+        if self._vector_service is None:
+            with self._vector_lock:
+                if self._vector_service is None:
+                    self._vector_service = VectorService()
+        return self._vector_service
+    
+    def has_vector_service(self) -> bool:
+        return self._vector_service is not None
+    
+    def get_ingestion_service(self) -> IngestionService:
+        """Obtiene el servicio de ingesta de documentos."""
+        if self._ingestion_service is None:
+            raise RuntimeError("IngestionService not initialized")
+        return self._ingestion_service
 
 
 # Singleton del contenedor
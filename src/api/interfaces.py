@@ -1,4 +1,4 @@
-from typing import Protocol, Any, AsyncIterator
+from typing import Protocol, Any, AsyncIterator, Iterator
 
 
 class Agent(Protocol):
@@ -8,9 +8,13 @@ class Agent(Protocol):
         """Invoca el agente de forma asíncrona."""
         ...
     
-    def stream(self, inputs: dict, config: dict) -> AsyncIterator[dict]:
+    def stream(self, inputs: dict, config: dict) -> Iterator[dict]:
         """Stream del agente."""
         ...
+    
+    def astream(self, inputs: dict, config: dict, **kwargs: Any) -> AsyncIterator[Any]:
+        """Stream asíncrono del agente (``stream_mode`` opcional)."""
+        ...
 
 
 class IAgentService(Protocol):
@@ -27,8 +31,8 @@ class IAgentService(Protocol):
         ...
     
     @staticmethod
-    def serialize_event(event: dict) -> dict:
-        """Serializa evento del stream."""
+    def create_serializer(request: Any = None) -> Any:
+        """Crea un serializador de eventos con estado propio para un stream."""
         ...
     
     @staticmethod
@@ -40,10 +44,16 @@ class IAgentService(Protocol):
 class IChatService(Protocol):
     """Interfaz para servicio de chat."""
     
-    async def chat(self, request: Any, agent_type: str) -> Any:
+    async def chat(self, request: Any, agent_type: str, client_id: str) -> Any:
         """Procesa mensaje y retorna respuesta."""
         ...
     
-    def chat_stream(self, request: Any, agent_type: str) -> Any:
+    async def chat_stream(
+        self, request: Any, agent_type: str, client_id: str, accept_encoding: str
+    ) -> Any:
         """Procesa mensaje y retorna stream SSE."""
         ...
+    
+    async def chat_batch(self, batch: Any, agent_type: str, client_id: str) -> Any:
+        """Procesa un lote de mensajes y retorna stream NDJSON."""
+        ...
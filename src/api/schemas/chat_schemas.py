@@ -1,12 +1,45 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Dict, List, Literal, Optional
+
+from src.core.tenants import TENANT_PATTERN
 
 
 class ChatRequest(BaseModel):
     message: str
     thread_id: Optional[str] = "default_thread"
+    # Protocolo de /chat/stream: 1 = eventos completos, 2 = compacto con deltas de tokens
+    protocol: Literal[1, 2] = 1
+    # Recorta el contenido de tool_result a este número de caracteres
+    max_tool_chars: Optional[int] = Field(default=None, ge=0)
+    # Protocolo v2: ventana de agrupación de deltas (ms); más alta = menos bytes y menos eventos
+    delta_window_ms: Optional[float] = Field(default=None, ge=0)
+    # Tenant cuyos documentos consulta internal_search (None = namespace por defecto)
+    tenant: Optional[str] = Field(default=None, pattern=TENANT_PATTERN)
+
+    @model_validator(mode="after")
+    def _check_thread_id(self) -> "ChatRequest":
+        # Sin tenant, "acme:t1" sería el thread "t1" del tenant "acme" (ver src.core.tenants.thread_key)
+        if not self.tenant and self.thread_id and ":" in self.thread_id:
+            raise ValueError("thread_id no puede contener ':' sin tenant")
+        return self
 
 
 class ChatResponse(BaseModel):
     response: str
     thread_id: str
+    # Tokens y coste de la petición, por nodo y modelo (ver src.core.usage)
+    usage: Optional[Dict[str, Any]] = None
+
+
+class ChatBatchRequest(BaseModel):
+    requests: List[ChatRequest] = Field(..., min_length=1)
+    # Máximo de peticiones del lote en curso a la vez (acotado por configuración)
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+
+
+class ChatBatchItemResult(BaseModel):
+    index: int
+    thread_id: str
+    response: Optional[str] = None
+    error: Optional[str] = None
+    usage: Optional[Dict[str, Any]] = None
@@ -0,0 +1,193 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict
+
+from src.core.logger import get_logger
+from src.core.metrics import registry
+
+logger = get_logger(__name__)
+
+ADMISSION_ACTIVE = registry.gauge("chat_admission_active", "Ejecuciones de grafo en curso.")
+ADMISSION_QUEUED = registry.gauge("chat_admission_queued", "Peticiones esperando turno.")
+ADMISSION_REJECTED = registry.counter(
+    "chat_admission_rejected_total", "Peticiones rechazadas por control de admisión.", ["reason"]
+)
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    "chat_admission_wait_seconds", "Tiempo de espera en cola antes de ejecutar."
+)
+
+
+class AdmissionRejected(Exception):
+    """La petición no fue admitida (cola llena o espera agotada)."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _ThreadLock:
+    """Lock FIFO por thread_id con contador de usuarios para poder liberarlo."""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class AdmissionTicket:
+    """Permiso de ejecución; ``release()`` es idempotente."""
+
+    def __init__(self, controller: "AdmissionController", thread_id: str, admitted_at: float):
+        self._controller = controller
+        self._thread_id = thread_id
+        self._admitted_at = admitted_at
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(self._thread_id, time.monotonic() - self._admitted_at)
+
+
+class AdmissionController:
+    """
+    Control de admisión para ejecuciones del grafo de chat.
+
+    - Límite global de ejecuciones concurrentes (``max_concurrency``).
+    - Cola de espera acotada (``max_queue``); si está llena se rechaza al
+      instante con un ``retry_after`` estimado.
+    - Orden estricto por ``thread_id``: dos peticiones del mismo thread nunca
+      corren a la vez sobre el mismo checkpoint.
+    - Reparto round-robin de los huecos libres entre clientes, para que un
+      cliente con muchas peticiones no acapare la cola.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._queued = 0
+        # cliente -> futuros esperando hueco (el orden del dict es el turno)
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._thread_locks: Dict[str, _ThreadLock] = {}
+        # Media móvil del tiempo de servicio, para estimar Retry-After
+        self._avg_service_time = 1.0
+
+    def retry_after(self) -> float:
+        """Estimación de cuándo habrá hueco, en segundos."""
+        backlog = self._queued + 1
+        return max(1.0, math.ceil(self._avg_service_time * backlog / self.max_concurrency))
+
+    async def acquire(self, client_id: str, thread_id: str) -> AdmissionTicket:
+        """
+        Espera turno para ejecutar.
+
+        Raises:
+            AdmissionRejected: si la cola está llena o la espera supera ``queue_timeout``
+        """
+        thread_lock = self._thread_locks.get(thread_id)
+        can_run_now = (
+            self._active < self.max_concurrency
+            and not self._waiters
+            and (thread_lock is None or not thread_lock.lock.locked())
+        )
+        if not can_run_now and self._queued >= self.max_queue:
+            ADMISSION_REJECTED.inc(reason="queue_full")
+            raise AdmissionRejected("queue_full", self.retry_after())
+
+        if thread_lock is None:
+            thread_lock = self._thread_locks[thread_id] = _ThreadLock()
+        thread_lock.users += 1
+
+        queued_at = time.monotonic()
+        self._set_queued(self._queued + 1)
+        holds_thread = False
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await thread_lock.lock.acquire()
+                holds_thread = True
+                await self._acquire_slot(client_id)
+        except TimeoutError:
+            self._release_thread(thread_id, holds_thread)
+            ADMISSION_REJECTED.inc(reason="timeout")
+            raise AdmissionRejected("timeout", self.retry_after()) from None
+        except BaseException:
+            self._release_thread(thread_id, holds_thread)
+            raise
+        finally:
+            self._set_queued(self._queued - 1)
+
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - queued_at)
+        return AdmissionTicket(self, thread_id, time.monotonic())
+
+    async def _acquire_slot(self, client_id: str) -> None:
+        if self._active < self.max_concurrency and not self._waiters:
+            self._set_active(self._active + 1)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(client_id, deque()).append(future)
+        try:
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # El hueco llegó a asignarse: devolverlo
+                self._release_slot()
+            else:
+                self._remove_waiter(client_id, future)
+            raise
+
+    def _remove_waiter(self, client_id: str, future: asyncio.Future) -> None:
+        queue = self._waiters.get(client_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+        if not queue:
+            del self._waiters[client_id]
+
+    def _release(self, thread_id: str, service_time: float) -> None:
+        self._avg_service_time = 0.9 * self._avg_service_time + 0.1 * service_time
+        self._release_slot()
+        self._release_thread(thread_id, True)
+
+    def _release_slot(self) -> None:
+        # Round-robin: el primer cliente de la cola recibe el hueco y pasa al final
+        while self._waiters:
+            client_id, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiters.move_to_end(client_id)
+            else:
+                del self._waiters[client_id]
+            if not future.done():
+                # El hueco pasa directamente al siguiente: _active no cambia
+                future.set_result(None)
+                return
+        self._set_active(self._active - 1)
+
+    def _release_thread(self, thread_id: str, holds_lock: bool) -> None:
+        thread_lock = self._thread_locks.get(thread_id)
+        if thread_lock is None:
+            return
+        if holds_lock:
+            thread_lock.lock.release()
+        thread_lock.users -= 1
+        if thread_lock.users <= 0:
+            del self._thread_locks[thread_id]
+
+    def _set_active(self, value: int) -> None:
+        self._active = value
+        ADMISSION_ACTIVE.set(value)
+
+    def _set_queued(self, value: int) -> None:
+        self._queued = value
+        ADMISSION_QUEUED.set(value)
@@ -1,27 +1,24 @@
 from typing import Optional, List, Dict, Any
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from src.api.schemas.chat_schemas import ChatRequest
+from src.core.tenants import thread_key
 
+# Los mensajes de langchain_core se importan en cada método: este módulo se
+# carga al arrancar la API y langchain no es necesario hasta la primera petición.
 
-class AgentService:
-    """Servicio para gestionar agentes y configuración."""
+
+class StreamEventSerializer:
+    """
+    Serializa los eventos de UN stream al formato del frontend.
     
-    def __init__(self):
+    Guarda el estado necesario para los handoffs (nodo anterior, última
+    decisión del supervisor), por lo que se crea una instancia por petición
+    y nunca se comparte entre streams concurrentes.
+    """
+    
+    def __init__(self, max_tool_chars: Optional[int] = None):
         self._previous_node = None
         self._last_supervisor_decision = None
-    
-    @staticmethod
-    def build_inputs(request: ChatRequest) -> dict:
-        """Construye los inputs para el agente."""
-        return {"messages": [HumanMessage(content=request.message)]}
-    
-    @staticmethod
-    def build_config(request: ChatRequest) -> dict:
-        """Construye la configuración del agente."""
-        return {
-            "configurable": {"thread_id": request.thread_id},
-            "recursion_limit": 25
-        }
+        self._max_tool_chars = max_tool_chars
     
     def serialize_event(self, event: dict) -> List[Dict[str, Any]]:
         """
@@ -37,53 +34,22 @@ class AgentService:
             if node_name.startswith("__"):
                 continue
             
+            # Handoff en cada transición entre nodos (supervisor → agente,
+            # agente → tools, tools → agente, researcher → BI, agente → supervisor)
+            if self._previous_node and self._previous_node != node_name:
+                events.append({
+                    "type": "handoff",
+                    "from": self._previous_node,
+                    "to": node_name
+                })
+            
             # Procesar según el tipo de nodo
             if node_name == "supervisor":
                 events.extend(self._process_supervisor_event(node_name, values))
             elif node_name == "tools":
-                # Handoff del agente que llamó tools → tools
-                if self._previous_node and self._previous_node != "tools":
-                    events.append({
-                        "type": "handoff",
-                        "from": self._previous_node,
-                        "to": "tools"
-                    })
                 events.extend(self._process_tools_event(values))
             elif node_name in ["researcher", "business_intelligence"]:
-                # Handoff apropiado según de dónde viene
-                if self._previous_node == "supervisor":
-                    # supervisor → agente
-                    events.append({
-                        "type": "handoff",
-                        "from": "supervisor",
-                        "to": node_name
-                    })
-                elif self._previous_node == "tools":
-                    # tools → agente (volviendo después de ejecutar tool)
-                    events.append({
-                        "type": "handoff",
-                        "from": "tools",
-                        "to": node_name
-                    })
-                
                 events.extend(self._process_agent_event(node_name, values))
-                
-                # Si el agente no tiene tool_calls, volverá a supervisor
-                # (detectamos esto viendo si tiene tool_calls en el último mensaje)
-                messages = values.get("messages", [])
-                if messages:
-                    last_msg = messages[-1]
-                    has_tool_calls = (isinstance(last_msg, AIMessage) and 
-                                    hasattr(last_msg, "tool_calls") and 
-                                    last_msg.tool_calls)
-                    
-                    if not has_tool_calls:
-                        # El agente terminó sin tool_calls, volverá a supervisor
-                        events.append({
-                            "type": "handoff",
-                            "from": node_name,
-                            "to": "supervisor"
-                        })
             
             self._previous_node = node_name
         
@@ -124,27 +90,38 @@ class AgentService:
     
     def _process_tools_event(self, values: dict) -> List[Dict[str, Any]]:
         """Procesa eventos de ejecución de tools."""
+        from langchain_core.messages import ToolMessage
+        
         events = []
         messages = values.get("messages", [])
         
         for msg in messages:
             if isinstance(msg, ToolMessage):
-                events.append({
+                event = {
                     "type": "tool_result",
                     "tool_name": getattr(msg, "name", "unknown"),
                     "call_id": getattr(msg, "tool_call_id", ""),
                     "content": msg.content
-                })
+                }
+                content, length = truncate_tool_content(msg.content, self._max_tool_chars)
+                if length is not None:
+                    event.update(content=content, truncated=True, length=length)
+                events.append(event)
         
         return events
     
     def _process_agent_event(self, agent_name: str, values: dict) -> List[Dict[str, Any]]:
         """Procesa eventos de agentes (researcher, business_intelligence)."""
+        from langchain_core.messages import AIMessage, ToolMessage
+        
         events = []
         messages = values.get("messages", [])
         
         for msg in messages:
-            if isinstance(msg, AIMessage):
+            if isinstance(msg, ToolMessage):
+                # Tools ejecutadas por el propio agente (researcher directo)
+                events.extend(self._process_tools_event({"messages": [msg]}))
+            elif isinstance(msg, AIMessage):
                 # Si tiene tool_calls, es un mensaje de reasoning
                 if hasattr(msg, "tool_calls") and msg.tool_calls:
                     # Mensaje de reasoning (antes de llamar tools)
@@ -186,6 +163,203 @@ class AgentService:
                         })
         
         return events
+
+
+def truncate_tool_content(content: Any, limit: Optional[int]):
+    """
+    Recorta el resultado de una tool a ``limit`` caracteres.
+    
+    Returns:
+        (contenido, longitud original o None si no se recortó)
+    """
+    text = content if isinstance(content, str) else str(content)
+    if limit is None or len(text) <= limit:
+        return content, None
+    return text[:limit], len(text)
+
+
+class CompactEventSerializer:
+    """
+    Protocolo v2 (compacto) para UN stream.
+    
+    - Claves cortas: ``t`` (tipo), ``n`` (referencia de mensaje), ``c`` (contenido).
+    - El contenido de cada respuesta se envía una sola vez, como deltas de
+      tokens (``d``); ``m`` abre un mensaje con su agente y ``e`` lo cierra.
+    - El evento final referencia el último mensaje en lugar de repetirlo.
+    - Los resultados de tools pueden recortarse con ``max_tool_chars``.
+    
+    Eventos: ``hello``, ``r`` (routing), ``h`` (handoff), ``m``/``d``/``e``
+    (mensajes), ``tc`` (tool call), ``tr`` (tool result), ``f`` (final).
+    """
+    
+    VERSION = 2
+    # Solo se transmiten tokens de los agentes (no el JSON de routing del supervisor)
+    STREAMED_NODES = ("researcher", "business_intelligence")
+    
+    def __init__(self, max_tool_chars: Optional[int] = None):
+        self._max_tool_chars = max_tool_chars
+        self._previous_node = None
+        self._refs: Dict[str, int] = {}
+        self._streamed: set = set()
+        self._last_ref: Optional[int] = None
+    
+    def hello(self) -> Dict[str, Any]:
+        return {"t": "hello", "v": self.VERSION}
+    
+    def _enter(self, node: str, events: List[Dict[str, Any]]) -> None:
+        # Handoff al entrar en un nodo distinto (por su primer token o su actualización)
+        if self._previous_node and self._previous_node != node:
+            events.append({"t": "h", "f": self._previous_node, "to": node})
+        self._previous_node = node
+    
+    def _open(self, message_id: Optional[str], agent: str, events: List[Dict[str, Any]]) -> int:
+        key = message_id or f"anon-{len(self._refs)}"
+        ref = self._refs.get(key)
+        if ref is None:
+            ref = self._refs[key] = len(self._refs) + 1
+            events.append({"t": "m", "n": ref, "a": agent})
+        return ref
+    
+    def serialize_token(self, chunk: Any, metadata: dict) -> List[Dict[str, Any]]:
+        """Evento ``d`` por cada token de un agente (stream_mode="messages")."""
+        node = metadata.get("langgraph_node")
+        # Las respuestas especulativas se envían solo si se usan (en la actualización del nodo)
+        if node not in self.STREAMED_NODES or metadata.get("speculative"):
+            return []
+        # En modo "messages" también llegan los ToolMessage devueltos por los nodos
+        if getattr(chunk, "type", None) not in ("AIMessageChunk", "ai"):
+            return []
+        content = getattr(chunk, "content", None)
+        if not content or not isinstance(content, str):
+            return []
+        events: List[Dict[str, Any]] = []
+        self._enter(node, events)
+        ref = self._open(getattr(chunk, "id", None), node, events)
+        self._streamed.add(ref)
+        events.append({"t": "d", "n": ref, "c": content})
+        return events
+    
+    def serialize_update(self, event: dict) -> List[Dict[str, Any]]:
+        """Eventos de fin de nodo (stream_mode="updates")."""
+        from langchain_core.messages import AIMessage, ToolMessage
+        
+        events: List[Dict[str, Any]] = []
+        for node_name, values in event.items():
+            if node_name.startswith("__"):
+                continue
+            self._enter(node_name, events)
+            values = values or {}
+            
+            if node_name == "supervisor":
+                next_agent = values.get("next")
+                if next_agent:
+                    events.append({"t": "r", "to": "END" if next_agent == "FINISH" else next_agent})
+                continue
+            
+            for msg in values.get("messages") or []:
+                if isinstance(msg, ToolMessage):
+                    content, length = truncate_tool_content(msg.content, self._max_tool_chars)
+                    tool_event = {"t": "tr", "id": msg.tool_call_id, "c": content}
+                    if length is not None:
+                        tool_event["len"] = length
+                    events.append(tool_event)
+                elif isinstance(msg, AIMessage):
+                    for tool_call in msg.tool_calls or []:
+                        events.append({
+                            "t": "tc",
+                            "id": tool_call.get("id", ""),
+                            "name": tool_call.get("name", "unknown"),
+                            "args": tool_call.get("args", {}),
+                        })
+                    if msg.content:
+                        ref = self._open(msg.id, node_name, events)
+                        if ref not in self._streamed:
+                            # Sin tokens previos (modelo sin streaming o respuesta especulativa)
+                            events.append({"t": "d", "n": ref, "c": msg.content})
+                            self._streamed.add(ref)
+                        events.append({"t": "e", "n": ref})
+                        if not msg.tool_calls:
+                            self._last_ref = ref
+        return events
+    
+    def final(self, thread_id: str, usage: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        event = {"t": "f", "n": self._last_ref, "th": thread_id}
+        if usage is not None:
+            event["u"] = usage
+        return event
+
+
+class DeltaCoalescer:
+    """
+    Agrupa deltas ``d`` consecutivos del mismo mensaje (protocolo v2).
+    
+    El primer delta de cada mensaje sale de inmediato (no penaliza el tiempo
+    hasta el primer token); los siguientes se acumulan durante ``window``
+    segundos o hasta que llega un evento de otro tipo.
+    """
+    
+    def __init__(self, window: float):
+        self._window = window
+        self._pending: Optional[Dict[str, Any]] = None
+        self._pending_since = 0.0
+        self._seen: set = set()
+    
+    def push(self, event: Dict[str, Any], now: float) -> List[Dict[str, Any]]:
+        if event.get("t") != "d":
+            return self.flush() + [event]
+        
+        out: List[Dict[str, Any]] = []
+        if self._pending is not None and self._pending["n"] == event["n"]:
+            self._pending["c"] += event["c"]
+        else:
+            out.extend(self.flush())
+            if event["n"] not in self._seen:
+                self._seen.add(event["n"])
+                return out + [event]
+            self._pending = dict(event)
+            self._pending_since = now
+        if now - self._pending_since >= self._window:
+            out.extend(self.flush())
+        return out
+    
+    def flush(self) -> List[Dict[str, Any]]:
+        if self._pending is None:
+            return []
+        pending, self._pending = self._pending, None
+        return [pending]
+
+
+class AgentService:
+    """Servicio para gestionar agentes y configuración."""
+    
+    @staticmethod
+    def build_inputs(request: ChatRequest) -> dict:
+        """Construye los inputs para el agente."""
+        from langchain_core.messages import HumanMessage
+        from src.core.state import start_turn
+        
+        return start_turn([HumanMessage(content=request.message)])
+    
+    @staticmethod
+    def thread_key(request: ChatRequest) -> str:
+        """Thread de la petición dentro de su tenant (ver ``src.core.tenants.thread_key``)."""
+        return thread_key(request.tenant, request.thread_id)
+    
+    @staticmethod
+    def build_config(request: ChatRequest) -> dict:
+        """Construye la configuración del agente (checkpoints separados por tenant)."""
+        return {
+            "configurable": {"thread_id": AgentService.thread_key(request)},
+            "recursion_limit": 25
+        }
+    
+    @staticmethod
+    def create_serializer(request: Optional[ChatRequest] = None):
+        """Crea el serializador de eventos para un nuevo stream según el protocolo pedido."""
+        max_tool_chars = request.max_tool_chars if request else None
+        if request and request.protocol == CompactEventSerializer.VERSION:
+            return CompactEventSerializer(max_tool_chars)
+        return StreamEventSerializer(max_tool_chars)
     
     @staticmethod
     def extract_last_message(event: dict) -> Optional[str]:
@@ -1,80 +1,305 @@
+import asyncio
 import json
-from typing import Optional, Generator, Dict
+import time
+import uuid
+import weakref
+from typing import Optional, AsyncGenerator, Dict
 from fastapi import HTTPException
 from fastapi.responses import StreamingResponse
 
-from src.api.schemas.chat_schemas import ChatRequest, ChatResponse
-from src.api.services.agent_service import AgentService
+from src.api.schemas.chat_schemas import (
+    ChatRequest,
+    ChatResponse,
+    ChatBatchRequest,
+    ChatBatchItemResult,
+)
+from src.api.services.agent_service import AgentService, DeltaCoalescer
+from src.api.services.sse_encoding import encode_stream, negotiate_encoding
+from src.api.services.admission_service import AdmissionController, AdmissionRejected, AdmissionTicket
 from src.api.interfaces import Agent
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.core.metrics import CHAT_REQUEST_SECONDS, SSE_FIRST_EVENT_SECONDS
+from src.core.tenants import tenant_scope
+from src.core.usage import usage_scope
+
+logger = get_logger(__name__)
 
 
 class ChatService:
     """Servicio para gestionar conversaciones con agentes."""
     
-    def __init__(self, agents: Dict[str, Agent], agent_service: AgentService):
+    def __init__(
+        self,
+        agents: Dict[str, Agent],
+        agent_service: AgentService,
+        admission: Optional[AdmissionController] = None,
+    ):
         """
         Inicializa el servicio de chat con inyección de dependencias.
         
         Args:
             agents: Diccionario de agentes disponibles
             agent_service: Servicio de utilidades para agentes
+            admission: Control de admisión (None = sin límite)
         """
         self._agents = agents
         self._agent_service = agent_service
+        self._admission = admission
     
-    async def chat(self, request: ChatRequest, agent_type: str = "supervisor") -> ChatResponse:
+    async def chat(
+        self,
+        request: ChatRequest,
+        agent_type: str = "supervisor",
+        client_id: str = "anonymous",
+    ) -> ChatResponse:
         """Procesa un mensaje y retorna la respuesta completa."""
+        ticket = await self._admit(request, client_id)
         try:
-            agent = self._get_agent(agent_type)
+            agent = await self._get_agent(agent_type)
             inputs = self._agent_service.build_inputs(request)
             config = self._agent_service.build_config(request)
             
-            result = await agent.ainvoke(inputs, config=config)
+            with (
+                usage_scope("chat", self._agent_service.thread_key(request)) as usage,
+                tenant_scope(request.tenant),
+                CHAT_REQUEST_SECONDS.time(endpoint="chat"),
+            ):
+                result = await agent.ainvoke(inputs, config=config)
             
             final_message = result["messages"][-1].content
             
             return ChatResponse(
                 response=final_message,
-                thread_id=request.thread_id
+                thread_id=request.thread_id,
+                usage=usage.summary(),
             )
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            if ticket:
+                ticket.release()
     
-    def chat_stream(self, request: ChatRequest, agent_type: str = "supervisor") -> StreamingResponse:
-        """Procesa un mensaje y retorna un stream SSE."""
-        agent = self._get_agent(agent_type)
+    async def chat_stream(
+        self,
+        request: ChatRequest,
+        agent_type: str = "supervisor",
+        client_id: str = "anonymous",
+        accept_encoding: str = "",
+    ) -> StreamingResponse:
+        """
+        Procesa un mensaje y retorna un stream SSE.
+        
+        La admisión se resuelve antes de abrir el stream para poder responder
+        429; el permiso se libera cuando el stream termina. Con
+        ``request.protocol == 2`` se usa el protocolo compacto con deltas de
+        tokens; la compresión se negocia con ``Accept-Encoding``.
+        """
+        agent = await self._get_agent(agent_type)
         inputs = self._agent_service.build_inputs(request)
         config = self._agent_service.build_config(request)
+        ticket = await self._admit(request, client_id)
+        compact = request.protocol == 2
         
-        def event_generator() -> Generator[str, None, None]:
+        def encode(payload: dict, event: Optional[str] = None) -> str:
+            if compact:
+                data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+            else:
+                data = json.dumps(payload)
+            return f"event: {event}\ndata: {data}\n\n" if event else f"data: {data}\n\n"
+        
+        delta_window = settings.SSE_DELTA_WINDOW_MS
+        if request.delta_window_ms is not None:
+            delta_window = min(request.delta_window_ms, settings.SSE_MAX_DELTA_WINDOW_MS)
+        
+        async def event_generator() -> AsyncGenerator[str, None]:
             last_message: Optional[str] = None
-            try:
-                for event in agent.stream(inputs, config=config):
-                    # Extraer el último mensaje para el evento final
-                    last_message = self._agent_service.extract_last_message(event) or last_message
-                    
-                    # Serializar eventos en el nuevo formato estructurado
-                    structured_events = self._agent_service.serialize_event(event)
+            started_at = time.perf_counter()
+            first_event_sent = False
+            # Estado de serialización propio de este stream
+            serializer = self._agent_service.create_serializer(request)
+            coalescer = DeltaCoalescer(delta_window / 1000) if compact else None
+            # Tokens de todos los nodos de esta petición (se envían en el evento final)
+            with usage_scope("chat_stream", self._agent_service.thread_key(request)) as usage, tenant_scope(request.tenant):
+                try:
+                    if compact:
+                        yield encode(serializer.hello())
+                        stream = agent.astream(inputs, config=config, stream_mode=["updates", "messages"])
+                    else:
+                        stream = agent.astream(inputs, config=config)
                     
-                    # Enviar cada evento estructurado individualmente
-                    for structured_event in structured_events:
-                        yield f"data: {json.dumps(structured_event)}\n\n"
+                    async for item in stream:
+                        if compact:
+                            mode, event = item
+                            if mode == "messages":
+                                structured_events = serializer.serialize_token(*event)
+                            else:
+                                structured_events = serializer.serialize_update(event)
+                        else:
+                            # Extraer el último mensaje para el evento final
+                            last_message = self._agent_service.extract_last_message(item) or last_message
+                            # Serializar eventos en el nuevo formato estructurado
+                            structured_events = serializer.serialize_event(item)
                         
+                        if coalescer is not None:
+                            now = time.perf_counter()
+                            structured_events = [
+                                merged for event in structured_events for merged in coalescer.push(event, now)
+                            ]
+                        
+                        # Enviar cada evento estructurado individualmente
+                        for structured_event in structured_events:
+                            if not first_event_sent:
+                                first_event_sent = True
+                                SSE_FIRST_EVENT_SECONDS.observe(
+                                    time.perf_counter() - started_at, endpoint="chat_stream"
+                                )
+                            yield encode(structured_event)
+                
+                except Exception as exc:
+                    yield encode({"detail": str(exc)}, event="error")
+                    return
+                finally:
+                    CHAT_REQUEST_SECONDS.observe(time.perf_counter() - started_at, endpoint="chat_stream")
+                    if ticket:
+                        ticket.release()
+                
+                # Evento final: en v2 referencia el último mensaje en lugar de repetirlo
+                if compact:
+                    for pending in coalescer.flush():
+                        yield encode(pending)
+                    yield encode(serializer.final(request.thread_id, usage.summary()), event="final")
+                elif last_message:
+                    done_payload = {
+                        "response": last_message,
+                        "thread_id": request.thread_id,
+                        "usage": usage.summary(),
+                    }
+                    yield encode(done_payload, event="final")
+            
+            yield "event: done\ndata: [DONE]\n\n"
+        
+        generator = event_generator()
+        if ticket:
+            # Si el stream nunca llega a iterarse (cliente desconectado), el
+            # permiso se libera al recolectar el generador
+            weakref.finalize(generator, ticket.release)
+        
+        encoding = negotiate_encoding(accept_encoding)
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return StreamingResponse(
+            encode_stream(generator, encoding, request.protocol),
+            media_type="text/event-stream",
+            headers=headers,
+        )
+    
+    async def chat_batch(
+        self,
+        batch: ChatBatchRequest,
+        agent_type: str = "supervisor",
+        client_id: str = "anonymous",
+    ) -> StreamingResponse:
+        """
+        Procesa un lote de mensajes independientes con concurrencia acotada.
+        
+        Retorna un stream NDJSON con un ``ChatBatchItemResult`` por petición,
+        en orden de finalización; los errores se informan por elemento.
+        Los elementos pasan por el control de admisión como un único cliente
+        (``batch:<client_id>``) y esperan turno en lugar de recibir 429.
+        """
+        if len(batch.requests) > settings.CHAT_BATCH_MAX_ITEMS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"El lote supera el máximo de {settings.CHAT_BATCH_MAX_ITEMS} peticiones",
+            )
+        agent = await self._get_agent(agent_type)
+        concurrency = min(
+            batch.max_concurrency or settings.CHAT_BATCH_MAX_CONCURRENCY,
+            settings.CHAT_BATCH_MAX_CONCURRENCY,
+            len(batch.requests),
+        )
+        batch_id = uuid.uuid4().hex[:8]
+        batch_client = f"batch:{client_id}"
+        
+        async def run_item(index: int, request: ChatRequest) -> ChatBatchItemResult:
+            # Peticiones sin thread propio no deben compartir checkpoint
+            if request.thread_id in (None, "default_thread"):
+                request = request.model_copy(update={"thread_id": f"batch-{batch_id}-{index}"})
+            
+            ticket = await self._admit_waiting(request, batch_client)
+            try:
+                inputs = self._agent_service.build_inputs(request)
+                config = self._agent_service.build_config(request)
+                with (
+                    usage_scope("chat_batch", self._agent_service.thread_key(request)) as usage,
+                    tenant_scope(request.tenant),
+                    CHAT_REQUEST_SECONDS.time(endpoint="chat_batch"),
+                ):
+                    result = await agent.ainvoke(inputs, config=config)
+                return ChatBatchItemResult(
+                    index=index,
+                    thread_id=request.thread_id,
+                    response=result["messages"][-1].content,
+                    usage=usage.summary(),
+                )
             except Exception as exc:
-                yield f"event: error\ndata: {json.dumps({'detail': str(exc)})}\n\n"
-                return
+                logger.warning("chat_batch: error en elemento", extra={"index": index, "error": str(exc)})
+                return ChatBatchItemResult(index=index, thread_id=request.thread_id, error=str(exc))
+            finally:
+                if ticket:
+                    ticket.release()
+        
+        async def result_generator() -> AsyncGenerator[str, None]:
+            pending = iter(enumerate(batch.requests))
+            results: asyncio.Queue = asyncio.Queue()
             
-            # Evento final con el último mensaje
-            if last_message:
-                done_payload = {"response": last_message, "thread_id": request.thread_id}
-                yield f"event: final\ndata: {json.dumps(done_payload)}\n\n"
+            async def worker():
+                for index, request in pending:
+                    await results.put(await run_item(index, request))
             
-            yield "event: done\ndata: [DONE]\n\n"
+            workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+            try:
+                for _ in range(len(batch.requests)):
+                    result = await results.get()
+                    yield result.model_dump_json() + "\n"
+            finally:
+                # Cliente desconectado o lote terminado: no dejar trabajo huérfano
+                for task in workers:
+                    task.cancel()
         
-        return StreamingResponse(event_generator(), media_type="text/event-stream")
+        return StreamingResponse(result_generator(), media_type="application/x-ndjson")
+    
+    async def _admit_waiting(self, request: ChatRequest, client_id: str) -> Optional[AdmissionTicket]:
+        """Como ``_admit`` pero reintenta tras ``retry_after`` en lugar de rechazar."""
+        if self._admission is None:
+            return None
+        while True:
+            try:
+                return await self._admission.acquire(client_id, self._agent_service.thread_key(request))
+            except AdmissionRejected as exc:
+                await asyncio.sleep(exc.retry_after)
+    
+    async def _admit(self, request: ChatRequest, client_id: str) -> Optional[AdmissionTicket]:
+        """Obtiene turno de ejecución o responde 429 con Retry-After."""
+        if self._admission is None:
+            return None
+        try:
+            return await self._admission.acquire(client_id, self._agent_service.thread_key(request))
+        except AdmissionRejected as exc:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Servidor saturado ({exc.reason}), reintente más tarde",
+                headers={"Retry-After": str(int(exc.retry_after))},
+            )
     
-    def _get_agent(self, agent_type: str) -> Agent:
-        """Obtiene un agente del contenedor."""
+    async def _get_agent(self, agent_type: str) -> Agent:
+        """Obtiene un agente del contenedor (sin bloquear el loop si aún no está compilado)."""
         if agent_type not in self._agents:
             raise ValueError(f"Unknown agent type: {agent_type}")
+        # Registro perezoso (``LazyAgents``): compila en un thread
+        aget = getattr(self._agents, "aget", None)
+        if aget is not None:
+            return await aget(agent_type)
         return self._agents[agent_type]
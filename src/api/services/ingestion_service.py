@@ -0,0 +1,390 @@
+"""
+Ingesta de documentos en segundo plano.
+
+``/admin/upload-documents`` guarda los archivos en disco por bloques y
+encola un ``IngestionJob``; la respuesta vuelve de inmediato con el ID
+del job, cuyo estado se consulta en ``/admin/jobs/{job_id}``.
+
+Cada job se procesa en dos etapas unidas por colas acotadas:
+- carga y división en chunks en un pool de procesos (``INGESTION_PROCESSES``),
+  fuera del event loop y del GIL. Cada archivo se lee página a página y
+  sus chunks llegan en lotes de ``EMBEDDING_BATCH_SIZE`` a medida que se
+  generan (``stream_chunks``);
+- embeddings y upserts de cada lote, con hasta ``INGESTION_CONCURRENCY``
+  lotes en vuelo (clientes async).
+
+Solo se embeben los chunks nuevos o cambiados de cada archivo (ver
+``VectorService.plan_batch``); los obsoletos se borran al terminar el archivo.
+Todo el job se indexa en el namespace de su tenant (``src.core.tenants``).
+
+Las colas frenan el parseo si los embeddings van por detrás: la memoria no
+depende del tamaño de los documentos, y los lotes de una página se suben
+mientras se parsean las siguientes. Una subida grande no bloquea el chat ni
+la ingesta de video.
+Los jobs viven en memoria del worker que recibió la subida.
+"""
+
+import asyncio
+import multiprocessing
+import shutil
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from pathlib import Path
+from queue import Empty
+from typing import AsyncIterator, BinaryIO, Callable, Dict, List, Optional, Set
+
+from src.api.services.vector_service import IndexPlan, VectorService, stream_chunks
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.core.metrics import INGESTION_CHUNKS, INGESTION_JOBS, INGESTION_SECONDS
+from src.core.tenants import check_namespace
+
+logger = get_logger(__name__)
+
+# Bytes por lectura al copiar una subida a disco
+_COPY_BUFFER = 1024 * 1024
+# Espera máxima por lote antes de comprobar si el proceso de parseo sigue vivo
+_PARSE_POLL_SECONDS = 1.0
+
+
+class IngestionQueueFull(Exception):
+    """La cola de jobs está llena; el cliente debe reintentar más tarde."""
+
+
+@dataclass
+class FileStatus:
+    filename: str
+    path: Path
+    status: str = "queued"
+    # Chunks del archivo: embebidos (nuevos o cambiados), sin cambios y borrados por obsoletos
+    chunks: int = 0
+    embedded: int = 0
+    skipped: int = 0
+    deleted: int = 0
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        result = {
+            "filename": self.filename,
+            "status": self.status,
+            "chunks": self.chunks,
+            "embedded": self.embedded,
+            "skipped": self.skipped,
+            "deleted": self.deleted,
+        }
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+@dataclass
+class IngestionJob:
+    job_id: str
+    files: List[FileStatus]
+    directory: Path
+    # Namespace del tenant ("" = el por defecto)
+    tenant: str = ""
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "tenant": self.tenant or None,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "files_processed": sum(1 for file in self.files if file.status == "done"),
+            "total_chunks": sum(file.chunks for file in self.files),
+            "embedded": sum(file.embedded for file in self.files),
+            "skipped": sum(file.skipped for file in self.files),
+            "deleted": sum(file.deleted for file in self.files),
+            "files": [file.to_dict() for file in self.files],
+        }
+
+
+def save_upload(source: BinaryIO, destination: Path) -> None:
+    """Copia una subida a disco por bloques, sin cargarla entera en memoria."""
+    with open(destination, "wb") as handle:
+        shutil.copyfileobj(source, handle, _COPY_BUFFER)
+
+
+class IngestionService:
+    """Cola de jobs de ingesta y sus workers (arrancados en el lifespan de la API)."""
+
+    def __init__(
+        self,
+        workers: int = None,
+        processes: int = None,
+        concurrency: int = None,
+        max_queue: int = None,
+        max_jobs: int = None,
+        vector_service: Callable[[], VectorService] = VectorService,
+    ):
+        self.workers = workers or settings.INGESTION_WORKERS
+        self.processes = processes or settings.INGESTION_PROCESSES
+        self.concurrency = concurrency or settings.INGESTION_CONCURRENCY
+        self.max_queue = max_queue or settings.INGESTION_MAX_QUEUE
+        self.max_jobs = max_jobs or settings.INGESTION_MAX_JOBS
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Colas entre los procesos de parseo y el event loop
+        self._manager = None
+        # En la API, el VectorService compartido del contenedor (ver DependencyContainer)
+        self._vector_service_factory = vector_service
+        self._vector_service: Optional[VectorService] = None
+
+    @property
+    def vector_service(self) -> VectorService:
+        # Se obtiene con el primer job: importar la API no abre conexiones al vector store
+        if self._vector_service is None:
+            self._vector_service = self._vector_service_factory()
+        return self._vector_service
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            # Sin el manager, un parseo bloqueado en una cola llena termina con error
+            self._manager.shutdown()
+            self._manager = None
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # "spawn": un fork del proceso de la API heredaría sus threads y sockets
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _chunk_queue(self):
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        # Lotes ya parseados por archivo: el parseo espera cuando está llena
+        return self._manager.Queue(maxsize=2)
+
+    def new_job(self, tenant: Optional[str] = None) -> IngestionJob:
+        """Crea un job vacío con su directorio de subida, para los documentos de ``tenant``."""
+        if self._queue is None:
+            raise RuntimeError("IngestionService no arrancado")
+        namespace = check_namespace(tenant)
+        if self._queue.full():
+            raise IngestionQueueFull()
+        directory = Path(tempfile.mkdtemp(prefix="ingest-", dir=settings.INGESTION_DIR or None))
+        return IngestionJob(job_id=uuid.uuid4().hex, files=[], directory=directory, tenant=namespace)
+
+    async def add_file(self, job: IngestionJob, filename: str, source: BinaryIO) -> None:
+        """Guarda un archivo del job en su directorio (en un thread)."""
+        # El índice evita colisiones entre archivos con el mismo nombre
+        path = job.directory / f"{len(job.files)}{Path(filename).suffix}"
+        await asyncio.to_thread(save_upload, source, path)
+        job.files.append(FileStatus(filename=filename, path=path))
+
+    def submit(self, job: IngestionJob) -> IngestionJob:
+        """Encola un job con sus archivos ya en disco."""
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            shutil.rmtree(job.directory, ignore_errors=True)
+            raise IngestionQueueFull()
+        self._jobs[job.job_id] = job
+        # Conservar solo los últimos ``max_jobs`` jobs terminados
+        while len(self._jobs) > self.max_jobs:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status in ("queued", "running"):
+                break
+            del self._jobs[oldest_id]
+        INGESTION_JOBS.inc(status="queued")
+        logger.info("Job de ingesta encolado", extra={"job_id": job.job_id, "tenant": job.tenant, "files": len(job.files)})
+        return job
+
+    def discard(self, job: IngestionJob) -> None:
+        """Borra los archivos de un job que no llegó a encolarse."""
+        shutil.rmtree(job.directory, ignore_errors=True)
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[IngestionJob]:
+        return list(reversed(self._jobs.values()))
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.error("Error en job de ingesta", extra={"job_id": job.job_id, "error": str(e)})
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IngestionJob) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            await self._pipeline(job)
+        finally:
+            shutil.rmtree(job.directory, ignore_errors=True)
+            job.finished_at = time.time()
+            failed = any(file.status == "failed" for file in job.files)
+            job.status = "failed" if failed else "done"
+            INGESTION_JOBS.inc(status=job.status)
+            INGESTION_SECONDS.observe(job.finished_at - job.started_at)
+            logger.info(
+                "Job de ingesta terminado",
+                extra={
+                    "job_id": job.job_id,
+                    "status": job.status,
+                    "chunks": sum(file.chunks for file in job.files),
+                    "embedded": sum(file.embedded for file in job.files),
+                    "seconds": round(job.finished_at - job.started_at, 3),
+                },
+            )
+
+    async def _chunk_batches(self, file: FileStatus) -> AsyncIterator[list]:
+        """Lotes de chunks de un archivo, a medida que el proceso de parseo los genera."""
+        # En un thread: arrancar el manager (un proceso) no debe bloquear el loop
+        queue = await asyncio.to_thread(self._chunk_queue)
+        loop = asyncio.get_running_loop()
+        pool = self._process_pool()
+        parsing = loop.run_in_executor(
+            pool, stream_chunks, str(file.path), file.filename, queue, settings.EMBEDDING_BATCH_SIZE
+        )
+        finished = False
+        try:
+            while True:
+                item = await self._next_item(queue, parsing)
+                # ``None`` al terminar o el mensaje de error
+                finished = item is None or isinstance(item, str)
+                if item is None:
+                    break
+                if isinstance(item, str):
+                    raise RuntimeError(item)
+                yield item
+        finally:
+            # Si se deja de leer antes del final, vaciar la cola: el parseo está esperando en ella
+            while not finished:
+                try:
+                    item = await self._next_item(queue, parsing)
+                except RuntimeError:
+                    # El proceso de parseo ya no existe: no queda nada que vaciar
+                    break
+                finished = item is None or isinstance(item, str)
+            try:
+                await parsing
+            except BrokenProcessPool:
+                # Un proceso murió (ej. OOM): el pool ya no acepta tareas, el siguiente archivo usa uno nuevo
+                if self._pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+                raise
+
+    @staticmethod
+    async def _next_item(queue, parsing: asyncio.Future):
+        """
+        Siguiente elemento de la cola del parseo. Espera por tramos para
+        detectar un proceso que murió sin avisar (ej. matado por OOM): con el
+        parseo terminado y la cola vacía ya no llegará nada.
+        """
+        while True:
+            try:
+                return await asyncio.to_thread(queue.get, True, _PARSE_POLL_SECONDS)
+            except Empty:
+                if not parsing.done():
+                    continue
+            # Lo que el parseo dejara antes de terminar ya está en la cola
+            try:
+                return queue.get_nowait()
+            except Empty:
+                error = None if parsing.cancelled() else parsing.exception()
+                raise RuntimeError(f"El proceso de parseo terminó sin completar el archivo: {error or 'sin resultado'}")
+
+    async def _pipeline(self, job: IngestionJob) -> None:
+        # Lotes pendientes de subir: acota los chunks en memoria si el parseo va por delante
+        batches: asyncio.Queue = asyncio.Queue(maxsize=2 * self.concurrency)
+        # Lotes aún sin subir por archivo y archivos ya parseados, para cerrarlos tras el último lote
+        pending: Dict[int, int] = {}
+        parsed: Set[int] = set()
+        plans: Dict[int, IndexPlan] = {}
+
+        async def finish(index: int) -> None:
+            # Con los chunks nuevos ya subidos: borrar los obsoletos y actualizar el manifest
+            file, plan = job.files[index], plans[index]
+            try:
+                await self.vector_service.acommit(plan)
+            except Exception as e:
+                file.status, file.error = "failed", str(e)
+                return
+            file.deleted = len(plan.stale_ids)
+            INGESTION_CHUNKS.inc(file.deleted, action="deleted")
+            file.status = "done"
+
+        async def parse_file(index: int, file: FileStatus) -> None:
+            plan = plans[index] = await asyncio.to_thread(self.vector_service.begin_plan, file.filename, job.tenant)
+            pending[index] = 0
+            async with aclosing(self._chunk_batches(file)) as stream:
+                async for chunks in stream:
+                    if file.status == "failed":
+                        # Falló la subida de un lote: no seguir parseando el archivo
+                        return
+                    new_chunks = await asyncio.to_thread(self.vector_service.plan_batch, plan, chunks)
+                    file.chunks, file.skipped = len(plan.seen), plan.unchanged
+                    if new_chunks:
+                        file.status = "embedding"
+                        pending[index] += 1
+                        await batches.put((index, new_chunks))
+            self.vector_service.finish_plan(plan)
+            INGESTION_CHUNKS.inc(plan.unchanged, action="skipped")
+
+        async def parse() -> None:
+            for index, file in enumerate(job.files):
+                file.status = "parsing"
+                try:
+                    await parse_file(index, file)
+                except Exception as e:
+                    file.status, file.error = "failed", str(e)
+                    continue
+                parsed.add(index)
+                if file.status != "failed" and not pending[index]:
+                    await finish(index)
+            for _ in range(self.concurrency):
+                await batches.put(None)
+
+        async def upload() -> None:
+            while (item := await batches.get()) is not None:
+                index, chunks = item
+                file = job.files[index]
+                if file.status == "failed":
+                    continue
+                try:
+                    await self.vector_service.aadd_chunks(chunks, job.tenant)
+                except Exception as e:
+                    file.status, file.error = "failed", str(e)
+                    continue
+                file.embedded += len(chunks)
+                INGESTION_CHUNKS.inc(len(chunks), action="embedded")
+                pending[index] -= 1
+                if index in parsed and not pending[index]:
+                    await finish(index)
+
+        await asyncio.gather(parse(), *(upload() for _ in range(self.concurrency)))
@@ -0,0 +1,80 @@
+"""
+Compresión de streams SSE negociada con ``Accept-Encoding``.
+
+Cada evento se comprime con *sync flush*: el cliente puede descomprimir y
+mostrar cada evento en cuanto llega, y el diccionario del compresor se
+comparte entre eventos (las claves repetidas cuestan casi nada).
+"""
+
+import zlib
+from typing import AsyncIterator, Optional
+
+from src.core.config import settings
+from src.core.metrics import SSE_BYTES
+
+try:
+    import brotli
+except ImportError:  # dependencia opcional
+    brotli = None
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Elige ``br`` o ``gzip`` según ``Accept-Encoding`` y ``SSE_COMPRESSION``."""
+    if settings.SSE_COMPRESSION == "off":
+        return None
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(coding.strip())
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _GzipStream:
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=5)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+async def encode_stream(
+    events: AsyncIterator[str], encoding: Optional[str], protocol: int
+) -> AsyncIterator[bytes]:
+    """Codifica (y comprime si procede) un stream SSE, contando bytes enviados."""
+    label = encoding or "identity"
+    compressor = None
+    if encoding == "gzip":
+        compressor = _GzipStream()
+    elif encoding == "br":
+        compressor = _BrotliStream()
+
+    async for event in events:
+        data = event.encode("utf-8")
+        if compressor is not None:
+            data = compressor.process(data)
+        SSE_BYTES.inc(len(data), protocol=protocol, encoding=label)
+        yield data
+    if compressor is not None:
+        tail = compressor.finish()
+        SSE_BYTES.inc(len(tail), protocol=protocol, encoding=label)
+        yield tail
@@ -5,45 +5,306 @@ Dependencias requeridas:
     pip install langchain-community unstructured pypdf python-docx langchain-text-splitters
 """
 
-from typing import List
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Set, Tuple
 from pathlib import Path
 import tempfile
-from langchain_community.document_loaders import (
-    TextLoader,
-    PyPDFLoader,
-    UnstructuredMarkdownLoader,
-)
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
 
-from src.core.vector_factory import VectorStoreFactory
+from langchain_core.documents import Document
+
+from src.core.keyword_index import get_keyword_index
+from src.core.logger import get_logger
+from src.core.vector_factory import get_shared_vector_store
+from src.core.vector_manifest import SourceManifest
+from src.core.vector_store import MetadataFilter, document_id
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# Texto plano: caracteres por bloque (se corta en una línea en blanco) al leerlo por partes
+TEXT_BLOCK_CHARS = 100_000
+
+
+def _loader(file_path: str, extension: str):
+    from langchain_community.document_loaders import (
+        PyPDFLoader,
+        UnstructuredMarkdownLoader,
+    )
+
+    if extension == ".pdf":
+        return PyPDFLoader(file_path)
+    if extension == ".md":
+        return UnstructuredMarkdownLoader(file_path)
+    raise ValueError(f"Unsupported file type: {extension}")
+
+
+def _text_blocks(file_path: str) -> Iterator[Document]:
+    """Texto plano por bloques de párrafos completos, sin leer el archivo entero."""
+    lines, size = [], 0
+    with open(file_path, encoding="utf-8") as handle:
+        for line in handle:
+            lines.append(line)
+            size += len(line)
+            # En una línea en blanco; sin párrafos, en cualquier línea a partir de 4 bloques
+            if size >= TEXT_BLOCK_CHARS and (not line.strip() or size >= 4 * TEXT_BLOCK_CHARS):
+                yield Document(page_content="".join(lines), metadata={"source": file_path})
+                lines, size = [], 0
+    if lines:
+        yield Document(page_content="".join(lines), metadata={"source": file_path})
+
+
+def iter_pages(file_path: str, filename: str) -> Iterator[Document]:
+    """Páginas (PDF) o bloques (texto) de un documento, leídos a medida que se piden."""
+    extension = Path(filename).suffix.lower()
+    if extension == ".txt":
+        return _text_blocks(file_path)
+    return _loader(file_path, extension).lazy_load()
+
+
+def load_document(file_path: str, filename: str):
+    """Carga un documento según su extensión."""
+    return list(iter_pages(file_path, filename))
+
+
+def iter_chunks(file_path: str, filename: str) -> Iterator[Document]:
+    """
+    Chunks de un archivo con ``source`` e ``ingested_at`` (segundos Unix,
+    filtrable por rango) en la metadata, página a página.
+
+    Cada página se divide al leerla: la memoria no depende del tamaño del
+    documento. Como con ``split_documents``, los chunks no cruzan páginas.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+    )
+    ingested_at = int(time.time())
+    for page in iter_pages(file_path, filename):
+        for chunk in text_splitter.split_documents([page]):
+            chunk.metadata["source"] = filename
+            chunk.metadata["ingested_at"] = ingested_at
+            yield chunk
+
+
+def load_and_split(file_path: str, filename: str) -> list:
+    """Carga un archivo y lo divide en chunks (ver ``iter_chunks``)."""
+    return list(iter_chunks(file_path, filename))
+
+
+def stream_chunks(file_path: str, filename: str, queue, batch_size: int) -> None:
+    """
+    Envía los chunks de un archivo a ``queue`` en lotes de ``batch_size``.
+
+    Se ejecuta en el pool de procesos de ``IngestionService``. La cola está
+    acotada, así que el parseo espera si los embeddings van por detrás.
+    Termina con ``None``, o con el mensaje de error (``str``) si falla.
+    """
+    try:
+        batch = []
+        for chunk in iter_chunks(file_path, filename):
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                queue.put(batch)
+                batch = []
+        if batch:
+            queue.put(batch)
+        queue.put(None)
+    except Exception as e:
+        queue.put(str(e) or type(e).__name__)
+
+
+@dataclass
+class IndexPlan:
+    """
+    Reindexado de una fuente frente al manifest (los IDs son hashes de contenido).
+
+    Se completa lote a lote con ``VectorService.plan_batch`` y se cierra con
+    ``VectorService.finish_plan``, que calcula los chunks obsoletos.
+    """
+    source: str
+    # Namespace (tenant) de la fuente: ``""`` = el por defecto
+    namespace: str = ""
+    # IDs indexados antes y vistos ahora
+    previous: Set[str] = field(default_factory=set)
+    seen: Set[str] = field(default_factory=set)
+    new_ids: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    stale_ids: List[str] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        return {
+            "chunks": len(self.seen),
+            "embedded": len(self.new_ids),
+            "skipped": self.unchanged,
+            "deleted": len(self.stale_ids),
+        }
 
 
 class VectorService:
-    """Servicio para gestionar embeddings y almacenamiento vectorial."""
-    
-    def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
-        self.embeddings = OpenAIEmbeddings()
-        self.vector_store = VectorStoreFactory.create()
-    
-    async def process_and_store_files(self, files: List[tuple]) -> dict:
+    """
+    Servicio para gestionar embeddings y almacenamiento vectorial.
+
+    La API crea una sola instancia (``DependencyContainer.get_vector_service``)
+    y la calienta en el lifespan: clientes, pools de conexiones y el primer
+    embedding quedan listos antes de la primera petición (ver ``/ready``).
+    """
+
+    def __init__(self, vector_store=None):
+        self.vector_store = vector_store or get_shared_vector_store()
+        self.keyword_index = get_keyword_index()
+        self.manifest = SourceManifest()
+        # Estado del warmup: None mientras no termina
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_error: Optional[str] = None
+
+    async def warmup(self) -> None:
+        """Abre los clientes async del vector store y resuelve una consulta de prueba."""
+        started = time.perf_counter()
+        try:
+            await self.vector_store.awarmup()
+        except Exception as e:
+            # No es fatal: el chat funciona sin vector store; /ready lo reporta
+            self.warmup_error = str(e)
+            logger.error("Error en el warmup del vector store", extra={"error": str(e)})
+        self.warmup_seconds = round(time.perf_counter() - started, 3)
+        logger.info("Vector store listo", extra={"seconds": self.warmup_seconds, "ok": self.warmup_error is None})
+
+    async def close(self) -> None:
+        await self.vector_store.aclose()
+
+    def begin_plan(self, source: str, namespace: str = "") -> IndexPlan:
+        return IndexPlan(source=source, namespace=namespace, previous=self.manifest.get(source, namespace))
+
+    def plan_batch(self, plan: IndexPlan, chunks: list) -> list:
+        """
+        Añade un lote de chunks al plan y retorna los que hay que embeber
+        (se suben con ``add_chunks``/``aadd_chunks``).
+
+        Los ya indexados que faltan en el índice BM25 (de antes de que
+        existiera) se añaden ya; el manifest se actualiza en ``commit``.
+        """
+        batch = {}
+        for chunk in chunks:
+            chunk_id = document_id(chunk)
+            if chunk_id in plan.seen:
+                continue
+            plan.seen.add(chunk_id)
+            batch[chunk_id] = chunk
+            if chunk_id in plan.previous:
+                plan.unchanged += 1
+            else:
+                plan.new_ids.append(chunk_id)
+        indexed = [chunk_id for chunk_id in batch if chunk_id in plan.previous]
+        missing_keywords = self.keyword_index.missing(indexed, plan.namespace)
+        if missing_keywords:
+            self.keyword_index.add(
+                [batch[chunk_id] for chunk_id in indexed if chunk_id in missing_keywords], plan.namespace
+            )
+        return [chunk for chunk_id, chunk in batch.items() if chunk_id not in plan.previous]
+
+    def finish_plan(self, plan: IndexPlan) -> IndexPlan:
+        """Cierra el plan tras el último lote: lo que ya no aparece es obsoleto."""
+        plan.stale_ids = sorted(plan.previous - plan.seen)
+        return plan
+
+    def plan(self, source: str, chunks: list, namespace: str = "") -> Tuple[IndexPlan, list]:
+        """Plan de una fuente con todos sus chunks; retorna también los chunks a embeber."""
+        plan = self.begin_plan(source, namespace)
+        new_chunks = self.plan_batch(plan, chunks)
+        return self.finish_plan(plan), new_chunks
+
+    def add_chunks(self, chunks: list, namespace: str = "") -> None:
+        """Sube chunks nuevos al vector store y, ya subidos, al índice BM25."""
+        self.vector_store.add_documents(chunks, namespace=namespace)
+        self.keyword_index.add(chunks, namespace)
+
+    async def aadd_chunks(self, chunks: list, namespace: str = "") -> None:
+        await self.vector_store.aadd_documents(chunks, namespace=namespace)
+        await asyncio.to_thread(self.keyword_index.add, chunks, namespace)
+
+    def commit(self, plan: IndexPlan) -> None:
+        """Borra los chunks obsoletos y actualiza el manifest, una vez subidos los nuevos."""
+        if plan.stale_ids:
+            self.vector_store.delete(plan.stale_ids, namespace=plan.namespace)
+        self._commit_local(plan)
+
+    async def acommit(self, plan: IndexPlan) -> None:
+        """``commit`` con el borrado de vectores por el cliente async."""
+        if plan.stale_ids:
+            await self.vector_store.adelete(plan.stale_ids, namespace=plan.namespace)
+        await asyncio.to_thread(self._commit_local, plan)
+
+    def _commit_local(self, plan: IndexPlan) -> None:
+        if plan.stale_ids:
+            self.keyword_index.delete(plan.stale_ids, plan.namespace)
+        self.manifest.update(plan.source, added=plan.new_ids, removed=plan.stale_ids, namespace=plan.namespace)
+
+    def index_documents(self, source: str, chunks: list, namespace: str = "") -> dict:
+        """
+        Reindexa una fuente: embebe solo los chunks nuevos o cambiados y
+        borra los que desaparecieron. Retorna el trabajo hecho y omitido.
+        """
+        plan, new_chunks = self.plan(source, chunks, namespace)
+        if new_chunks:
+            self.add_chunks(new_chunks, namespace)
+        self.commit(plan)
+        return plan.summary()
+
+    async def aindex_documents(self, source: str, chunks: list, namespace: str = "") -> dict:
+        """``index_documents`` con embeddings y upserts por los clientes async."""
+        plan, new_chunks = await asyncio.to_thread(self.plan, source, chunks, namespace)
+        if new_chunks:
+            await self.aadd_chunks(new_chunks, namespace)
+        await self.acommit(plan)
+        return plan.summary()
+
+    async def adelete_source(self, source: str, namespace: str = "") -> int:
+        """Quita una fuente de ``namespace`` (vectores, índice BM25 y manifest); retorna los chunks borrados."""
+        plan = await asyncio.to_thread(self.begin_plan, source, namespace)
+        self.finish_plan(plan)
+        await self.acommit(plan)
+        return len(plan.stale_ids)
+
+    async def aclear_namespace(self, namespace: str) -> int:
+        """
+        Vacía un namespace (tenant) para reconstruirlo sin tocar los demás;
+        retorna los chunks que tenía.
+        """
+        chunks = await asyncio.to_thread(lambda: sum(self.manifest.sources(namespace).values()))
+        await self.vector_store.adelete_index(namespace)
+        await asyncio.to_thread(self.keyword_index.delete_namespace, namespace)
+        await asyncio.to_thread(self.manifest.delete_namespace, namespace)
+        return chunks
+
+    def namespace_stats(self, namespace: str = "") -> dict:
+        """Fuentes de ``namespace`` con sus chunks, y chunks en su índice BM25."""
+        return {
+            "sources": self.manifest.sources(namespace),
+            "keyword_index_chunks": self.keyword_index.count(namespace),
+        }
+
+    async def process_and_store_files(self, files: List[tuple], namespace: str = "") -> dict:
         """
         Procesa archivos subidos, crea embeddings y los almacena en vector DB.
-        
+
+        La carga se ejecuta en un thread y embeddings y upserts con los
+        clientes async. Para subidas grandes usar ``IngestionService``.
+
         Args:
             files: Lista de tuplas (filename, content_bytes)
-        
+
         Returns:
             Dict con información del procesamiento
         """
         total_chunks = 0
         processed_files = []
-        
+
         for filename, content in files:
             try:
                 # Guardar temporalmente el archivo
@@ -53,56 +314,46 @@ class VectorService:
                 ) as tmp_file:
                     tmp_file.write(content)
                     tmp_path = tmp_file.name
-                
-                # Cargar documento según extensión
-                documents = self._load_document(tmp_path, filename)
-                
-                # Dividir en chunks
-                chunks = self.text_splitter.split_documents(documents)
-                
-                # Agregar metadata
-                for chunk in chunks:
-                    chunk.metadata["source"] = filename
-                
-                # Almacenar en vector DB
-                self.vector_store.add_documents(chunks)
-                
-                total_chunks += len(chunks)
+
+                # Cargar y dividir en chunks
+                chunks = await asyncio.to_thread(load_and_split, tmp_path, filename)
+
+                # Almacenar en vector DB (solo lo que cambió desde la última subida)
+                summary = await self.aindex_documents(filename, chunks, namespace)
+
+                total_chunks += summary["chunks"]
                 processed_files.append({
                     "filename": filename,
-                    "chunks": len(chunks)
+                    **summary
                 })
-                
+
                 # Limpiar archivo temporal
                 Path(tmp_path).unlink()
-                
+
             except Exception as e:
                 processed_files.append({
                     "filename": filename,
                     "error": str(e)
                 })
-        
+
         return {
             "files_processed": len([f for f in processed_files if "error" not in f]),
             "total_chunks": total_chunks,
             "files": processed_files
         }
-    
+
     def _load_document(self, file_path: str, filename: str):
         """Carga un documento según su extensión."""
-        extension = Path(filename).suffix.lower()
-        
-        if extension == ".pdf":
-            loader = PyPDFLoader(file_path)
-        elif extension == ".md":
-            loader = UnstructuredMarkdownLoader(file_path)
-        elif extension == ".txt":
-            loader = TextLoader(file_path)
-        else:
-            raise ValueError(f"Unsupported file type: {extension}")
-        
-        return loader.load()
-    
-    async def search_similar(self, query: str, k: int = 5):
-        """Busca documentos similares en la vector DB."""
-        return self.vector_store.similarity_search(query, k=k)
+        return load_document(file_path, filename)
+
+    async def search_similar(
+        self, query: str, k: int = 5, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ):
+        """Busca documentos similares en la vector DB (solo en ``namespace``)."""
+        return await self.vector_store.asimilarity_search(query, k=k, filter=filter, namespace=namespace)
+
+    async def search_similar_batch(
+        self, queries: List[str], k: int = 5, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ):
+        """Vecinos de varias consultas a la vez, unidos y sin repetidos."""
+        return await self.vector_store.asimilarity_search_batch(queries, k=k, filter=filter, namespace=namespace)
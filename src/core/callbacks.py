@@ -0,0 +1,62 @@
+"""Callbacks de LangChain usados por los modelos de la aplicación."""
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.core.metrics import LLM_ERRORS, LLM_REQUEST_SECONDS
+from src.core.usage import record_usage
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+    Callback de LangChain que registra latencia, tokens y errores de cada
+    llamada al modelo. El ``role`` es el nodo de LangGraph que hizo la llamada.
+    Los tokens se atribuyen también a la petición en curso (``src.core.usage``).
+    """
+
+    def __init__(self):
+        self._runs: Dict[object, tuple] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or "unknown"
+        role = (metadata or {}).get("langgraph_node", "unknown")
+        self._runs[run_id] = (time.perf_counter(), model, role)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        start, model, role = run
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, model=model, role=role)
+
+        usage = _usage_from_result(response)
+        if usage:
+            record_usage(role, model, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        _, model, role = run
+        # Hedges perdedores y especulaciones descartadas se cancelan: no son errores
+        if isinstance(error, asyncio.CancelledError):
+            return
+        LLM_ERRORS.inc(model=model, role=role)
+
+
+def _usage_from_result(response) -> Optional[dict]:
+    """Extrae ``usage_metadata`` del primer mensaje generado."""
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                return usage
+    return None
+
+
+llm_metrics_callback = LLMMetricsCallback()
@@ -0,0 +1,78 @@
+"""
+Checkpointers de LangGraph para la memoria de conversación.
+
+- ``memory`` (por defecto): ``MemorySaver`` por proceso. Con varios workers
+  cada uno tiene su propia memoria.
+- ``sqlite``: un fichero por grafo en ``CHECKPOINT_DIR``, compartido por
+  todos los workers. Requiere ``langgraph-checkpoint-sqlite`` y se abre en el
+  lifespan de la API con ``open_checkpointers()``.
+"""
+
+import threading
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import Dict, Iterable
+
+from src.core.config import settings
+from src.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Grafos con memoria de conversación
+CHECKPOINTED_GRAPHS = ("supervisor", "researcher")
+
+_checkpointers: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def get_checkpointer(name: str):
+    """
+    Checkpointer del grafo ``name``.
+
+    Si el backend persistente no se abrió (ej. CLI fuera de la API), se usa
+    memoria del proceso.
+    """
+    with _lock:
+        saver = _checkpointers.get(name)
+        if saver is None:
+            if settings.CHECKPOINT_BACKEND != "memory":
+                logger.warning(
+                    "Checkpointer persistente no abierto; usando memoria del proceso",
+                    extra={"graph": name, "backend": settings.CHECKPOINT_BACKEND},
+                )
+            from langgraph.checkpoint.memory import MemorySaver
+
+            saver = _checkpointers[name] = MemorySaver()
+        return saver
+
+
+async def open_checkpointers(stack: AsyncExitStack, names: Iterable[str] = CHECKPOINTED_GRAPHS) -> None:
+    """
+    Abre los checkpointers persistentes; se cierran al salir de ``stack``.
+
+    Debe llamarse antes de compilar los grafos.
+    """
+    backend = settings.CHECKPOINT_BACKEND
+    if backend == "memory":
+        return
+    if backend != "sqlite":
+        raise ValueError(f"CHECKPOINT_BACKEND desconocido: {backend}")
+
+    try:
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError as e:
+        raise RuntimeError(
+            "CHECKPOINT_BACKEND=sqlite requiere el paquete langgraph-checkpoint-sqlite"
+        ) from e
+
+    directory = Path(settings.CHECKPOINT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        saver = await stack.enter_async_context(
+            AsyncSqliteSaver.from_conn_string(str(directory / f"{name}.sqlite"))
+        )
+        await saver.setup()
+        with _lock:
+            _checkpointers[name] = saver
+    stack.callback(_checkpointers.clear)
+    logger.info("Checkpointers abiertos", extra={"backend": backend, "dir": str(directory)})
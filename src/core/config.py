@@ -5,6 +5,140 @@ load_dotenv()
 
 class Settings:
     PROJECT_NAME: str = "RapidBoard AI"
+
+    # Logging
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    # Niveles por módulo, ej: "src.supervisor=DEBUG,src.tools=DEBUG"
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text").lower()
+    # Máximo de registros por segundo y por mensaje en caminos calientes (0 = sin límite)
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", "5"))
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+    # Control de admisión de /chat
+    CHAT_MAX_CONCURRENCY: int = int(os.getenv("CHAT_MAX_CONCURRENCY", "16"))
+    CHAT_MAX_QUEUE: int = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+    CHAT_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", "30"))
+
+    # Lotes de /chat/batch
+    CHAT_BATCH_MAX_ITEMS: int = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "5000"))
+    CHAT_BATCH_MAX_CONCURRENCY: int = int(os.getenv("CHAT_BATCH_MAX_CONCURRENCY", "8"))
+
+    # Búsqueda web: endpoint HTTP alternativo a DuckDuckGo (ej. stub de benchmarks)
+    SEARCH_API_URL: str = os.getenv("SEARCH_API_URL", "")
+
+    # Arranque: compilar los grafos en segundo plano al iniciar (si no, en la primera petición)
+    EAGER_GRAPH_COMPILE: bool = os.getenv("EAGER_GRAPH_COMPILE", "true").lower() == "true"
+    # Arranque: crear y calentar el vector store y los embeddings (si no, en el primer uso)
+    VECTOR_WARMUP: bool = os.getenv("VECTOR_WARMUP", "true").lower() == "true"
+
+    # SSE: compresión negociada con Accept-Encoding ("auto") o desactivada ("off")
+    SSE_COMPRESSION: str = os.getenv("SSE_COMPRESSION", "auto").lower()
+    # Protocolo v2: ventana para agrupar deltas de tokens consecutivos (0 = uno por evento)
+    SSE_DELTA_WINDOW_MS: float = float(os.getenv("SSE_DELTA_WINDOW_MS", "50"))
+    # Máxima ventana que un cliente puede pedir con ``delta_window_ms``
+    SSE_MAX_DELTA_WINDOW_MS: float = float(os.getenv("SSE_MAX_DELTA_WINDOW_MS", "500"))
+
+    # Supervisor: lanzar business_intelligence en paralelo con la decisión de routing
+    SPECULATIVE_BI: bool = os.getenv("SPECULATIVE_BI", "false").lower() == "true"
+
+    # Researcher: "agent" (el modelo llama a web_search y resume) o "direct"
+    # (el supervisor extrae la consulta, se busca sin LLM y BI recibe los resultados)
+    RESEARCHER_MODE: str = os.getenv("RESEARCHER_MODE", "agent").lower()
+
+    # Servidor: workers de uvicorn y recarga automática (solo desarrollo)
+    API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
+    API_PORT: int = int(os.getenv("API_PORT", "8000"))
+    API_WORKERS: int = int(os.getenv("API_WORKERS", "1"))
+    API_RELOAD: bool = os.getenv("API_RELOAD", "false").lower() == "true"
+
+    # Estado compartido entre workers (frames, alertas, nivel de riesgo)
+    # "local" = en proceso (un worker); "socket" = hub sobre socket Unix
+    SHARED_STATE_BACKEND: str = os.getenv("SHARED_STATE_BACKEND", "local").lower()
+    SHARED_STATE_SOCKET: str = os.getenv("SHARED_STATE_SOCKET", "/tmp/rapidboard-state.sock")
+    SHARED_STATE_QUEUE_SIZE: int = int(os.getenv("SHARED_STATE_QUEUE_SIZE", "256"))
+
+    # Checkpoints de conversación: "memory" (por proceso) o "sqlite" (compartido)
+    CHECKPOINT_BACKEND: str = os.getenv("CHECKPOINT_BACKEND", "memory").lower()
+    CHECKPOINT_DIR: str = os.getenv("CHECKPOINT_DIR", ".checkpoints")
+
+    # LLMs: resiliencia de las llamadas (ver src/core/resilience.py)
+    # Deadline de cada llamada, hedges y fallbacks incluidos
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    # Reintentos secuenciales del cliente dentro de cada endpoint
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    # Hedging: petición duplicada si no hay respuesta tras este tiempo (0 = desactivado)
+    LLM_HEDGE_DELAY_MS: float = float(os.getenv("LLM_HEDGE_DELAY_MS", "0"))
+    # Con hedging activo, esperar al menos este percentil de las latencias recientes (0 = solo el fijo)
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    # Endpoint de fallback: otro modelo y/o proveedor (vacío = sin fallback)
+    LLM_FALLBACK_MODEL: str = os.getenv("LLM_FALLBACK_MODEL", "")
+    LLM_FALLBACK_API_BASE: str = os.getenv("LLM_FALLBACK_API_BASE", "")
+    LLM_FALLBACK_API_KEY: str = os.getenv("LLM_FALLBACK_API_KEY", "")
+    # Circuit breaker por endpoint: fallos seguidos para abrir y segundos hasta probar de nuevo
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    LLM_BREAKER_RESET_SECONDS: float = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+    # Modelo de visión alternativo para el análisis de video (mismo proveedor)
+    VIDEO_FALLBACK_MODEL: str = os.getenv("VIDEO_FALLBACK_MODEL", "")
+
+    # Precios para estimar coste: "modelo=entrada:salida,..." en USD por millón de tokens
+    LLM_PRICES: str = os.getenv("LLM_PRICES", "")
+
+    # Vector store: "pinecone" o "numpy" (local, en LOCAL_VECTOR_DIR)
+    VECTOR_STORE: str = os.getenv("VECTOR_STORE", "pinecone").lower()
+    LOCAL_VECTOR_DIR: str = os.getenv("LOCAL_VECTOR_DIR", ".vectors")
+    # Almacenamiento de los vectores locales: float32, float16 o int8
+    LOCAL_VECTOR_DTYPE: str = os.getenv("LOCAL_VECTOR_DTYPE", "float32").lower()
+    # Índice aproximado IVF: número de listas (0 = búsqueda exacta) y listas consultadas
+    LOCAL_VECTOR_IVF_LISTS: int = int(os.getenv("LOCAL_VECTOR_IVF_LISTS", "0"))
+    LOCAL_VECTOR_NPROBE: int = int(os.getenv("LOCAL_VECTOR_NPROBE", "8"))
+
+    # Manifest de chunks por fuente para reindexar solo lo que cambia
+    VECTOR_MANIFEST_PATH: str = os.getenv("VECTOR_MANIFEST_PATH", ".vector-manifest.sqlite")
+
+    # Búsqueda en documentos internos (tool internal_search, ver src/core/retrieval.py)
+    # Índice BM25 de los chunks (SQLite FTS5)
+    KEYWORD_INDEX_PATH: str = os.getenv("KEYWORD_INDEX_PATH", ".keyword-index.sqlite")
+    # Chunks por búsqueda y candidatos por ranking antes de fusionar (múltiplo de RETRIEVAL_K)
+    RETRIEVAL_K: int = int(os.getenv("RETRIEVAL_K", "4"))
+    RETRIEVAL_CANDIDATES: int = int(os.getenv("RETRIEVAL_CANDIDATES", "5"))
+    # Consultas de hasta N palabras (sin "?") se responden solo con BM25
+    RETRIEVAL_KEYWORD_MAX_WORDS: int = int(os.getenv("RETRIEVAL_KEYWORD_MAX_WORDS", "3"))
+    # Caché de resultados del vector store (ver src/core/search_cache.py): entradas (0 = sin caché) y vida
+    SEARCH_CACHE_SIZE: int = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+    SEARCH_CACHE_TTL_SECONDS: float = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+    # Segundos tras una escritura sin cachear búsquedas del namespace (el índice aún puede no reflejarla)
+    SEARCH_CACHE_FRESHNESS_SECONDS: float = float(os.getenv("SEARCH_CACHE_FRESHNESS_SECONDS", "5"))
+    # SQLite con la generación de escrituras por namespace, para invalidar en todos los workers (vacío = solo este proceso)
+    SEARCH_CACHE_PATH: str = os.getenv("SEARCH_CACHE_PATH", ".search-cache.sqlite")
+    # Lectura de esa generación como mucho cada N segundos por namespace (los aciertos entre lecturas no tocan SQLite)
+    SEARCH_CACHE_SYNC_SECONDS: float = float(os.getenv("SEARCH_CACHE_SYNC_SECONDS", "1"))
+
+    # Ingesta en el vector store
+    # Textos por llamada a ``embed_documents``
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+    # Caché de embeddings (ver src/core/embeddings.py): vectores en memoria y SQLite (vacío = solo memoria)
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "5000"))
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", ".embedding-cache.sqlite")
+    # Host del índice Pinecone (evita resolverlo por nombre al arrancar)
+    PINECONE_HOST: str = os.getenv("PINECONE_HOST", "")
+    # Vectores por upsert y upserts en vuelo a la vez
+    PINECONE_UPSERT_BATCH_SIZE: int = int(os.getenv("PINECONE_UPSERT_BATCH_SIZE", "100"))
+    PINECONE_UPSERT_CONCURRENCY: int = int(os.getenv("PINECONE_UPSERT_CONCURRENCY", "4"))
+    # Consultas al índice en vuelo a la vez en ``similarity_search_batch``
+    PINECONE_QUERY_CONCURRENCY: int = int(os.getenv("PINECONE_QUERY_CONCURRENCY", "8"))
+
+    # Jobs de ingesta de /admin/upload-documents (ver src/api/services/ingestion_service.py)
+    # Jobs procesados a la vez, procesos para parsear archivos y lotes de embeddings en vuelo por job
+    INGESTION_WORKERS: int = int(os.getenv("INGESTION_WORKERS", "1"))
+    INGESTION_PROCESSES: int = int(os.getenv("INGESTION_PROCESSES", "2"))
+    INGESTION_CONCURRENCY: int = int(os.getenv("INGESTION_CONCURRENCY", "4"))
+    # Jobs en cola antes de responder 429 y jobs terminados que se conservan para consultar
+    INGESTION_MAX_QUEUE: int = int(os.getenv("INGESTION_MAX_QUEUE", "16"))
+    INGESTION_MAX_JOBS: int = int(os.getenv("INGESTION_MAX_JOBS", "100"))
+    # Directorio de las subidas pendientes (vacío = temporal del sistema)
+    INGESTION_DIR: str = os.getenv("INGESTION_DIR", "")
+
     # Añadir más configuraciones aquí (DB, LangSmith, etc.)
 
 settings = Settings()
@@ -0,0 +1,197 @@
+"""
+Embeddings compartidos con caché.
+
+``get_embeddings()`` devuelve la instancia que usan los vector stores,
+tanto al ingerir (``embed_documents``) como al buscar (``embed_query``, o
+``embed_queries`` para varias consultas en una llamada).
+Cada vector se cachea con la clave (modelo, hash del texto normalizado):
+- un LRU en memoria acotado a ``EMBEDDING_CACHE_SIZE`` vectores;
+- detrás, SQLite en ``EMBEDDING_CACHE_PATH`` (vacío = solo memoria),
+  compartido entre workers y reinicios.
+
+Las versiones async (``aembed_*``) usan el cliente async del modelo, con
+su pool de conexiones, y leen SQLite en un thread.
+
+Los vectores se guardan como float32. Los aciertos y fallos por nivel van
+a ``embedding_cache_total`` y a ``CachedEmbeddings.stats()``.
+"""
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from src.core.config import settings
+from src.core.metrics import EMBEDDING_CACHE
+
+
+def normalize_text(text: str) -> str:
+    """Forma canónica para la clave: Unicode NFC y espacios colapsados."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class _DiskCache:
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        found = {}
+        with self._lock:
+            # Por tramos: SQLite limita los parámetros por consulta
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                )
+                found.update(rows)
+        return found
+
+    def put_many(self, items: Dict[str, bytes]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", items.items())
+
+
+class CachedEmbeddings(Embeddings):
+    """``Embeddings`` que consulta la caché antes de llamar al modelo."""
+
+    def __init__(self, embeddings: Embeddings, model: str, max_size: int = None, path: Optional[str] = None):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_size = settings.EMBEDDING_CACHE_SIZE if max_size is None else max_size
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _DiskCache(path) if path else None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{normalize_text(text)}".encode()).hexdigest()
+
+    def _remember(self, key: str, vector: bytes) -> None:
+        if not self.max_size:
+            return
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_size:
+                self._memory.popitem(last=False)
+
+    def _count(self, kind: str, result: str, count: int) -> None:
+        if count:
+            EMBEDDING_CACHE.inc(count, kind=kind, result=result)
+            with self._lock:
+                self._stats[f"{result}_hits" if result != "miss" else "misses"] += count
+
+    def _cached(self, keys: List[str], kind: str) -> Dict[str, bytes]:
+        """Vectores ya conocidos: primero el LRU, después SQLite."""
+        vectors: Dict[str, bytes] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    vectors[key] = vector
+        self._count(kind, "memory", sum(1 for key in keys if key in vectors))
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing and self._disk is not None:
+            from_disk = self._disk.get_many(missing)
+            for key, vector in from_disk.items():
+                vectors[key] = vector
+                self._remember(key, vector)
+            self._count(kind, "disk", sum(1 for key in keys if key in from_disk))
+        return vectors
+
+    def _save(self, keys: List[str], pending: Dict[str, str], computed, vectors: Dict[str, bytes], kind: str) -> None:
+        new = {key: array("f", vector).tobytes() for key, vector in zip(pending, computed)}
+        for key, vector in new.items():
+            vectors[key] = vector
+            self._remember(key, vector)
+        if self._disk is not None:
+            self._disk.put_many(new)
+        self._count(kind, "miss", sum(1 for key in keys if key in new))
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        vectors = self._cached(keys, kind)
+        # Textos sin vector en ninguna caché: una sola llamada al modelo (sin duplicados)
+        pending = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if pending:
+            if kind == "query" and len(pending) == 1:
+                computed = [self.embeddings.embed_query(text) for text in pending.values()]
+            else:
+                # Varias consultas a la vez (``embed_queries``): una sola llamada por lotes
+                computed = self.embeddings.embed_documents(list(pending.values()))
+            self._save(keys, pending, computed, vectors, kind)
+        return [array("f", vectors[key]).tolist() for key in keys]
+
+    async def _aembed(self, texts: List[str], kind: str) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        # SQLite en un thread; con solo memoria no hay I/O
+        if self._disk is not None:
+            vectors = await asyncio.to_thread(self._cached, keys, kind)
+        else:
+            vectors = self._cached(keys, kind)
+        pending = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if pending:
+            if kind == "query" and len(pending) == 1:
+                computed = [await self.embeddings.aembed_query(text) for text in pending.values()]
+            else:
+                computed = await self.embeddings.aembed_documents(list(pending.values()))
+            if self._disk is not None:
+                await asyncio.to_thread(self._save, keys, pending, computed, vectors, kind)
+            else:
+                self._save(keys, pending, computed, vectors, kind)
+        return [array("f", vectors[key]).tolist() for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeddings de varias consultas con una llamada (``embed_documents`` de
+        los textos no cacheados; en OpenAI, ``embed_query`` hace lo mismo con uno).
+        """
+        return self._embed(texts, "query")
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._aembed(texts, "document")
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self._aembed([text], "query"))[0]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        return await self._aembed(texts, "query")
+
+    def stats(self) -> dict:
+        """Aciertos por nivel, fallos y tasa de acierto desde el arranque."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return {"model": self.model, **stats}
+
+
+@lru_cache(maxsize=None)
+def get_embeddings() -> CachedEmbeddings:
+    """Embeddings compartidos por la ingesta y la búsqueda (creados en el primer uso)."""
+    from langchain_openai import OpenAIEmbeddings
+
+    embeddings = OpenAIEmbeddings(chunk_size=settings.EMBEDDING_BATCH_SIZE)
+    return CachedEmbeddings(embeddings, model=embeddings.model, path=settings.EMBEDDING_CACHE_PATH or None)
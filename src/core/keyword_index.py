@@ -0,0 +1,225 @@
+"""
+Índice de palabras clave (BM25) de los chunks indexados.
+
+Complementa la búsqueda vectorial en ``HybridRetriever``: nombres, códigos
+y términos exactos que un embedding puede no distinguir. Se alimenta con
+los mismos chunks que el vector store (ver ``VectorService.commit``) y usa
+FTS5 de SQLite (``KEYWORD_INDEX_PATH``): ranking BM25 nativo, sin acentos
+ni mayúsculas, en proceso y compartido por todos los workers.
+
+Cada namespace (tenant) tiene su propia tabla FTS5 (``chunks_fts`` la del
+por defecto, ``chunks_fts_<id>`` las demás, registradas en ``fts_tables``):
+una búsqueda solo recorre los postings de su tenant y las estadísticas de
+BM25 (número de chunks, longitud media, frecuencia de cada término) son
+las de su corpus. Vaciar un tenant es borrar su tabla.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from src.core.config import settings
+from src.core.vector_store import document_id
+
+# Tabla FTS5 del namespace por defecto (la única antes de los tenants)
+_DEFAULT_FTS = "chunks_fts"
+
+# Palabras sin valor de búsqueda: con OR entre términos, emparejarían casi todos los chunks
+STOPWORDS = frozenset(
+    "a al con como cual cuales cuando de del donde el en es esta este esto hay la las lo los mas me mi "
+    "no o para pero por que se sin sobre su sus un una uno unos y ya "
+    "an and are as at be by for from how in is it of on or the to what when where which who why with".split()
+)
+# Términos por consulta (FTS5 evalúa cada uno)
+_MAX_TERMS = 32
+
+
+def _words(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r"\w+", text)
+
+
+def query_terms(query: str) -> List[str]:
+    """Términos de búsqueda de una consulta: minúsculas, sin acentos ni stopwords."""
+    terms = [term for term in _words(query) if term not in STOPWORDS]
+    return list(dict.fromkeys(terms))[:_MAX_TERMS]
+
+
+def match_expression(query: str) -> str:
+    """
+    Consulta FTS5: las frases entre comillas deben aparecer seguidas (y
+    todas); del resto basta algún término. Vacía si no hay nada que buscar.
+    """
+    phrases = [" ".join(_words(phrase)) for phrase in re.findall(r'"([^"]+)"', query)]
+    phrases = [f'"{phrase}"' for phrase in phrases if phrase]
+    terms = [f'"{term}"' for term in query_terms(re.sub(r'"[^"]*"', " ", query))]
+    if phrases:
+        return " AND ".join(phrases + ([f"({' OR '.join(terms)})"] if terms else []))
+    return " OR ".join(terms)
+
+
+class KeywordIndex:
+    def __init__(self, path: str = None):
+        self.path = Path(path or settings.KEYWORD_INDEX_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+            legacy = bool(columns) and "namespace" not in columns
+            if legacy:
+                self._conn.execute("ALTER TABLE chunks RENAME TO chunks_legacy")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "row INTEGER PRIMARY KEY, namespace TEXT NOT NULL, id TEXT NOT NULL, "
+                "text TEXT NOT NULL, metadata TEXT NOT NULL, UNIQUE (namespace, id))"
+            )
+            if legacy:
+                # Índice de antes de los tenants: al namespace por defecto, con los mismos
+                # ``row`` (los rowid de ``chunks_fts``)
+                self._conn.execute(
+                    "INSERT INTO chunks (row, namespace, id, text, metadata) "
+                    "SELECT row, '', id, text, metadata FROM chunks_legacy"
+                )
+                self._conn.execute("DROP TABLE chunks_legacy")
+            self._create_fts(_DEFAULT_FTS)
+            tables = {row[0] for row in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fts_tables (id INTEGER PRIMARY KEY, namespace TEXT UNIQUE NOT NULL)"
+            )
+            if "fts_tables" not in tables:
+                self._split_fts()
+
+    def _create_fts(self, table: str) -> None:
+        # Tabla de contenido externo: el texto se guarda una vez, en ``chunks``
+        self._conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+            "text, content='chunks', content_rowid='row', tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def _split_fts(self) -> None:
+        """Índices con una sola tabla FTS5 para todos los tenants: cada tenant pasa a la suya."""
+        namespaces = [row[0] for row in self._conn.execute("SELECT DISTINCT namespace FROM chunks WHERE namespace != ''")]
+        for namespace in namespaces:
+            table = self._fts_table(namespace, create=True)
+            self._conn.execute(
+                f"INSERT INTO {table} (rowid, text) SELECT row, text FROM chunks WHERE namespace = ?", (namespace,)
+            )
+        if namespaces:
+            self._conn.execute(
+                f"INSERT INTO {_DEFAULT_FTS} ({_DEFAULT_FTS}, rowid, text) "
+                "SELECT 'delete', row, text FROM chunks WHERE namespace != ''"
+            )
+
+    def _fts_table(self, namespace: str, create: bool = False) -> Optional[str]:
+        """Tabla FTS5 de ``namespace`` (con ``create``, se crea si no existe); ``None`` si no tiene."""
+        if not namespace:
+            return _DEFAULT_FTS
+        row = self._conn.execute("SELECT id FROM fts_tables WHERE namespace = ?", (namespace,)).fetchone()
+        if row is None:
+            if not create:
+                return None
+            row = (self._conn.execute("INSERT INTO fts_tables (namespace) VALUES (?)", (namespace,)).lastrowid,)
+        # El nombre sale del id numérico, nunca del nombre del tenant
+        table = f"{_DEFAULT_FTS}_{row[0]}"
+        if create:
+            self._create_fts(table)
+        return table
+
+    def missing(self, ids: Iterable[str], namespace: str = "") -> Set[str]:
+        """IDs que aún no están en el índice de ``namespace``."""
+        ids = list(ids)
+        found = set()
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT id FROM chunks WHERE namespace = ? AND id IN ({','.join('?' * len(chunk))})",
+                    [namespace, *chunk],
+                )
+                found.update(chunk_id for (chunk_id,) in rows)
+        return set(ids) - found
+
+    def add(self, documents: List[Document], namespace: str = "") -> None:
+        """Indexa chunks; los que ya estaban (mismo ``document_id``) se ignoran."""
+        with self._lock, self._conn:
+            table = self._fts_table(namespace, create=True)
+            for doc in documents:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO chunks (namespace, id, text, metadata) VALUES (?, ?, ?, ?)",
+                    (
+                        namespace,
+                        document_id(doc),
+                        doc.page_content,
+                        json.dumps(doc.metadata, ensure_ascii=False, default=str),
+                    ),
+                )
+                if cursor.rowcount:
+                    self._conn.execute(
+                        f"INSERT INTO {table} (rowid, text) VALUES (?, ?)", (cursor.lastrowid, doc.page_content)
+                    )
+
+    def delete(self, ids: List[str], namespace: str = "") -> None:
+        """Quita chunks por ID; los que no existan se ignoran."""
+        with self._lock, self._conn:
+            table = self._fts_table(namespace)
+            if table is None:
+                return
+            for chunk_id in ids:
+                row = self._conn.execute(
+                    "SELECT row, text FROM chunks WHERE namespace = ? AND id = ?", (namespace, chunk_id)
+                ).fetchone()
+                if row is None:
+                    continue
+                self._conn.execute(f"INSERT INTO {table} ({table}, rowid, text) VALUES ('delete', ?, ?)", row)
+                self._conn.execute("DELETE FROM chunks WHERE row = ?", (row[0],))
+
+    def delete_namespace(self, namespace: str) -> None:
+        """Quita todos los chunks de ``namespace``."""
+        with self._lock, self._conn:
+            table = self._fts_table(namespace)
+            if table == _DEFAULT_FTS:
+                self._conn.execute(f"INSERT INTO {table} ({table}) VALUES ('delete-all')")
+            elif table is not None:
+                self._conn.execute(f"DROP TABLE {table}")
+                self._conn.execute("DELETE FROM fts_tables WHERE namespace = ?", (namespace,))
+            self._conn.execute("DELETE FROM chunks WHERE namespace = ?", (namespace,))
+
+    def search(self, query: str, k: int = 4, namespace: str = "") -> List[Tuple[Document, float]]:
+        """Chunks de ``namespace`` que coinciden con ``query`` (ver ``match_expression``), por BM25 descendente."""
+        match = match_expression(query)
+        if not match:
+            return []
+        with self._lock:
+            table = self._fts_table(namespace)
+            if table is None:
+                return []
+            rows = self._conn.execute(
+                f"SELECT chunks.text, chunks.metadata, -bm25({table}) FROM {table} "
+                f"JOIN chunks ON chunks.row = {table}.rowid "
+                f"WHERE {table} MATCH ? ORDER BY bm25({table}) LIMIT ?",
+                (match, k),
+            ).fetchall()
+        return [(Document(page_content=text, metadata=json.loads(metadata)), score) for text, metadata, score in rows]
+
+    def count(self, namespace: Optional[str] = None) -> int:
+        """Chunks de ``namespace`` (``None`` = de todos)."""
+        with self._lock:
+            if namespace is None:
+                return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM chunks WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+
+@lru_cache(maxsize=None)
+def get_keyword_index() -> KeywordIndex:
+    """Índice compartido por la ingesta y la búsqueda del proceso."""
+    return KeywordIndex()
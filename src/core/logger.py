@@ -0,0 +1,189 @@
+"""
+Capa de logging estructurado de la aplicación.
+
+- Niveles globales y por módulo (``LOG_LEVEL`` y ``LOG_LEVELS``).
+- Salida en texto o JSON (``LOG_FORMAT``) con los campos pasados en ``extra``.
+- Escritura no bloqueante: los handlers reales corren en un ``QueueListener``
+  y el camino de la petición sólo encola el registro.
+- Muestreo con límite de tasa para los logs de caminos calientes.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from src.core.config import settings
+
+# Atributos estándar de LogRecord: todo lo demás viene de ``extra``
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {
+        key: value
+        for key, value in record.__dict__.items()
+        if key not in _RESERVED_ATTRS and not key.startswith("_")
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea cada registro como una línea JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_extra_fields(record),
+        }
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legible para desarrollo: mensaje seguido de ``clave=valor``."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value!r}" for key, value in fields.items())
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no formatea en el hilo que emite.
+
+    El handler estándar llama a ``format()`` antes de encolar; aquí sólo se
+    resuelve el mensaje y se deja el formateo al hilo del listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # Si la cola está llena se descarta el registro antes que bloquear
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Deja pasar como máximo ``rate`` registros por segundo y por clave.
+
+    La clave es ``record.sample_key`` si existe o, por defecto, el logger y la
+    plantilla del mensaje. Los registros descartados se cuentan y se informan
+    en el siguiente registro que pase (campo ``suppressed``).
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._buckets: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate <= 0:
+            return True
+
+        key = getattr(record, "sample_key", None) or (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            # bucket = [tokens, última recarga, suprimidos]
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+def _parse_module_levels(spec: str) -> Dict[str, str]:
+    """Convierte ``"src.supervisor=DEBUG,src.tools=INFO"`` en un dict."""
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(force: bool = False) -> None:
+    """
+    Configura el logging de la aplicación una sola vez por proceso.
+
+    Los handlers de salida se ejecutan en un hilo aparte (QueueListener),
+    por lo que emitir un log en el camino de la petición no bloquea en I/O.
+    """
+    global _listener
+
+    with _configure_lock:
+        if _listener is not None and not force:
+            return
+        if _listener is not None:
+            _listener.stop()
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if settings.LOG_FORMAT == "json":
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(TextFormatter())
+
+        log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        queue_handler = _QueueHandler(log_queue)
+        if settings.LOG_SAMPLE_RATE > 0:
+            queue_handler.addFilter(RateLimitFilter(settings.LOG_SAMPLE_RATE))
+
+        app_logger = logging.getLogger("src")
+        app_logger.handlers = [queue_handler]
+        app_logger.propagate = False
+        app_logger.setLevel(settings.LOG_LEVEL)
+
+        for name, level in _parse_module_levels(settings.LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(
+            log_queue, stream_handler, respect_handler_level=True
+        )
+        _listener.start()
+
+
+def _shutdown() -> None:
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_shutdown)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Obtiene un logger de la aplicación (usar ``__name__``)."""
+    return logging.getLogger(name)
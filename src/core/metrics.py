@@ -0,0 +1,357 @@
+"""
+Métricas en memoria con exposición en formato de texto de Prometheus.
+
+Implementación mínima (contadores, gauges e histogramas con labels) pensada
+para poder dejarse activa bajo carga: cada observación es una búsqueda en un
+dict y una suma bajo un lock.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador monótono."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """Valor instantáneo que puede subir o bajar."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Histograma con buckets fijos (acumulativos al exponerse)."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # clave -> [conteos por bucket (+Inf al final), suma, total]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mide la duración del bloque en segundos."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        lines = []
+        for key, (counts, total_sum, total_count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{labels} {total_count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas de la aplicación."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Serializa todas las métricas en formato de texto de Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Grafo de chat
+GRAPH_NODE_SECONDS = registry.histogram(
+    "graph_node_duration_seconds", "Duración de cada nodo del grafo.", ["graph", "node"]
+)
+GRAPH_NODE_ERRORS = registry.counter(
+    "graph_node_errors_total", "Excepciones lanzadas por nodos del grafo.", ["graph", "node"]
+)
+
+# LLM
+LLM_REQUEST_SECONDS = registry.histogram(
+    "llm_request_duration_seconds", "Latencia de llamadas a LLM.", ["model", "role"]
+)
+LLM_TOKENS = registry.counter(
+    "llm_tokens_total", "Tokens consumidos por llamadas a LLM.", ["model", "role", "kind"]
+)
+LLM_ERRORS = registry.counter(
+    "llm_errors_total", "Llamadas a LLM que terminaron en error.", ["model", "role"]
+)
+
+# Tools
+LLM_COST = registry.counter(
+    "llm_cost_usd_total", "Coste estimado de las llamadas a LLMs (ver LLM_PRICES).", ["model", "role"]
+)
+REQUEST_TOKENS = registry.histogram(
+    "llm_tokens_per_request",
+    "Tokens de LLM consumidos por petición (chat) o análisis (video).",
+    ["endpoint", "kind"],
+    buckets=(100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000),
+)
+LLM_HEDGES = registry.counter(
+    "llm_hedged_requests_total", "Peticiones duplicadas (hedging) lanzadas y ganadas.", ["endpoint", "outcome"]
+)
+LLM_FALLBACKS = registry.counter(
+    "llm_fallback_calls_total", "Llamadas enviadas a un endpoint de fallback.", ["endpoint"]
+)
+LLM_TIMEOUTS = registry.counter(
+    "llm_timeouts_total", "Intentos que agotaron su parte del deadline.", ["endpoint"]
+)
+LLM_CIRCUIT_STATE = registry.gauge(
+    "llm_circuit_state", "Estado del circuit breaker (0 cerrado, 1 semiabierto, 2 abierto).", ["endpoint"]
+)
+LLM_CIRCUIT_REJECTED = registry.counter(
+    "llm_circuit_rejected_total", "Llamadas no enviadas por tener el circuito abierto.", ["endpoint"]
+)
+
+TOOL_SECONDS = registry.histogram(
+    "tool_duration_seconds", "Latencia de ejecución de tools.", ["tool"]
+)
+TOOL_ERRORS = registry.counter("tool_errors_total", "Errores en ejecución de tools.", ["tool"])
+
+# Chat / SSE
+CHAT_REQUEST_SECONDS = registry.histogram(
+    "chat_request_duration_seconds", "Duración total de peticiones de chat.", ["endpoint"]
+)
+SSE_FIRST_EVENT_SECONDS = registry.histogram(
+    "sse_time_to_first_event_seconds", "Tiempo hasta el primer evento SSE.", ["endpoint"]
+)
+SSE_BYTES = registry.counter(
+    "sse_bytes_total", "Bytes enviados en streams SSE (tras compresión).", ["protocol", "encoding"]
+)
+
+# Video
+FRAMES_INGESTED = registry.counter("frames_ingested_total", "Frames recibidos.", ["source"])
+FRAMES_DROPPED = registry.counter(
+    "frames_dropped_total", "Frames descartados (submuestreo o envío fallido).", ["reason"]
+)
+ANALYSIS_SECONDS = registry.histogram(
+    "video_analysis_duration_seconds", "Duración del grafo de análisis de video.", []
+)
+
+# Ingesta de documentos
+INGESTION_JOBS = registry.counter(
+    "ingestion_jobs_total", "Jobs de ingesta de documentos por estado.", ["status"]
+)
+INGESTION_CHUNKS = registry.counter(
+    "ingestion_chunks_total", "Chunks ingeridos por acción (embedded, skipped, deleted).", ["action"]
+)
+INGESTION_SECONDS = registry.histogram(
+    "ingestion_job_duration_seconds", "Duración de los jobs de ingesta.", [],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+RETRIEVAL_QUERIES = registry.counter(
+    "retrieval_queries_total", "Búsquedas en documentos internos por modo (keyword, hybrid, vector).", ["mode"]
+)
+EMBEDDING_CACHE = registry.counter(
+    "embedding_cache_total", "Textos embebidos por tipo y resultado de caché (memory, disk, miss).", ["kind", "result"]
+)
+VECTOR_SEARCH_CACHE = registry.counter(
+    "vector_search_cache_total",
+    "Búsquedas vectoriales por resultado de caché (hit, miss) y entradas invalidadas (invalidated).",
+    ["result"],
+)
+
+
+def instrument_node(graph: str, name: str, node):
+    """
+    Envuelve un nodo del grafo para medir su duración y errores.
+
+    Acepta tanto funciones ``(state)`` como runnables (ej. ``ToolNode``),
+    a los que se les propaga la config de LangGraph. Si el runnable tiene
+    implementación async, el nodo envuelto la conserva.
+    """
+    if hasattr(node, "invoke"):
+        def call(state, config):
+            return node.invoke(state, config)
+    else:
+        def call(state, config):
+            return node(state)
+
+    def wrapper(state, config):
+        start = time.perf_counter()
+        try:
+            return call(state, config)
+        except Exception:
+            GRAPH_NODE_ERRORS.inc(graph=graph, node=name)
+            raise
+        finally:
+            GRAPH_NODE_SECONDS.observe(time.perf_counter() - start, graph=graph, node=name)
+
+    wrapper.__name__ = name
+    if not hasattr(node, "ainvoke"):
+        return wrapper
+
+    async def awrapper(state, config):
+        start = time.perf_counter()
+        try:
+            return await node.ainvoke(state, config)
+        except Exception:
+            GRAPH_NODE_ERRORS.inc(graph=graph, node=name)
+            raise
+        finally:
+            GRAPH_NODE_SECONDS.observe(time.perf_counter() - start, graph=graph, node=name)
+
+    from langchain_core.runnables import RunnableLambda
+
+    return RunnableLambda(wrapper, afunc=awrapper, name=name)
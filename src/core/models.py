@@ -1,24 +1,158 @@
 import os
+from functools import reduce
+from typing import Any, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from langchain_core.messages import BaseMessageChunk, message_chunk_to_message
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import ensure_config
 from langchain_openai import ChatOpenAI
 
-def get_model(model_name: str = None, temperature: float = 0):
+from src.core import resilience
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.core.callbacks import llm_metrics_callback
+
+logger = get_logger(__name__)
+
+# Tag con el que LangGraph no emite los tokens de una llamada en stream_mode="messages"
+_NOSTREAM_TAG = "nostream"
+
+
+def endpoint_name(model: str, api_base: Optional[str]) -> str:
+    """Identificador de un endpoint (modelo y host) para el circuit breaker y las métricas."""
+    host = urlparse(api_base).netloc if api_base else "api.openai.com"
+    return f"{model}@{host}"
+
+
+def _streams_tokens(config: RunnableConfig) -> bool:
+    """Indica si algún callback consume tokens (ej. LangGraph con stream_mode="messages")."""
+    from langchain_core.tracers._streaming import _StreamingCallbackHandler
+
+    callbacks = config.get("callbacks")
+    handlers = getattr(callbacks, "handlers", callbacks) or []
+    return any(isinstance(handler, _StreamingCallbackHandler) for handler in handlers)
+
+
+async def _first_chunk(stream):
+    """Espera el primer chunk de un stream y lo devuelve junto al resto del stream."""
+    iterator = stream.__aiter__()
+    try:
+        first = await iterator.__anext__()
+    except BaseException:
+        await iterator.aclose()
+        raise
+    return first, iterator
+
+
+def _merge(chunks: list) -> Any:
+    if isinstance(chunks[0], BaseMessageChunk):
+        return message_chunk_to_message(reduce(lambda a, b: a + b, chunks))
+    # Salidas ya procesadas (ej. structured output): la última es la completa
+    return chunks[-1]
+
+
+class ResilientChatModel(Runnable):
+    """
+    Modelo de chat con hedging, fallback, circuit breaker y deadline
+    (ver ``src.core.resilience``).
+
+    Envuelve modelos equivalentes, el principal y los de fallback;
+    ``bind_tools`` y ``with_structured_output`` se aplican a todos. Cuando
+    el grafo transmite tokens, el hedging y el deadline cubren hasta el
+    primer token, y el hedge no transmite tokens: si gana, su respuesta
+    llega completa al terminar el nodo.
+    """
+
+    def __init__(self, endpoints: List[Tuple[str, Runnable]]):
+        self.endpoints = endpoints
+
+    def bind_tools(self, *args, **kwargs) -> "ResilientChatModel":
+        return ResilientChatModel([(name, model.bind_tools(*args, **kwargs)) for name, model in self.endpoints])
+
+    def with_structured_output(self, *args, **kwargs) -> "ResilientChatModel":
+        return ResilientChatModel(
+            [(name, model.with_structured_output(*args, **kwargs)) for name, model in self.endpoints]
+        )
+
+    def invoke(self, input, config: Optional[RunnableConfig] = None, **kwargs):
+        config = ensure_config(config)
+        key = config.get("metadata", {}).get("langgraph_node", "")
+        # Un hedge en un thread no se puede cancelar: con tokens en curso emitiría el suyo también
+        return resilience.call(
+            self.endpoints,
+            lambda model, is_hedge: model.invoke(input, config, **kwargs),
+            key=key,
+            hedge=not _streams_tokens(config),
+        )
+
+    async def ainvoke(self, input, config: Optional[RunnableConfig] = None, **kwargs):
+        config = ensure_config(config)
+        key = config.get("metadata", {}).get("langgraph_node", "")
+        if not _streams_tokens(config):
+            return await resilience.acall(
+                self.endpoints, lambda model, is_hedge: model.ainvoke(input, config, **kwargs), key=key
+            )
+
+        def attempt(model, is_hedge):
+            attempt_config = config
+            if is_hedge:
+                attempt_config = {**config, "tags": [*config.get("tags", []), _NOSTREAM_TAG]}
+            return _first_chunk(model.astream(input, attempt_config, **kwargs))
+
+        first, rest = await resilience.acall(self.endpoints, attempt, key=f"{key}:first_token")
+        return _merge([first] + [chunk async for chunk in rest])
+
+
+def _chat_model(model: str, api_key: str, api_base: Optional[str], temperature: float, disable_streaming: bool):
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        openai_api_key=api_key,
+        base_url=api_base if api_base else None,
+        max_retries=settings.LLM_MAX_RETRIES,
+        timeout=settings.LLM_TIMEOUT_SECONDS,
+        callbacks=[llm_metrics_callback],
+        disable_streaming=disable_streaming,
+        # Uso de tokens también en respuestas con streaming (contabilidad por petición)
+        stream_usage=True,
+    )
+
+
+def get_model(model_name: str = None, temperature: float = 0, disable_streaming: bool = False):
     """
     Factory para obtener instancias de LLMs preconfiguradas.
+
+    ``disable_streaming`` evita que el modelo emita tokens aunque el grafo se
+    ejecute con stream_mode="messages" (ej. salidas estructuradas de routing).
+
+    El modelo devuelto aplica hedging, fallback (``LLM_FALLBACK_*``), circuit
+    breaker y deadline a cada llamada.
     """
     api_key = os.getenv("OPENAI_API_KEY")
     api_base = os.getenv("OPENAI_API_BASE")
     target_model = model_name or os.getenv("OPENAI_MODEL_NAME", "google/gemini-1.5-flash:free")
-    
+
     if not api_key or api_key == "your_openrouter_api_key_here":
         # Evitar fallos críticos en importación si la key no está configurada aún
-        print("⚠️ Advertencia: OPENAI_API_KEY no configurada correctamente.")
+        logger.warning("OPENAI_API_KEY no configurada correctamente.")
 
-    model = ChatOpenAI(
-        model=target_model,
-        temperature=temperature,
-        openai_api_key=api_key,
-        base_url=api_base if api_base else None,
-        max_retries=3
-    )
-    
-    return model
+    endpoints = [(
+        endpoint_name(target_model, api_base),
+        _chat_model(target_model, api_key, api_base, temperature, disable_streaming),
+    )]
+    if settings.LLM_FALLBACK_MODEL or settings.LLM_FALLBACK_API_BASE:
+        fallback_model = settings.LLM_FALLBACK_MODEL or target_model
+        fallback_base = settings.LLM_FALLBACK_API_BASE or api_base
+        endpoints.append((
+            endpoint_name(fallback_model, fallback_base),
+            _chat_model(
+                fallback_model,
+                settings.LLM_FALLBACK_API_KEY or api_key,
+                fallback_base,
+                temperature,
+                disable_streaming,
+            ),
+        ))
+
+    return ResilientChatModel(endpoints)
@@ -0,0 +1,331 @@
+"""
+Resiliencia de las llamadas a LLMs: hedging, fallback, circuit breaker y deadline.
+
+- Hedging: si un endpoint no responde en ``LLM_HEDGE_DELAY_MS`` (o en el
+  percentil ``LLM_HEDGE_PERCENTILE`` de sus latencias recientes, si es mayor)
+  se lanza una petición duplicada al mismo endpoint y se usa la primera que
+  responda; la otra se cancela.
+- Fallback: si un endpoint falla o tiene el circuito abierto, se prueba el
+  siguiente de la lista (modelo o proveedor alternativo).
+- Circuit breaker por endpoint: tras ``LLM_BREAKER_FAILURES`` fallos seguidos
+  el endpoint deja de recibir llamadas durante ``LLM_BREAKER_RESET_SECONDS``;
+  después pasa una única llamada de prueba.
+- Deadline: ``LLM_TIMEOUT_SECONDS`` acota la llamada completa; el tiempo que
+  queda se reparte entre los endpoints pendientes para que un endpoint
+  colgado no impida probar el fallback.
+
+``acall`` y ``call`` son las variantes async y sync. En la sync los intentos
+corren en un pool de threads: el perdedor de un hedge no se puede cancelar y
+su resultado simplemente se descarta.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.core.metrics import (
+    LLM_CIRCUIT_REJECTED,
+    LLM_CIRCUIT_STATE,
+    LLM_FALLBACKS,
+    LLM_HEDGES,
+    LLM_TIMEOUTS,
+)
+
+logger = get_logger(__name__)
+
+# Mínimo de muestras antes de usar el percentil como umbral de hedging
+MIN_LATENCY_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+Endpoints = Sequence[Tuple[str, Any]]
+
+
+class CircuitOpenError(RuntimeError):
+    """Ningún endpoint admite llamadas (todos con el circuito abierto)."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Un intento no respondió dentro de su parte del deadline."""
+
+
+class CircuitBreaker:
+    """Circuit breaker de un endpoint (cerrado → abierto → semiabierto)."""
+
+    def __init__(self, endpoint: str, failure_threshold: int = None, reset_seconds: float = None):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold or settings.LLM_BREAKER_FAILURES
+        self.reset_seconds = settings.LLM_BREAKER_RESET_SECONDS if reset_seconds is None else reset_seconds
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        LLM_CIRCUIT_STATE.set(0, endpoint=endpoint)
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Indica si se puede llamar al endpoint (con circuito abierto, solo la prueba)."""
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._set_state("half_open")
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._set_state("closed")
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state("open")
+
+    def release(self) -> None:
+        """La llamada se canceló sin resultado: si era la prueba, se permite otra."""
+        with self._lock:
+            if self._state == "half_open":
+                self._set_state("open")
+
+    def _set_state(self, state: str) -> None:
+        if state == self._state:
+            return
+        if state == "open":
+            logger.warning("LLM: circuito abierto", extra={"endpoint": self.endpoint, "failures": self._failures})
+        elif state == "closed":
+            logger.info("LLM: circuito cerrado", extra={"endpoint": self.endpoint})
+        self._state = state
+        LLM_CIRCUIT_STATE.set(_STATE_VALUES[state], endpoint=self.endpoint)
+
+
+class _LatencyWindow:
+    """Últimas latencias observadas de un endpoint para una misma clase de llamada."""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._values.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if len(self._values) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self._values)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[Tuple[str, str], _LatencyWindow] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    """Circuit breaker compartido por todas las llamadas a ``endpoint``."""
+    with _registry_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint)
+        return _breakers[endpoint]
+
+
+def _latency_window(endpoint: str, key: str) -> _LatencyWindow:
+    with _registry_lock:
+        return _latencies.setdefault((endpoint, key), _LatencyWindow())
+
+
+def _hedge_delay(endpoint: str, key: str, hedge: bool) -> Optional[float]:
+    """Segundos antes de lanzar el hedge (None = sin hedging)."""
+    if not hedge or settings.LLM_HEDGE_DELAY_MS <= 0:
+        return None
+    delay = settings.LLM_HEDGE_DELAY_MS / 1000
+    if settings.LLM_HEDGE_PERCENTILE > 0:
+        observed = _latency_window(endpoint, key).percentile(settings.LLM_HEDGE_PERCENTILE)
+        if observed is not None:
+            delay = max(delay, observed)
+    return delay
+
+
+def _plan(endpoints: Endpoints, index: int, deadline: float) -> Optional[Tuple[CircuitBreaker, float]]:
+    """Breaker y presupuesto de tiempo del endpoint ``index`` (None si no admite llamadas)."""
+    endpoint = endpoints[index][0]
+    breaker = get_breaker(endpoint)
+    if not breaker.allow():
+        LLM_CIRCUIT_REJECTED.inc(endpoint=endpoint)
+        return None
+    if index > 0:
+        LLM_FALLBACKS.inc(endpoint=endpoint)
+    budget = (deadline - time.monotonic()) / (len(endpoints) - index)
+    return breaker, budget
+
+
+def _give_up(last_error: Optional[BaseException], endpoints: Endpoints):
+    if last_error is None:
+        raise CircuitOpenError(f"Circuito abierto en {', '.join(name for name, _ in endpoints)}")
+    raise last_error
+
+
+async def acall(
+    endpoints: Endpoints,
+    attempt: Callable[[Any, bool], Awaitable[Any]],
+    *,
+    key: str = "",
+    hedge: bool = True,
+) -> Any:
+    """
+    Ejecuta ``attempt(target, is_hedge)`` sobre ``endpoints`` (``[(nombre, target)]``,
+    principal primero) con hedging, fallback, circuit breaker y deadline.
+
+    ``key`` separa las latencias usadas para el umbral de hedging (ej. el nodo
+    que llama), ya que un routing y una respuesta larga no son comparables.
+    """
+    deadline = time.monotonic() + settings.LLM_TIMEOUT_SECONDS
+    last_error: Optional[BaseException] = None
+    for index, (endpoint, target) in enumerate(endpoints):
+        if time.monotonic() >= deadline:
+            break
+        plan = _plan(endpoints, index, deadline)
+        if plan is None:
+            continue
+        breaker, budget = plan
+        started = time.monotonic()
+        try:
+            result = await _ahedged(endpoint, target, attempt, breaker, budget, _hedge_delay(endpoint, key, hedge))
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            last_error = e
+            logger.warning("LLM: fallo en endpoint", extra={"endpoint": endpoint, "error": str(e)})
+            continue
+        breaker.record_success()
+        _latency_window(endpoint, key).observe(time.monotonic() - started)
+        return result
+    _give_up(last_error, endpoints)
+
+
+async def _ahedged(endpoint, target, attempt, breaker, budget: float, hedge_delay: Optional[float]):
+    started = time.monotonic()
+    tasks = {asyncio.ensure_future(attempt(target, False)): False}
+    error: Optional[BaseException] = None
+    try:
+        while tasks:
+            elapsed = time.monotonic() - started
+            if elapsed >= budget:
+                LLM_TIMEOUTS.inc(endpoint=endpoint)
+                raise DeadlineExceeded(f"{endpoint}: sin respuesta en {budget:.1f}s")
+            timeout = budget - elapsed
+            if hedge_delay is not None:
+                timeout = min(timeout, max(0.0, hedge_delay - elapsed))
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            # Ante un empate gana la petición original
+            for task in sorted(done, key=lambda t: tasks[t]):
+                is_hedge = tasks.pop(task)
+                if task.exception() is None:
+                    if is_hedge:
+                        LLM_HEDGES.inc(endpoint=endpoint, outcome="won")
+                    return task.result()
+                error = task.exception()
+            if hedge_delay is not None and time.monotonic() - started >= hedge_delay:
+                hedge_delay = None
+                # El hedge solo tiene sentido si la original sigue en curso
+                if tasks and breaker.state == "closed":
+                    tasks[asyncio.ensure_future(attempt(target, True))] = True
+                    LLM_HEDGES.inc(endpoint=endpoint, outcome="launched")
+        raise error
+    finally:
+        for task in tasks:
+            if task.done():
+                if not task.cancelled():
+                    task.exception()
+            else:
+                task.cancel()
+
+
+@lru_cache(maxsize=None)
+def _executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-call")
+
+
+def call(
+    endpoints: Endpoints,
+    attempt: Callable[[Any, bool], Any],
+    *,
+    key: str = "",
+    hedge: bool = True,
+) -> Any:
+    """Variante sync de ``acall`` (intentos en threads que heredan el contexto)."""
+    deadline = time.monotonic() + settings.LLM_TIMEOUT_SECONDS
+    last_error: Optional[BaseException] = None
+    for index, (endpoint, target) in enumerate(endpoints):
+        if time.monotonic() >= deadline:
+            break
+        plan = _plan(endpoints, index, deadline)
+        if plan is None:
+            continue
+        breaker, budget = plan
+        started = time.monotonic()
+        try:
+            result = _hedged(endpoint, target, attempt, breaker, budget, _hedge_delay(endpoint, key, hedge))
+        except Exception as e:
+            breaker.record_failure()
+            last_error = e
+            logger.warning("LLM: fallo en endpoint", extra={"endpoint": endpoint, "error": str(e)})
+            continue
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+        _latency_window(endpoint, key).observe(time.monotonic() - started)
+        return result
+    _give_up(last_error, endpoints)
+
+
+def _hedged(endpoint, target, attempt, breaker, budget: float, hedge_delay: Optional[float]):
+    def submit(is_hedge: bool):
+        # Cada intento conserva el contexto (config de LangChain, logging)
+        context = contextvars.copy_context()
+        return _executor().submit(context.run, attempt, target, is_hedge)
+
+    started = time.monotonic()
+    futures = {submit(False): False}
+    error: Optional[BaseException] = None
+    while futures:
+        elapsed = time.monotonic() - started
+        if elapsed >= budget:
+            LLM_TIMEOUTS.inc(endpoint=endpoint)
+            raise DeadlineExceeded(f"{endpoint}: sin respuesta en {budget:.1f}s")
+        timeout = budget - elapsed
+        if hedge_delay is not None:
+            timeout = min(timeout, max(0.0, hedge_delay - elapsed))
+        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in sorted(done, key=lambda f: futures[f]):
+            is_hedge = futures.pop(future)
+            if future.exception() is None:
+                if is_hedge:
+                    LLM_HEDGES.inc(endpoint=endpoint, outcome="won")
+                return future.result()
+            error = future.exception()
+        if hedge_delay is not None and time.monotonic() - started >= hedge_delay:
+            hedge_delay = None
+            if futures and breaker.state == "closed":
+                futures[submit(True)] = True
+                LLM_HEDGES.inc(endpoint=endpoint, outcome="launched")
+    raise error
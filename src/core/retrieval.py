@@ -0,0 +1,111 @@
+"""
+Búsqueda híbrida sobre los documentos indexados.
+
+``HybridRetriever`` combina el índice BM25 (``KeywordIndex``) con el vector
+store y fusiona ambos rankings con Reciprocal Rank Fusion: cada chunk suma
+``1 / (RRF_K + posición)`` por cada ranking en el que aparece, sin tener que
+calibrar puntuaciones BM25 contra similitudes coseno.
+
+Las consultas de tipo palabra clave (entre comillas, o de pocas palabras sin
+ser una pregunta) se responden solo con BM25, sin embedding ni llamada al
+vector store; si BM25 no encuentra nada, se usa la búsqueda vectorial.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from src.core.config import settings
+from src.core.keyword_index import KeywordIndex, get_keyword_index
+from src.core.logger import get_logger
+from src.core.metrics import RETRIEVAL_QUERIES
+from src.core.vector_factory import get_shared_vector_store
+from src.core.vector_store import document_id
+
+logger = get_logger(__name__)
+
+# Constante de RRF (valor habitual): reduce el peso de las primeras posiciones de cada ranking
+RRF_K = 60
+
+
+def is_keyword_query(query: str) -> bool:
+    """Consulta literal: frase entre comillas o pocas palabras que no forman una pregunta."""
+    if re.search(r'"[^"]+"', query):
+        return True
+    words = query.split()
+    return 0 < len(words) <= settings.RETRIEVAL_KEYWORD_MAX_WORDS and not re.search(r"[?¿]", query)
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = RRF_K) -> List[Document]:
+    """Fusiona rankings de chunks (identificados por ``document_id``) por RRF."""
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            doc_id = document_id(doc)
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(doc_id, doc)
+    return [documents[doc_id] for doc_id in sorted(scores, key=scores.get, reverse=True)]
+
+
+class HybridRetriever:
+    def __init__(self, keyword_index: Optional[KeywordIndex] = None, vector_store=None):
+        self.keyword_index = keyword_index or get_keyword_index()
+        self._vector_store = vector_store
+
+    def _vector_search(self, query: str, k: int, namespace: str) -> List[Document]:
+        try:
+            # Se crea en la primera búsqueda vectorial: las de palabra clave no lo necesitan
+            if self._vector_store is None:
+                self._vector_store = get_shared_vector_store()
+            return self._vector_store.similarity_search(query, k=k, namespace=namespace)
+        except Exception as e:
+            # Sin vector store (p. ej. sin credenciales) queda la búsqueda BM25
+            logger.warning("Búsqueda vectorial no disponible", extra={"error": str(e)})
+            return []
+
+    def search(
+        self, query: str, k: int = None, require_keyword_match: bool = False, namespace: str = ""
+    ) -> List[Document]:
+        """
+        Chunks más relevantes para ``query`` entre los de ``namespace`` (tenant).
+
+        Cada documento lleva en ``metadata["retrieval"]`` de dónde salió:
+        ``bm25``, ``vector`` o ``hybrid`` (encontrado por ambas búsquedas).
+        Con ``require_keyword_match`` no se busca por vectores si BM25 no
+        encuentra nada (la búsqueda vectorial siempre devuelve vecinos).
+        """
+        k = k or settings.RETRIEVAL_K
+        # Más candidatos que ``k`` por ranking: la fusión reordena
+        candidates = k * settings.RETRIEVAL_CANDIDATES
+        keyword_hits = [doc for doc, _ in self.keyword_index.search(query, candidates, namespace)]
+
+        if is_keyword_query(query) and keyword_hits:
+            RETRIEVAL_QUERIES.inc(mode="keyword")
+            return [_tag(doc, "bm25") for doc in keyword_hits[:k]]
+        if require_keyword_match and not keyword_hits:
+            return []
+
+        vector_hits = self._vector_search(query, candidates, namespace)
+        RETRIEVAL_QUERIES.inc(mode="hybrid" if keyword_hits else "vector")
+        keyword_ids = {document_id(doc) for doc in keyword_hits}
+        vector_ids = {document_id(doc) for doc in vector_hits}
+        results = []
+        for doc in reciprocal_rank_fusion([keyword_hits, vector_hits])[:k]:
+            doc_id = document_id(doc)
+            found_by = "hybrid" if doc_id in keyword_ids and doc_id in vector_ids else "bm25" if doc_id in keyword_ids else "vector"
+            results.append(_tag(doc, found_by))
+        return results
+
+
+def _tag(doc: Document, found_by: str) -> Document:
+    doc.metadata["retrieval"] = found_by
+    return doc
+
+
+@lru_cache(maxsize=None)
+def get_retriever() -> HybridRetriever:
+    """Retriever compartido por las tools del proceso."""
+    return HybridRetriever()
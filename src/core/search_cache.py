@@ -0,0 +1,387 @@
+"""
+Caché de resultados de búsqueda del vector store.
+
+``CachedVectorStore`` envuelve el store compartido (``get_shared_vector_store``)
+y guarda lo que devuelven ``similarity_search`` y ``similarity_search_batch``
+con la clave (consultas normalizadas, k, filtro, namespace): una pregunta
+repetida entre dos ingestas se responde desde memoria, sin embedding ni
+consulta al índice. Como mucho ``SEARCH_CACHE_SIZE`` entradas (LRU) y
+``SEARCH_CACHE_TTL_SECONDS`` de vida.
+
+Las escrituras pasan por el mismo objeto e invalidan solo lo afectado:
+- ``add_documents``: las entradas del namespace cuyo filtro cumple alguno
+  de los documentos nuevos, o que ya contienen alguno de sus IDs;
+- ``delete``: las que contienen alguno de los IDs borrados;
+- ``delete_index``: todas las del namespace.
+Una búsqueda que coincide con una escritura no se guarda, ni las de los
+``SEARCH_CACHE_FRESHNESS_SECONDS`` siguientes (el índice de Pinecone tarda
+unos segundos en reflejar lo escrito).
+
+Con varios workers, cada escritura incrementa la generación del namespace
+en SQLite (``SEARCH_CACHE_PATH``). Las búsquedas la leen como mucho una vez
+cada ``SEARCH_CACHE_SYNC_SECONDS`` por namespace (las async, en un thread;
+un acierto entre lecturas no sale de memoria) y, si otro worker escribió,
+descartan las entradas de ese namespace. Un resultado solo se guarda tras
+comprobar que nadie escribió durante la búsqueda.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from src.core.config import settings
+from src.core.embeddings import normalize_text
+from src.core.metrics import VECTOR_SEARCH_CACHE
+from src.core.vector_store import BaseVectorStore, MetadataFilter, document_id, matches_filter
+
+# (consultas, k, filtro, namespace)
+CacheKey = Tuple[Tuple[str, ...], int, str, str]
+# Resultado de la métrica -> campo de ``stats()``
+_STATS = {"hit": "hits", "miss": "misses", "invalidated": "invalidated"}
+
+
+def _filter_key(metadata_filter: Optional[MetadataFilter]) -> str:
+    return json.dumps(metadata_filter or {}, sort_keys=True, default=str)
+
+
+def _copy(docs: List[Document]) -> List[Document]:
+    # Los llamadores anotan la metadata (ej. ``HybridRetriever``): cada uno recibe la suya
+    return [doc.model_copy(update={"metadata": dict(doc.metadata)}) for doc in docs]
+
+
+@dataclass
+class _Entry:
+    namespace: str
+    filter: Optional[MetadataFilter]
+    ids: FrozenSet[str]
+    docs: List[Document]
+    expires_at: float
+
+
+class _Generations:
+    """Generación de escrituras por namespace, compartida por los workers."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations ("
+                "namespace TEXT PRIMARY KEY, generation INTEGER NOT NULL, written_at REAL NOT NULL)"
+            )
+
+    def get(self, namespace: str) -> Tuple[int, float]:
+        """(generación, hora de la última escritura) de ``namespace``."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generation, written_at FROM generations WHERE namespace = ?", (namespace,)
+            ).fetchone()
+        return row or (0, 0.0)
+
+    def bump(self, namespace: str, written_at: float) -> int:
+        """Registra una escritura en ``namespace``; retorna la nueva generación."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO generations (namespace, generation, written_at) VALUES (?, 1, ?) "
+                "ON CONFLICT (namespace) DO UPDATE SET generation = generation + 1, written_at = excluded.written_at",
+                (namespace, written_at),
+            )
+            return self._conn.execute(
+                "SELECT generation FROM generations WHERE namespace = ?", (namespace,)
+            ).fetchone()[0]
+
+
+class CachedVectorStore(BaseVectorStore):
+    """``BaseVectorStore`` que responde las búsquedas repetidas desde memoria."""
+
+    def __init__(
+        self,
+        store: BaseVectorStore,
+        max_size: int = None,
+        ttl: float = None,
+        path: Optional[str] = None,
+        freshness: float = None,
+        sync_interval: float = None,
+    ):
+        self.store = store
+        self.max_size = settings.SEARCH_CACHE_SIZE if max_size is None else max_size
+        self.ttl = settings.SEARCH_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.freshness = settings.SEARCH_CACHE_FRESHNESS_SECONDS if freshness is None else freshness
+        self.sync_interval = settings.SEARCH_CACHE_SYNC_SECONDS if sync_interval is None else sync_interval
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._by_namespace: Dict[str, Set[CacheKey]] = {}
+        self._lock = threading.Lock()
+        self._generations = _Generations(path) if path else None
+        # Por namespace: escrituras locales (empezadas o terminadas), última
+        # generación compartida vista, cuándo se leyó y hora de la última escritura
+        self._versions: Dict[str, int] = {}
+        self._seen: Dict[str, int] = {}
+        self._synced_at: Dict[str, float] = {}
+        self._written_at: Dict[str, float] = {}
+        self._stats = {"hits": 0, "misses": 0, "invalidated": 0}
+
+    def _count(self, result: str, count: int = 1) -> None:
+        if count:
+            VECTOR_SEARCH_CACHE.inc(count, result=result)
+            with self._lock:
+                self._stats[_STATS[result]] += count
+
+    # --- Entradas ---
+
+    def _drop(self, keys: List[CacheKey]) -> int:
+        """Quita entradas (con ``self._lock`` tomado)."""
+        for key in keys:
+            entry = self._entries.pop(key)
+            namespace_keys = self._by_namespace[entry.namespace]
+            namespace_keys.discard(key)
+            if not namespace_keys:
+                del self._by_namespace[entry.namespace]
+        return len(keys)
+
+    def _invalidate(self, namespace: str, affected: Optional[Callable[[_Entry], bool]] = None) -> int:
+        """Quita las entradas de ``namespace`` afectadas (todas sin ``affected``), con el lock tomado."""
+        keys = list(self._by_namespace.get(namespace, ()))
+        if affected is not None:
+            keys = [key for key in keys if affected(self._entries[key])]
+        return self._drop(keys)
+
+    def _sync(self, namespace: str) -> None:
+        """Descarta lo del namespace si otro worker escribió en él desde la última vez."""
+        if self._generations is None:
+            return
+        self._synced_at[namespace] = time.monotonic()
+        # Lectura por clave primaria; con WAL no espera a los escritores
+        generation, written_at = self._generations.get(namespace)
+        dropped = 0
+        with self._lock:
+            if generation > self._seen.get(namespace, 0):
+                self._seen[namespace] = generation
+                self._written_at[namespace] = max(written_at, self._written_at.get(namespace, 0.0))
+                self._versions[namespace] = self._versions.get(namespace, 0) + 1
+                dropped = self._invalidate(namespace)
+        self._count("invalidated", dropped)
+
+    def _sync_due(self, namespace: str) -> bool:
+        """Si toca volver a leer la generación compartida de ``namespace``."""
+        if self._generations is None:
+            return False
+        synced_at = self._synced_at.get(namespace)
+        return synced_at is None or time.monotonic() - synced_at >= self.sync_interval
+
+    def _lookup(self, key: CacheKey) -> Tuple[Optional[List[Document]], int]:
+        """(resultado cacheado o ``None``, versión del namespace para ``_store``); solo memoria."""
+        namespace = key[3]
+        with self._lock:
+            version = self._versions.get(namespace, 0)
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._drop([key])
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                docs = _copy(entry.docs)
+        self._count("hit" if entry is not None else "miss")
+        return (docs if entry is not None else None), version
+
+    def _search_start(self, key: CacheKey) -> Tuple[Optional[List[Document]], int]:
+        if self._sync_due(key[3]):
+            self._sync(key[3])
+        return self._lookup(key)
+
+    async def _asearch_start(self, key: CacheKey) -> Tuple[Optional[List[Document]], int]:
+        # SQLite fuera del loop
+        if self._sync_due(key[3]):
+            await asyncio.to_thread(self._sync, key[3])
+        return self._lookup(key)
+
+    def _store(self, key: CacheKey, metadata_filter: Optional[MetadataFilter], docs: List[Document], version: int) -> None:
+        """Guarda un resultado si nadie escribió en el namespace durante la búsqueda."""
+        namespace = key[3]
+        # Siempre se lee: una escritura de otro worker durante la búsqueda invalida el resultado
+        self._sync(namespace)
+        with self._lock:
+            # Hubo escrituras durante la búsqueda, o el índice aún puede no reflejar la última
+            if self._versions.get(namespace, 0) != version:
+                return
+            if time.time() - self._written_at.get(namespace, 0.0) < self.freshness:
+                return
+            if key in self._entries:
+                self._drop([key])
+            self._entries[key] = _Entry(
+                namespace=namespace,
+                filter=metadata_filter,
+                ids=frozenset(document_id(doc) for doc in docs),
+                docs=_copy(docs),
+                expires_at=time.monotonic() + self.ttl,
+            )
+            self._by_namespace.setdefault(namespace, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop([next(iter(self._entries))])
+
+    async def _astore(self, key: CacheKey, metadata_filter: Optional[MetadataFilter], docs: List[Document], version: int) -> None:
+        # Con SQLite, en un thread; con solo memoria no hay I/O
+        if self._generations is not None:
+            await asyncio.to_thread(self._store, key, metadata_filter, docs, version)
+        else:
+            self._store(key, metadata_filter, docs, version)
+
+    def _key(self, queries: List[str], k: int, metadata_filter: Optional[MetadataFilter], namespace: str) -> CacheKey:
+        return tuple(normalize_text(query) for query in queries), k, _filter_key(metadata_filter), namespace
+
+    # --- Escrituras ---
+
+    def _begin_write(self, namespace: str) -> None:
+        # Las búsquedas en curso en el namespace ya no se guardan
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def _end_write(self, namespace: str, affected: Optional[Callable[[_Entry], bool]]) -> None:
+        written_at = time.time()
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            self._written_at[namespace] = written_at
+            if self._generations is not None:
+                # Con el lock tomado: un ``_sync`` concurrente no confunde esta escritura con la de otro worker
+                generation = self._generations.bump(namespace, written_at)
+                if generation != self._seen.get(namespace, 0) + 1:
+                    # Otro worker también escribió y aún no se había visto
+                    affected = None
+                self._seen[namespace] = generation
+            dropped = self._invalidate(namespace, affected)
+        self._count("invalidated", dropped)
+
+    @staticmethod
+    def _added(documents: List[Document]) -> Callable[[_Entry], bool]:
+        """Entradas que los documentos añadidos pueden cambiar."""
+        ids = {document_id(doc) for doc in documents}
+        matched: Dict[str, bool] = {}
+
+        def affected(entry: _Entry) -> bool:
+            if entry.ids & ids:
+                return True
+            # Una evaluación por filtro distinto, no por entrada
+            key = _filter_key(entry.filter)
+            if key not in matched:
+                try:
+                    matched[key] = any(matches_filter(doc.metadata, entry.filter) for doc in documents)
+                except ValueError:
+                    # Operador que no se evalúa localmente: se invalida por si acaso
+                    matched[key] = True
+            return matched[key]
+
+        return affected
+
+    @staticmethod
+    def _deleted(ids: List[str]) -> Callable[[_Entry], bool]:
+        """Entradas con alguno de los IDs borrados (borrar otros no cambia sus resultados)."""
+        ids = set(ids)
+        return lambda entry: bool(entry.ids & ids)
+
+    def add_documents(self, documents: List[Document], namespace: str = "") -> None:
+        self._begin_write(namespace)
+        try:
+            self.store.add_documents(documents, namespace)
+        finally:
+            self._end_write(namespace, self._added(documents))
+
+    def delete(self, ids: List[str], namespace: str = "") -> None:
+        self._begin_write(namespace)
+        try:
+            self.store.delete(ids, namespace)
+        finally:
+            self._end_write(namespace, self._deleted(ids))
+
+    def delete_index(self, namespace: str = "") -> None:
+        self._begin_write(namespace)
+        try:
+            self.store.delete_index(namespace)
+        finally:
+            self._end_write(namespace, None)
+
+    async def aadd_documents(self, documents: List[Document], namespace: str = "") -> None:
+        self._begin_write(namespace)
+        try:
+            await self.store.aadd_documents(documents, namespace)
+        finally:
+            await asyncio.to_thread(self._end_write, namespace, self._added(documents))
+
+    async def adelete(self, ids: List[str], namespace: str = "") -> None:
+        self._begin_write(namespace)
+        try:
+            await self.store.adelete(ids, namespace)
+        finally:
+            await asyncio.to_thread(self._end_write, namespace, self._deleted(ids))
+
+    async def adelete_index(self, namespace: str = "") -> None:
+        self._begin_write(namespace)
+        try:
+            await self.store.adelete_index(namespace)
+        finally:
+            await asyncio.to_thread(self._end_write, namespace, None)
+
+    # --- Búsquedas ---
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        key = self._key([query], k, filter, namespace)
+        docs, version = self._search_start(key)
+        if docs is None:
+            docs = self.store.similarity_search(query, k, filter, namespace)
+            self._store(key, filter, docs, version)
+        return docs
+
+    def similarity_search_batch(
+        self, queries: List[str], k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        key = self._key(queries, k, filter, namespace)
+        docs, version = self._search_start(key)
+        if docs is None:
+            docs = self.store.similarity_search_batch(queries, k, filter, namespace)
+            self._store(key, filter, docs, version)
+        return docs
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        key = self._key([query], k, filter, namespace)
+        docs, version = await self._asearch_start(key)
+        if docs is None:
+            docs = await self.store.asimilarity_search(query, k, filter, namespace)
+            await self._astore(key, filter, docs, version)
+        return docs
+
+    async def asimilarity_search_batch(
+        self, queries: List[str], k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        key = self._key(queries, k, filter, namespace)
+        docs, version = await self._asearch_start(key)
+        if docs is None:
+            docs = await self.store.asimilarity_search_batch(queries, k, filter, namespace)
+            await self._astore(key, filter, docs, version)
+        return docs
+
+    async def awarmup(self) -> None:
+        await self.store.awarmup()
+
+    async def aclose(self) -> None:
+        await self.store.aclose()
+
+    def stats(self) -> dict:
+        """Aciertos, fallos, entradas invalidadas y tasa de acierto desde el arranque."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
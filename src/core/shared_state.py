@@ -0,0 +1,385 @@
+"""
+Estado compartido y pub/sub entre workers de la API.
+
+``SharedStateBackend`` define un almacén clave/valor mínimo (con TTL y leases)
+y canales pub/sub de bytes. Implementaciones:
+
+- ``LocalSharedState``: en proceso; suficiente con un solo worker.
+- ``SocketSharedState``: cliente de un ``SharedStateHub`` que escucha en un
+  socket Unix, para que varios workers de uvicorn en la misma máquina vean los
+  mismos frames, alertas y nivel de riesgo.
+
+El hub se lanza automáticamente desde ``run_server`` cuando hay más de un
+worker, o a mano:
+
+    python -m src.core.shared_state --socket /tmp/rapidboard-state.sock
+"""
+
+import argparse
+import asyncio
+import os
+import struct
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, Optional, Set, Tuple
+
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.core.metrics import registry
+
+logger = get_logger(__name__)
+
+SHARED_STATE_DROPPED = registry.counter(
+    "shared_state_messages_dropped_total",
+    "Mensajes pub/sub descartados por suscriptores lentos.",
+    ["channel"],
+)
+
+
+class Subscription:
+    """Suscripción a un canal; se itera con ``async for`` y se cierra con ``close()``."""
+
+    def __init__(self, channel: str, queue: asyncio.Queue, on_close):
+        self.channel = channel
+        self._queue = queue
+        self._on_close = on_close
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> bytes:
+        if self._closed:
+            raise StopAsyncIteration
+        return await self._queue.get()
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._on_close(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+
+class SharedStateBackend(ABC):
+    """Almacén clave/valor y pub/sub compartido entre workers."""
+
+    async def start(self) -> None:
+        """Abre conexiones si hace falta."""
+
+    async def close(self) -> None:
+        """Libera conexiones."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Valor de ``key`` o None si no existe o expiró."""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Guarda ``value``; con ``ttl`` (segundos) expira automáticamente."""
+
+    @abstractmethod
+    async def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        """
+        Toma o renueva un lease exclusivo.
+
+        Devuelve True si ``key`` estaba libre, expirada o ya era de ``owner``
+        (en cuyo caso se renueva ``ttl``).
+        """
+
+    @abstractmethod
+    async def publish(self, channel: str, message: bytes) -> None:
+        """Entrega ``message`` a todos los suscriptores de ``channel``."""
+
+    @abstractmethod
+    def subscribe(self, channel: str) -> Subscription:
+        """Suscribe al canal; los mensajes publicados desde ahora llegan a la suscripción."""
+
+
+class _Fanout:
+    """Reparto de mensajes a colas locales; descarta el más antiguo si una cola se llena."""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.channels: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, channel: str, on_close=None) -> Subscription:
+        def close(subscription: Subscription) -> None:
+            subscribers = self.channels.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.channels[channel]
+            if on_close:
+                on_close(channel)
+
+        subscription = Subscription(channel, asyncio.Queue(self.queue_size), close)
+        self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def publish(self, channel: str, message: bytes) -> None:
+        for subscription in list(self.channels.get(channel, ())):
+            queue = subscription._queue
+            if queue.full():
+                queue.get_nowait()
+                SHARED_STATE_DROPPED.inc(channel=channel)
+            queue.put_nowait(message)
+
+
+class LocalSharedState(SharedStateBackend):
+    """Implementación en proceso (un único worker)."""
+
+    def __init__(self, queue_size: int = 256):
+        self._values: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._fanout = _Fanout(queue_size)
+
+    def _live(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        entry = self._values.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._values[key]
+            return None
+        return entry
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._values[key] = (value, expires_at)
+
+    async def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        entry = self._live(key)
+        if entry is not None and entry[0] != owner.encode():
+            return False
+        await self.set(key, owner.encode(), ttl)
+        return True
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        self._fanout.publish(channel, message)
+
+    def subscribe(self, channel: str) -> Subscription:
+        return self._fanout.subscribe(channel)
+
+
+# --- Protocolo del hub -------------------------------------------------------
+#
+# Cada mensaje: longitud (uint32) + op (1 byte) + longitud de clave (uint16)
+# + clave + valor. Las operaciones con respuesta se sirven en orden por conexión.
+
+_HEADER = struct.Struct("!IcH")
+
+OP_GET = b"G"
+OP_SET = b"S"
+OP_LEASE = b"L"
+OP_PUBLISH = b"P"
+OP_SUBSCRIBE = b"U"
+OP_UNSUBSCRIBE = b"X"
+OP_MESSAGE = b"M"
+REPLY_VALUE = b"V"
+REPLY_NONE = b"N"
+REPLY_OK = b"K"
+REPLY_FALSE = b"F"
+
+
+def _encode(op: bytes, key: str = "", value: bytes = b"") -> bytes:
+    key_bytes = key.encode()
+    return _HEADER.pack(1 + 2 + len(key_bytes) + len(value), op, len(key_bytes)) + key_bytes + value
+
+
+async def _read(reader: asyncio.StreamReader) -> Tuple[bytes, str, bytes]:
+    header = await reader.readexactly(_HEADER.size)
+    length, op, key_length = _HEADER.unpack(header)
+    body = await reader.readexactly(length - 3)
+    return op, body[:key_length].decode(), body[key_length:]
+
+
+def _encode_ttl(ttl: Optional[float], value: bytes) -> bytes:
+    return struct.pack("!d", ttl or 0.0) + value
+
+
+def _decode_ttl(value: bytes) -> Tuple[Optional[float], bytes]:
+    (ttl,) = struct.unpack("!d", value[:8])
+    return (ttl or None), value[8:]
+
+
+class SharedStateHub:
+    """Servidor del estado compartido sobre un socket Unix."""
+
+    def __init__(self, path: str, queue_size: int = 256):
+        self.path = path
+        self._state = LocalSharedState(queue_size)
+
+    async def serve_forever(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self._handle, path=self.path)
+        logger.info("Hub de estado compartido escuchando", extra={"socket": self.path})
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        forwarders: Dict[str, asyncio.Task] = {}
+        try:
+            while True:
+                op, key, value = await _read(reader)
+                if op == OP_GET:
+                    result = await self._state.get(key)
+                    writer.write(_encode(REPLY_NONE) if result is None else _encode(REPLY_VALUE, value=result))
+                elif op == OP_SET:
+                    ttl, payload = _decode_ttl(value)
+                    await self._state.set(key, payload, ttl)
+                    writer.write(_encode(REPLY_OK))
+                elif op == OP_LEASE:
+                    ttl, owner = _decode_ttl(value)
+                    acquired = await self._state.acquire_lease(key, owner.decode(), ttl or 0)
+                    writer.write(_encode(REPLY_OK if acquired else REPLY_FALSE))
+                elif op == OP_PUBLISH:
+                    await self._state.publish(key, value)
+                elif op == OP_SUBSCRIBE and key not in forwarders:
+                    forwarders[key] = asyncio.create_task(self._forward(key, writer))
+                elif op == OP_UNSUBSCRIBE and key in forwarders:
+                    forwarders.pop(key).cancel()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in forwarders.values():
+                task.cancel()
+            writer.close()
+
+    async def _forward(self, channel: str, writer: asyncio.StreamWriter) -> None:
+        async with self._state.subscribe(channel) as subscription:
+            async for message in subscription:
+                writer.write(_encode(OP_MESSAGE, channel, message))
+                await writer.drain()
+
+
+class SocketSharedState(SharedStateBackend):
+    """
+    Cliente de ``SharedStateHub``.
+
+    Usa una conexión para comandos (una petición en vuelo a la vez) y otra para
+    suscripciones, que se reparten localmente entre los suscriptores del
+    proceso. Si el hub se reinicia, ambas se reconectan solas.
+    """
+
+    def __init__(self, path: str, queue_size: int = 256):
+        self.path = path
+        self._fanout = _Fanout(queue_size)
+        self._command: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+        self._command_lock = asyncio.Lock()
+        self._subscriber: Optional[asyncio.StreamWriter] = None
+        self._subscriber_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._subscriber_task is None:
+            self._subscriber_task = asyncio.create_task(self._subscriber_loop())
+
+    async def close(self) -> None:
+        if self._subscriber_task is not None:
+            self._subscriber_task.cancel()
+            self._subscriber_task = None
+        for writer in (self._command[1] if self._command else None, self._subscriber):
+            if writer is not None:
+                writer.close()
+        self._command = None
+        self._subscriber = None
+
+    async def _request(self, message: bytes, expect_reply: bool = True) -> Tuple[bytes, bytes]:
+        async with self._command_lock:
+            for attempt in range(2):
+                try:
+                    if self._command is None:
+                        self._command = await asyncio.open_unix_connection(self.path)
+                    reader, writer = self._command
+                    writer.write(message)
+                    await writer.drain()
+                    if not expect_reply:
+                        return REPLY_OK, b""
+                    op, _, value = await _read(reader)
+                    return op, value
+                except (OSError, asyncio.IncompleteReadError):
+                    self._command = None
+                    if attempt:
+                        raise
+        raise ConnectionError(self.path)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        op, value = await self._request(_encode(OP_GET, key))
+        return value if op == REPLY_VALUE else None
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        await self._request(_encode(OP_SET, key, _encode_ttl(ttl, value)))
+
+    async def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        op, _ = await self._request(_encode(OP_LEASE, key, _encode_ttl(ttl, owner.encode())))
+        return op == REPLY_OK
+
+    async def publish(self, channel: str, message: bytes) -> None:
+        await self._request(_encode(OP_PUBLISH, channel, message), expect_reply=False)
+
+    def subscribe(self, channel: str) -> Subscription:
+        first = channel not in self._fanout.channels
+        subscription = self._fanout.subscribe(channel, on_close=self._on_unsubscribe)
+        if first and self._subscriber is not None:
+            self._subscriber.write(_encode(OP_SUBSCRIBE, channel))
+        return subscription
+
+    def _on_unsubscribe(self, channel: str) -> None:
+        if channel not in self._fanout.channels and self._subscriber is not None:
+            self._subscriber.write(_encode(OP_UNSUBSCRIBE, channel))
+
+    async def _subscriber_loop(self) -> None:
+        backoff = 0.1
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+                self._subscriber = writer
+                for channel in list(self._fanout.channels):
+                    writer.write(_encode(OP_SUBSCRIBE, channel))
+                backoff = 0.1
+                while True:
+                    op, channel, message = await _read(reader)
+                    if op == OP_MESSAGE:
+                        self._fanout.publish(channel, message)
+            except (OSError, asyncio.IncompleteReadError) as e:
+                logger.warning(
+                    "Conexión con el hub de estado perdida",
+                    extra={"socket": self.path, "error": str(e), "retry_in": backoff},
+                )
+            finally:
+                self._subscriber = None
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 5.0)
+
+
+@lru_cache(maxsize=None)
+def get_shared_state() -> SharedStateBackend:
+    """Backend configurado en ``SHARED_STATE_BACKEND``."""
+    if settings.SHARED_STATE_BACKEND == "socket":
+        return SocketSharedState(settings.SHARED_STATE_SOCKET, settings.SHARED_STATE_QUEUE_SIZE)
+    if settings.SHARED_STATE_BACKEND != "local":
+        raise ValueError(f"SHARED_STATE_BACKEND desconocido: {settings.SHARED_STATE_BACKEND}")
+    return LocalSharedState(settings.SHARED_STATE_QUEUE_SIZE)
+
+
+def run_hub(path: str) -> None:
+    """Ejecuta el hub hasta que se interrumpa el proceso."""
+    from src.core.logger import configure_logging
+
+    configure_logging()
+    try:
+        asyncio.run(SharedStateHub(path, settings.SHARED_STATE_QUEUE_SIZE).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hub de estado compartido entre workers")
+    parser.add_argument("--socket", default=settings.SHARED_STATE_SOCKET)
+    run_hub(parser.parse_args().socket)
@@ -1,11 +1,62 @@
-from typing import Annotated
+from typing import Annotated, Any, Dict, Optional
 from typing_extensions import TypedDict
 from langgraph.graph.message import add_messages
 
+# Clave que, presente en una actualización de ``turn_counts``, reinicia los contadores
+TURN_RESET = "__reset__"
+
+
+def add_turn_counts(current: Optional[Dict[str, int]], update: Optional[Dict[str, int]]) -> Dict[str, int]:
+    """
+    Reducer de ``turn_counts``: suma los incrementos de cada nodo.
+
+    Si la actualización incluye ``TURN_RESET`` se parte de cero (inicio de turno).
+    """
+    update = update or {}
+    merged = {} if TURN_RESET in update else dict(current or {})
+    for agent, increment in update.items():
+        if agent != TURN_RESET:
+            merged[agent] = merged.get(agent, 0) + increment
+    return merged
+
+
 class AgentState(TypedDict):
     """
     Estado compartido que fluye entre agentes.
     """
     messages: Annotated[list, add_messages]
     next: str
+    # Veces que actuó cada agente en el turno actual (se reinicia con cada mensaje del usuario)
+    turn_counts: Annotated[Dict[str, int], add_turn_counts]
+    # Último agente que pidió tools, para volver a él tras ejecutarlas
+    active_agent: Optional[str]
+    # Consulta de búsqueda extraída por el supervisor (RESEARCHER_MODE=direct)
+    search_query: Optional[str]
+    # Respuesta de business_intelligence calculada en paralelo con el routing (SPECULATIVE_BI)
+    speculative_bi: Optional[Any]
     # Aquí puedes añadir campos globales como 'user_id', 'task_status', etc.
+
+
+def start_turn(messages: list) -> dict:
+    """Inputs de un turno nuevo: añade los mensajes y reinicia los contadores del turno."""
+    return {
+        "messages": messages,
+        "turn_counts": {TURN_RESET: 1},
+        "active_agent": None,
+        "speculative_bi": None,
+        "search_query": None,
+    }
+
+
+def is_new_turn(state: AgentState) -> bool:
+    """True si el último mensaje es del usuario (ningún agente actuó aún en este turno)."""
+    messages = state.get("messages") or []
+    return bool(messages) and getattr(messages[-1], "type", None) == "human"
+
+
+def turn_update(state: AgentState, agent: str) -> Dict[str, int]:
+    """Actualización de ``turn_counts`` cuando ``agent`` actúa; reinicia si empieza un turno."""
+    update = {agent: 1}
+    if is_new_turn(state):
+        update[TURN_RESET] = 1
+    return update
@@ -0,0 +1,67 @@
+"""
+Tenants: los documentos de cada cliente en su propio namespace.
+
+Cada tenant se indexa en el namespace del vector store con su nombre
+(Pinecone: namespace nativo; ``NumpyStore``: un subdirectorio), y el
+manifest y el índice BM25 se separan igual. Sin tenant se usa el namespace
+por defecto (``""``), el de los documentos anteriores a los tenants.
+
+Las búsquedas de una petición (``internal_search``) usan el tenant de su
+``tenant_scope``. Como el tracker de ``src.core.usage``, viaja en un
+``ContextVar`` que LangGraph y ``asyncio`` copian a sus tareas y threads.
+"""
+
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# Letras, dígitos, "_", "-" y "."; sirve también como nombre de directorio
+TENANT_PATTERN = r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$"
+DEFAULT_NAMESPACE = ""
+
+_current: ContextVar[str] = ContextVar("tenant_namespace", default=DEFAULT_NAMESPACE)
+
+
+def check_namespace(namespace: Optional[str]) -> str:
+    """Namespace validado (``None`` o vacío = el por defecto); ``ValueError`` si no es válido."""
+    if not namespace:
+        return DEFAULT_NAMESPACE
+    if not re.match(TENANT_PATTERN, namespace):
+        raise ValueError(f"Tenant no válido: {namespace!r}")
+    return namespace
+
+
+def thread_key(tenant: Optional[str], thread_id: str) -> str:
+    """
+    Clave de un thread de conversación dentro de su tenant (checkpoint,
+    admisión y uso): ``"<tenant>:<thread_id>"``, y el ``thread_id`` tal cual
+    en el tenant por defecto (los checkpoints anteriores a los tenants
+    siguen valiendo). Un tenant no contiene ``:`` y un ``thread_id`` sin
+    tenant tampoco (``ValueError``), así que dos tenants nunca comparten clave.
+    """
+    namespace = check_namespace(tenant)
+    if namespace:
+        return f"{namespace}:{thread_id}"
+    if thread_id and ":" in thread_id:
+        raise ValueError("thread_id no puede contener ':' sin tenant")
+    return thread_id
+
+
+def current_namespace() -> str:
+    """Namespace del tenant de la petición en curso."""
+    return _current.get()
+
+
+@contextmanager
+def tenant_scope(tenant: Optional[str]) -> Iterator[str]:
+    """Las búsquedas dentro del bloque usan el namespace de ``tenant``."""
+    token = _current.set(check_namespace(tenant))
+    try:
+        yield _current.get()
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Generador cerrado desde otra tarea (ej. cliente desconectado): el contexto ya no es el suyo
+            pass
@@ -0,0 +1,149 @@
+"""
+Contabilidad de tokens y coste por petición.
+
+Cada respuesta de un LLM se registra con ``record_usage``: los modelos de
+chat lo hacen vía ``LLMMetricsCallback`` y el análisis de video desde
+``_create_completion``. El registro suma a las métricas globales y, si hay
+una petición en curso (``usage_scope``), a su ``UsageTracker``, que reparte
+el uso por nodo y por modelo.
+
+El tracker viaja en un ``ContextVar``: LangGraph, ``asyncio`` y la capa de
+resiliencia copian el contexto a sus tareas y threads, así que las llamadas
+de los nodos (incluidos hedges y BI especulativo) llegan a la petición que
+las originó.
+"""
+
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Iterator, Optional, Tuple
+
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.core.metrics import LLM_COST, LLM_TOKENS, REQUEST_TOKENS
+
+logger = get_logger(__name__)
+
+_current: ContextVar[Optional["UsageTracker"]] = ContextVar("usage_tracker", default=None)
+
+
+@lru_cache(maxsize=None)
+def _prices() -> Dict[str, Tuple[float, float]]:
+    """``LLM_PRICES`` como {modelo: (entrada, salida)} en USD por millón de tokens."""
+    prices = {}
+    for item in settings.LLM_PRICES.split(","):
+        model, _, values = item.strip().rpartition("=")
+        if not model:
+            continue
+        try:
+            prompt_price, completion_price = (float(value) for value in values.split(":"))
+        except ValueError:
+            logger.warning("LLM_PRICES: entrada ignorada", extra={"entry": item.strip()})
+            continue
+        prices[model] = (prompt_price, completion_price)
+    return prices
+
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Coste estimado de una llamada (0 si el modelo no tiene precio configurado)."""
+    prompt_price, completion_price = _prices().get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def _empty() -> dict:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+
+
+def _add(totals: dict, prompt_tokens: int, completion_tokens: int, cost: float) -> None:
+    totals["calls"] += 1
+    totals["prompt_tokens"] += prompt_tokens
+    totals["completion_tokens"] += completion_tokens
+    totals["cost_usd"] += cost
+
+
+class UsageTracker:
+    """Uso de tokens de UNA petición, por nodo y por modelo."""
+
+    def __init__(self, request_id: Optional[str] = None, thread_id: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.thread_id = thread_id
+        self._lock = threading.Lock()
+        self._total = _empty()
+        self._by_node: Dict[str, dict] = {}
+        self._by_model: Dict[str, dict] = {}
+
+    def record(self, node: str, model: str, prompt_tokens: int, completion_tokens: int, cost: float) -> None:
+        with self._lock:
+            _add(self._total, prompt_tokens, completion_tokens, cost)
+            _add(self._by_node.setdefault(node, _empty()), prompt_tokens, completion_tokens, cost)
+            _add(self._by_model.setdefault(model, _empty()), prompt_tokens, completion_tokens, cost)
+
+    @property
+    def prompt_tokens(self) -> int:
+        return self._total["prompt_tokens"]
+
+    @property
+    def completion_tokens(self) -> int:
+        return self._total["completion_tokens"]
+
+    def summary(self) -> dict:
+        """Totales y desglose por nodo y modelo (serializable a JSON)."""
+        with self._lock:
+            return {
+                "request_id": self.request_id,
+                **_rounded(self._total),
+                "total_tokens": self._total["prompt_tokens"] + self._total["completion_tokens"],
+                "by_node": {node: _rounded(totals) for node, totals in self._by_node.items()},
+                "by_model": {model: _rounded(totals) for model, totals in self._by_model.items()},
+            }
+
+
+def _rounded(totals: dict) -> dict:
+    return {**totals, "cost_usd": round(totals["cost_usd"], 6)}
+
+
+def record_usage(node: str, model: str, prompt_tokens: int, completion_tokens: int) -> None:
+    """Registra el uso de una respuesta de LLM en las métricas y en la petición en curso."""
+    prompt_tokens, completion_tokens = prompt_tokens or 0, completion_tokens or 0
+    cost = cost_usd(model, prompt_tokens, completion_tokens)
+    LLM_TOKENS.inc(prompt_tokens, model=model, role=node, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, role=node, kind="completion")
+    if cost:
+        LLM_COST.inc(cost, model=model, role=node)
+    tracker = _current.get()
+    if tracker is not None:
+        tracker.record(node, model, prompt_tokens, completion_tokens, cost)
+
+
+@contextmanager
+def usage_scope(endpoint: str, thread_id: Optional[str] = None, request_id: Optional[str] = None) -> Iterator[UsageTracker]:
+    """
+    Atribuye a un ``UsageTracker`` nuevo el uso de LLMs dentro del bloque.
+
+    Al salir, observa los tokens de la petición en ``llm_tokens_per_request``
+    y deja un registro con el resumen.
+    """
+    tracker = UsageTracker(request_id, thread_id)
+    token = _current.set(tracker)
+    try:
+        yield tracker
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Generador cerrado desde otra tarea (ej. cliente desconectado): el contexto ya no es el suyo
+            pass
+        REQUEST_TOKENS.observe(tracker.prompt_tokens, endpoint=endpoint, kind="prompt")
+        REQUEST_TOKENS.observe(tracker.completion_tokens, endpoint=endpoint, kind="completion")
+        logger.info(
+            "Uso de tokens",
+            extra={
+                "endpoint": endpoint,
+                "request_id": tracker.request_id,
+                "thread_id": thread_id,
+                "prompt_tokens": tracker.prompt_tokens,
+                "completion_tokens": tracker.completion_tokens,
+            },
+        )
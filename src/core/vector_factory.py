@@ -1,27 +1,54 @@
 import os
-from src.agents.researcher.pinecone_store import PineconeStore
+from functools import lru_cache
+
+from src.core.config import settings
 
 class VectorStoreFactory:
     """Factory para crear instancias de vector stores."""
     
     @staticmethod
-    def create(store_type: str = "pinecone"):
+    def create(store_type: str = None):
         """
         Crea una instancia de vector store según el tipo especificado.
         
         Args:
-            store_type: Tipo de vector store ("pinecone", etc.)
+            store_type: Tipo de vector store ("pinecone", "numpy"); por defecto ``VECTOR_STORE``
             
         Returns:
             Instancia del vector store
         """
+        store_type = store_type or settings.VECTOR_STORE
         if store_type == "pinecone":
+            from src.agents.researcher.pinecone_store import PineconeStore
             return PineconeStore()
+
+        if store_type == "numpy":
+            try:
+                from src.agents.researcher.numpy_store import NumpyStore
+            except ImportError as e:
+                raise RuntimeError("VECTOR_STORE=numpy requiere el paquete numpy") from e
+            return NumpyStore()
         
         # Aquí se podrían añadir más implementaciones como ChromaStore, WeaverStore, etc.
         raise ValueError(f"Vector store type '{store_type}' no soportado.")
 
-def get_vector_store(store_type: str = "pinecone"):
+@lru_cache(maxsize=None)
+def get_shared_vector_store():
+    """
+    Vector store configurado, compartido por la ingesta y la búsqueda del proceso.
+
+    Una sola instancia por proceso: ``NumpyStore`` mantiene en memoria el
+    estado de sus ficheros, y otra instancia no vería lo añadido después.
+    Con ``SEARCH_CACHE_SIZE > 0`` va envuelto en ``CachedVectorStore``: al
+    pasar todas las escrituras por él, la caché de búsquedas se invalida.
+    """
+    store = VectorStoreFactory.create()
+    if settings.SEARCH_CACHE_SIZE > 0:
+        from src.core.search_cache import CachedVectorStore
+        return CachedVectorStore(store, path=settings.SEARCH_CACHE_PATH or None)
+    return store
+
+def get_vector_store(store_type: str = None):
     """
     Factoría para obtener la implementación de base de datos vectorial configurada.
     (Función legacy, usar VectorStoreFactory.create() en su lugar)
@@ -0,0 +1,76 @@
+"""
+Manifest de chunks indexados por fuente.
+
+Para cada ``source`` de cada namespace (tenant) guarda los IDs (hash de
+contenido, ``document_id``) de los chunks que están en el vector store. Al
+volver a subir un documento, ``VectorService`` compara sus chunks con el
+manifest: solo embebe los nuevos o cambiados y borra los que ya no existen.
+
+Se persiste en SQLite (``VECTOR_MANIFEST_PATH``), compartido por todos los
+workers de la API.
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Set
+
+from src.core.config import settings
+
+
+class SourceManifest:
+    def __init__(self, path: str = None):
+        self.path = Path(path or settings.VECTOR_MANIFEST_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")}
+            legacy = bool(columns) and "namespace" not in columns
+            if legacy:
+                self._conn.execute("ALTER TABLE chunks RENAME TO chunks_legacy")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "namespace TEXT NOT NULL, source TEXT NOT NULL, chunk_id TEXT NOT NULL, "
+                "PRIMARY KEY (namespace, source, chunk_id))"
+            )
+            if legacy:
+                # Manifest de antes de los tenants: sus fuentes son del namespace por defecto
+                self._conn.execute(
+                    "INSERT INTO chunks (namespace, source, chunk_id) SELECT '', source, chunk_id FROM chunks_legacy"
+                )
+                self._conn.execute("DROP TABLE chunks_legacy")
+
+    def get(self, source: str, namespace: str = "") -> Set[str]:
+        """IDs de los chunks indexados de ``source`` en ``namespace``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE namespace = ? AND source = ?", (namespace, source)
+            )
+            return {chunk_id for (chunk_id,) in rows}
+
+    def update(self, source: str, added: Iterable[str], removed: Iterable[str], namespace: str = "") -> None:
+        """Registra chunks añadidos y borrados de ``source`` en una transacción."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE namespace = ? AND source = ? AND chunk_id = ?",
+                [(namespace, source, chunk_id) for chunk_id in removed],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (namespace, source, chunk_id) VALUES (?, ?, ?)",
+                [(namespace, source, chunk_id) for chunk_id in added],
+            )
+
+    def sources(self, namespace: str = "") -> Dict[str, int]:
+        """Fuentes de ``namespace`` con su número de chunks."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT source, COUNT(*) FROM chunks WHERE namespace = ? GROUP BY source ORDER BY source", (namespace,)
+            )
+            return dict(rows.fetchall())
+
+    def delete_namespace(self, namespace: str) -> None:
+        """Olvida todas las fuentes de ``namespace``."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE namespace = ?", (namespace,))
@@ -1,24 +1,153 @@
+import asyncio
+import hashlib
 from abc import ABC, abstractmethod
-from typing import List, Any
+from typing import Any, Dict, List, Optional, Tuple
 from langchain_core.documents import Document
 
+# Filtro de metadata con la sintaxis de Pinecone, p. ej.
+# ``{"source": "informe.pdf", "ingested_at": {"$gte": 1735689600}}``
+MetadataFilter = Dict[str, Any]
+
+
+def document_id(document: Document) -> str:
+    """
+    ID estable de un chunk: hash de su fuente y su contenido.
+
+    Volver a subir el mismo chunk reemplaza su vector en lugar de duplicarlo,
+    y chunks de distintas subidas no se pisan entre sí.
+    """
+    source = str(document.metadata.get("source", ""))
+    return hashlib.sha256(f"{source}\0{document.page_content}".encode()).hexdigest()
+
+
+_COMPARISONS = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+}
+
+
+def matches_filter(metadata: dict, metadata_filter: Optional[MetadataFilter]) -> bool:
+    """
+    Si ``metadata`` cumple el filtro: igualdad por campo, operadores
+    ``$eq``/``$ne``/``$gt``/``$gte``/``$lt``/``$lte``/``$in``/``$nin`` y
+    ``$and``/``$or`` (el subconjunto de Pinecone que evalúan los stores locales).
+    """
+    for key, condition in (metadata_filter or {}).items():
+        if key == "$and":
+            if not all(matches_filter(metadata, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, part) for part in condition):
+                return False
+        else:
+            operators = condition if isinstance(condition, dict) else {"$eq": condition}
+            value = metadata.get(key)
+            for operator, target in operators.items():
+                if operator not in _COMPARISONS:
+                    raise ValueError(f"Operador de filtro no soportado: {operator}")
+                try:
+                    if not _COMPARISONS[operator](value, target):
+                        return False
+                except TypeError:
+                    # Tipos no comparables (p. ej. fecha de texto contra número): no cumple
+                    return False
+    return True
+
+
+def merge_results(rankings: List[List[Tuple[str, Document, float]]]) -> List[Document]:
+    """
+    Une los resultados (id, documento, similitud) de varias consultas: un
+    documento por ID, con su mejor similitud, de mayor a menor.
+    """
+    best: Dict[str, Tuple[float, Document]] = {}
+    for ranking in rankings:
+        for doc_id, doc, score in ranking:
+            if doc_id not in best or score > best[doc_id][0]:
+                best[doc_id] = (score, doc)
+    return [doc for score, doc in sorted(best.values(), key=lambda item: item[0], reverse=True)]
+
+
 class BaseVectorStore(ABC):
     """
     Interface abstracta para abstraer la base de datos vectorial.
     Permite cambiar de Pinecone a otras (Chroma, Weaviate, etc.) fácilmente.
+
+    Todas las operaciones actúan sobre un ``namespace`` (uno por tenant, ver
+    ``src.core.tenants``; ``""`` = el por defecto): las búsquedas solo
+    recorren sus vectores y se puede vaciar uno sin tocar los demás.
     """
     
     @abstractmethod
-    def add_documents(self, documents: List[Document]) -> None:
+    def add_documents(self, documents: List[Document], namespace: str = "") -> None:
         """Añade documentos a la base de datos."""
         pass
 
     @abstractmethod
-    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
-        """Busca documentos similares a una consulta."""
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        """Busca documentos similares a una consulta, solo entre los que cumplen ``filter``."""
+        pass
+
+    def similarity_search_batch(
+        self, queries: List[str], k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        """
+        Los ``k`` vecinos de cada consulta, unidos y sin repetidos (``merge_results``).
+
+        Por defecto, una búsqueda por consulta; los stores la reemplazan con
+        un único embedding por lotes y las consultas al índice en paralelo.
+        """
+        # Sin similitudes: se ordena por la mejor posición en alguna consulta
+        return merge_results([
+            [
+                (document_id(doc), doc, -rank)
+                for rank, doc in enumerate(self.similarity_search(query, k, filter, namespace))
+            ]
+            for query in queries
+        ])
+
+    @abstractmethod
+    def delete(self, ids: List[str], namespace: str = "") -> None:
+        """Borra los documentos con esos IDs (``document_id``); los que no existan se ignoran."""
         pass
 
     @abstractmethod
-    def delete_index(self) -> None:
-        """Borra el índice o los datos."""
+    def delete_index(self, namespace: str = "") -> None:
+        """Borra todos los vectores de ``namespace`` (los demás namespaces no se tocan)."""
         pass
+
+    # Versiones async: por defecto ejecutan las síncronas en un thread; los
+    # stores con cliente async las reemplazan para no ocupar threads en la I/O.
+
+    async def aadd_documents(self, documents: List[Document], namespace: str = "") -> None:
+        await asyncio.to_thread(self.add_documents, documents, namespace)
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        return await asyncio.to_thread(self.similarity_search, query, k, filter, namespace)
+
+    async def asimilarity_search_batch(
+        self, queries: List[str], k: int = 4, filter: Optional[MetadataFilter] = None, namespace: str = ""
+    ) -> List[Document]:
+        return await asyncio.to_thread(self.similarity_search_batch, queries, k, filter, namespace)
+
+    async def adelete(self, ids: List[str], namespace: str = "") -> None:
+        await asyncio.to_thread(self.delete, ids, namespace)
+
+    async def adelete_index(self, namespace: str = "") -> None:
+        await asyncio.to_thread(self.delete_index, namespace)
+
+    async def awarmup(self) -> None:
+        """Abre conexiones y carga lo necesario antes de la primera petición."""
+        await self.asimilarity_search("warmup", k=1)
+
+    async def aclose(self) -> None:
+        """Cierra los clientes async (al apagar la API)."""
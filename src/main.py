@@ -1,12 +1,15 @@
 from src.core.config import settings
+from src.core.logger import configure_logging
+from src.core.state import start_turn
 from src.supervisor.graph import supervisor_agent
 from langchain_core.messages import HumanMessage
 
 def run():
+    configure_logging()
     print(f"--- Ejecutando {settings.PROJECT_NAME} con Supervisor ---")
     
     # El supervisor decide qué agente usar (researcher o business_intelligence)
-    inputs = {"messages": [HumanMessage(content="Analiza las métricas de ventas del Q4 y dame insights estratégicos")]}
+    inputs = start_turn([HumanMessage(content="Analiza las métricas de ventas del Q4 y dame insights estratégicos")])
     config = {"configurable": {"thread_id": "system_run_1"}}
     
     for event in supervisor_agent.stream(inputs, config=config):
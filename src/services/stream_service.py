@@ -1,18 +1,76 @@
 
-from typing import List
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Awaitable, Callable, List, Optional
 from fastapi import WebSocket, WebSocketDisconnect
 
+from src.core.logger import get_logger
+from src.core.metrics import FRAMES_DROPPED, FRAMES_INGESTED
+from src.core.shared_state import SharedStateBackend, get_shared_state
+
+logger = get_logger(__name__)
+
+# Canales y claves en el estado compartido
+FRAMES_CHANNEL = "video:frames"
+ALERTS_CHANNEL = "video:alerts"
+RISK_LEVEL_KEY = "video:risk_level"
+ANALYSIS_LEASE_KEY = "video:analysis_leader"
+# Solo un worker (el que tiene el lease) acumula frames y lanza el análisis
+ANALYSIS_LEASE_SECONDS = 10.0
+
+AnalysisCallback = Callable[[List[bytes]], Awaitable[None]]
+
 class StreamService:
-    def __init__(self):
+    """
+    Ingesta y difusión de video.
+
+    Los frames y alertas pasan por el estado compartido: cualquier worker
+    puede recibir frames (WebSocket o HTTP) y todos los reenvían a sus
+    viewers locales. El análisis lo hace un único worker, elegido con un
+    lease, para no analizar el mismo stream N veces.
+    """
+
+    def __init__(self, shared_state: Optional[SharedStateBackend] = None):
+        self._shared_state = shared_state
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
         self.broadcaster: WebSocket | None = None
         self.viewers: List[WebSocket] = []
-        self.current_risk_level: int = 0  # Memory state for risk escalation
-        
-        # Buffering state for analysis
+        self.is_analysis_leader: bool = False
+
+        # Buffering state for analysis (solo en el líder)
         self.frame_buffer: List[bytes] = []
         self.last_analysis_time: float = 0
         self.frame_count: int = 0
 
+        self._analysis_callback: Optional[AnalysisCallback] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def shared_state(self) -> SharedStateBackend:
+        if self._shared_state is None:
+            self._shared_state = get_shared_state()
+        return self._shared_state
+
+    async def start(self, analysis_callback: AnalysisCallback):
+        """Arranca las suscripciones y la elección de líder (lifespan de la app)."""
+        self._analysis_callback = analysis_callback
+        await self.shared_state.start()
+        self._tasks = [
+            asyncio.create_task(self._consume_frames()),
+            asyncio.create_task(self._consume_alerts()),
+            asyncio.create_task(self._leadership_loop()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.shared_state.close()
+
     async def connect_broadcaster(self, websocket: WebSocket):
         await websocket.accept()
         self.broadcaster = websocket
@@ -21,76 +79,118 @@ class StreamService:
         if self.broadcaster:
             # await self.broadcaster.close() # Often already closed
             self.broadcaster = None
-            print("Broadcaster disconnected")
+            logger.info("Broadcaster disconnected")
 
     async def connect_viewer(self, websocket: WebSocket):
         await websocket.accept()
         self.viewers.append(websocket)
-        print(f"Viewer connected. Total: {len(self.viewers)}")
+        logger.info("Viewer connected", extra={"viewers": len(self.viewers)})
 
     def disconnect_viewer(self, websocket: WebSocket):
         if websocket in self.viewers:
             self.viewers.remove(websocket)
-            print(f"Viewer disconnected. Total: {len(self.viewers)}")
+            logger.info("Viewer disconnected", extra={"viewers": len(self.viewers)})
+
+    async def get_risk_level(self) -> int:
+        value = await self.shared_state.get(RISK_LEVEL_KEY)
+        return int(value) if value else 0
+
+    async def set_risk_level(self, level: int):
+        await self.shared_state.set(RISK_LEVEL_KEY, str(level).encode())
 
     async def broadcast_frame(self, data: bytes):
+        """Envía un frame a los viewers conectados a este worker."""
         disconnected_viewers = []
         for viewer in self.viewers:
             try:
                 await viewer.send_bytes(data)
             except (WebSocketDisconnect, Exception):
+                FRAMES_DROPPED.inc(reason="viewer_send_failed")
                 disconnected_viewers.append(viewer)
-        
+
         for viewer in disconnected_viewers:
             self.disconnect_viewer(viewer)
 
-    async def process_frame(self, frame_data: bytes, analysis_callback):
+    async def process_frame(self, frame_data: bytes, source: str = "unknown"):
         """
-        Injest a frame from any source (WS or HTTP), broadcast it, and manage analysis buffer.
+        Injest a frame from any source (WS or HTTP) and publish it to every worker.
         """
-        # 1. Broadcast LIVE
-        await self.broadcast_frame(frame_data)
-        
-        # 2. Accumulate
-        import time
-        
+        FRAMES_INGESTED.inc(source=source)
+        await self.shared_state.publish(FRAMES_CHANNEL, frame_data)
+
+    async def _consume_frames(self):
+        async with self.shared_state.subscribe(FRAMES_CHANNEL) as frames:
+            async for frame_data in frames:
+                # 1. Broadcast LIVE
+                await self.broadcast_frame(frame_data)
+                # 2. Accumulate
+                if self.is_analysis_leader:
+                    self._buffer_for_analysis(frame_data)
+
+    def _buffer_for_analysis(self, frame_data: bytes):
         # Initialize timer on first frame
         if self.last_analysis_time == 0:
             self.last_analysis_time = time.time()
-            
+
         self.frame_count += 1
-        
+
         # Subsample for analysis
-        # Since input is constrained to ~2 FPS (30 frames per 15s), we can buffer ALL frames 
-        # or perhaps every 2nd frame if payload is too large. 
+        # Since input is constrained to ~2 FPS (30 frames per 15s), we can buffer ALL frames
+        # or perhaps every 2nd frame if payload is too large.
         # Let's keep 15 frames max per request roughly. 30/2 = 15.
         if self.frame_count % 2 == 0:
             self.frame_buffer.append(frame_data)
-            
+        else:
+            FRAMES_DROPPED.inc(reason="subsample")
+
         # 3. Check Trigger (15s)
         current_time = time.time()
         if current_time - self.last_analysis_time >= 15:
             if self.frame_buffer:
-                print(f"Triggering analysis for {len(self.frame_buffer)} frames...")
+                logger.info("Triggering analysis", extra={"frame_count": len(self.frame_buffer)})
                 frames_to_send = list(self.frame_buffer)
                 self.frame_buffer.clear()
                 self.last_analysis_time = current_time
-                
+
                 # Trigger callback (fire and forget task)
-                import asyncio
-                asyncio.create_task(analysis_callback(frames_to_send))
+                if self._analysis_callback:
+                    asyncio.create_task(self._analysis_callback(frames_to_send))
             else:
                 self.last_analysis_time = current_time
 
-    async def broadcast_alert(self, alert_data: dict):
-        disconnected_viewers = []
-        for viewer in self.viewers:
+    async def _leadership_loop(self):
+        while True:
             try:
-                await viewer.send_json(alert_data)
-            except Exception:
-                disconnected_viewers.append(viewer)
-        
-        for viewer in disconnected_viewers:
-            self.disconnect_viewer(viewer)
+                leader = await self.shared_state.acquire_lease(
+                    ANALYSIS_LEASE_KEY, self.worker_id, ANALYSIS_LEASE_SECONDS
+                )
+            except Exception as e:
+                logger.warning("No se pudo renovar el lease de análisis", extra={"error": str(e)})
+                leader = False
+            if leader != self.is_analysis_leader:
+                logger.info("Cambio de líder de análisis", extra={"worker": self.worker_id, "leader": leader})
+                self.is_analysis_leader = leader
+                if not leader:
+                    self.frame_buffer.clear()
+                    self.last_analysis_time = 0
+            await asyncio.sleep(ANALYSIS_LEASE_SECONDS / 3)
+
+    async def broadcast_alert(self, alert_data: dict):
+        """Publica una alerta para los viewers de todos los workers."""
+        await self.shared_state.publish(ALERTS_CHANNEL, json.dumps(alert_data).encode())
+
+    async def _consume_alerts(self):
+        async with self.shared_state.subscribe(ALERTS_CHANNEL) as alerts:
+            async for message in alerts:
+                alert_data = json.loads(message)
+                disconnected_viewers = []
+                for viewer in self.viewers:
+                    try:
+                        await viewer.send_json(alert_data)
+                    except Exception:
+                        disconnected_viewers.append(viewer)
+
+                for viewer in disconnected_viewers:
+                    self.disconnect_viewer(viewer)
 
 stream_service = StreamService()
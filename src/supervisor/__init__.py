@@ -1,3 +1,9 @@
-from .graph import supervisor_agent
+def __getattr__(name):
+    # Import diferido: no cargar langgraph ni compilar el grafo al importar el paquete
+    if name == "supervisor_agent":
+        from .graph import get_supervisor_agent
+        return get_supervisor_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["supervisor_agent"]
@@ -1,27 +1,54 @@
+from functools import lru_cache
+
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableLambda
 from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
+from src.core.checkpoint import get_checkpointer
+from src.core.config import settings
+from src.core.metrics import instrument_node
 from src.core.state import AgentState
-from src.agents.researcher.nodes import call_researcher_model
-from src.agents.business_intelligence.nodes import call_business_intelligence_model
+from src.agents.researcher.nodes import call_researcher_model, acall_researcher_model, run_direct_research
+from src.agents.business_intelligence.nodes import (
+    call_business_intelligence_model,
+    acall_business_intelligence_model,
+)
 from src.supervisor.nodes import (
     supervisor_node,
+    asupervisor_node,
     agent_should_continue,
     route_after_tools,
 )
 from src.tools.search import global_tools
 
-# Inicializar el checkpointer para memoria persistente
-memory = MemorySaver()
-
 def create_supervisor_graph():
     workflow = StateGraph(AgentState)
     
     # Nodos de los agentes
-    workflow.add_node("researcher", call_researcher_model)
-    workflow.add_node("business_intelligence", call_business_intelligence_model)
-    workflow.add_node("supervisor", supervisor_node)
-    workflow.add_node("tools", ToolNode(global_tools))
+    direct_research = settings.RESEARCHER_MODE == "direct"
+    if direct_research:
+        researcher = run_direct_research
+    else:
+        researcher = RunnableLambda(call_researcher_model, afunc=acall_researcher_model, name="researcher")
+    workflow.add_node("researcher", instrument_node("supervisor", "researcher", researcher))
+    workflow.add_node(
+        "business_intelligence",
+        instrument_node(
+            "supervisor",
+            "business_intelligence",
+            RunnableLambda(
+                call_business_intelligence_model,
+                afunc=acall_business_intelligence_model,
+                name="business_intelligence",
+            ),
+        ),
+    )
+    workflow.add_node(
+        "supervisor",
+        instrument_node(
+            "supervisor", "supervisor", RunnableLambda(supervisor_node, afunc=asupervisor_node, name="supervisor")
+        ),
+    )
+    workflow.add_node("tools", instrument_node("supervisor", "tools", ToolNode(global_tools)))
     
     # El supervisor decide quién empieza o sigue
     workflow.add_edge("__start__", "supervisor")
@@ -36,13 +63,26 @@ def create_supervisor_graph():
     workflow.add_conditional_edges("supervisor", lambda x: x["next"], conditional_map)
     
     # Los agentes pueden ir a tools o volver al supervisor
-    workflow.add_conditional_edges("researcher", agent_should_continue)
+    if direct_research:
+        # Búsqueda ya ejecutada: los resultados van directos a business_intelligence
+        workflow.add_edge("researcher", "business_intelligence")
+    else:
+        workflow.add_conditional_edges("researcher", agent_should_continue)
     workflow.add_conditional_edges("business_intelligence", agent_should_continue)
     
     # Después de ejecutar tools, volver al agente que las llamó
     workflow.add_conditional_edges("tools", route_after_tools)
     
-    # Compilar con memoria persistente
-    return workflow.compile(checkpointer=memory)
+    # Compilar con memoria persistente (ver CHECKPOINT_BACKEND)
+    return workflow.compile(checkpointer=get_checkpointer("supervisor"))
+
+@lru_cache(maxsize=None)
+def get_supervisor_agent():
+    """Compila el grafo del supervisor la primera vez que se necesita."""
+    return create_supervisor_graph()
 
-supervisor_agent = create_supervisor_graph()
+def __getattr__(name):
+    # Compatibilidad: ``supervisor_agent`` se compila al primer acceso
+    if name == "supervisor_agent":
+        return get_supervisor_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
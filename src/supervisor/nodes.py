@@ -1,10 +1,29 @@
-from typing import Literal
+import asyncio
+import logging
+import time
+from typing import Literal, Optional
 from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from pydantic import BaseModel
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel, Field
 
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.core.metrics import registry
 from src.core.models import get_model
-from src.core.state import AgentState
+from src.core.state import AgentState, is_new_turn
+
+logger = get_logger(__name__)
+
+SPECULATION_OUTCOMES = registry.counter(
+    "supervisor_speculation_total",
+    "Resultado de la ejecución especulativa de business_intelligence (hit, miss, error).",
+    ["outcome"],
+)
+SPECULATION_SAVED_SECONDS = registry.histogram(
+    "supervisor_speculation_saved_seconds",
+    "Latencia ahorrada por turno cuando la especulación acierta.",
+)
 
 members = ["researcher", "business_intelligence"]
 options = ["FINISH"] + members
@@ -32,40 +51,86 @@ system_prompt = (
 class RouteResponse(BaseModel):
     next: Literal["researcher", "business_intelligence", "FINISH"]
 
-def supervisor_node(state: AgentState):
+
+class RouteWithQueryResponse(RouteResponse):
+    """Routing + consulta de búsqueda en una sola llamada (RESEARCHER_MODE=direct)."""
+    search_query: Optional[str] = Field(
+        default=None,
+        description="Consulta breve para web_search si next es 'researcher'",
+    )
+
+
+def _decision(result: RouteResponse) -> dict:
+    update = {"next": result.next}
+    if result.next == "researcher" and getattr(result, "search_query", None):
+        update["search_query"] = result.search_query
+    return update
+
+def _route_by_rules(state: AgentState):
+    """
+    Decisión sin LLM a partir de los contadores del turno.
+    
+    Returns:
+        (decisión o None si debe decidir el modelo, researcher_count, bi_count)
+    """
     messages = state.get("messages", [])
     
     # Si no hay mensajes, terminar
     if not messages:
-        print("[DEBUG] supervisor: No hay mensajes, terminando")
-        return {"next": "FINISH"}
-    
-    # Contar cuántas veces cada agente ya actuó (incluyendo mensajes vacíos pero con name)
-    researcher_count = sum(1 for msg in messages if hasattr(msg, "name") and msg.name == "researcher")
-    bi_count = sum(1 for msg in messages if hasattr(msg, "name") and msg.name == "business_intelligence")
+        logger.debug("supervisor: No hay mensajes, terminando")
+        return "FINISH", 0, 0
     
-    print(f"[DEBUG] supervisor: researcher_count={researcher_count}, bi_count={bi_count}, total_messages={len(messages)}")
+    # Contadores del turno actual, mantenidos por los nodos de cada agente
+    # (si el último mensaje es del usuario, nadie actuó aún en este turno)
+    turn_counts = {} if is_new_turn(state) else state.get("turn_counts") or {}
+    researcher_count = turn_counts.get("researcher", 0)
+    bi_count = turn_counts.get("business_intelligence", 0)
     
-    # Debug: mostrar los últimos 3 mensajes
-    for i, msg in enumerate(messages[-3:]):
-        msg_name = getattr(msg, "name", "sin-name")
-        msg_type = getattr(msg, "type", "sin-tipo")
-        msg_content = getattr(msg, "content", "")[:50] if hasattr(msg, "content") else ""
-        print(f"[DEBUG] supervisor: msg[-{3-i}]: type={msg_type}, name={msg_name}, content={msg_content}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "supervisor: conteo de agentes",
+            extra={
+                "researcher_count": researcher_count,
+                "bi_count": bi_count,
+                "total_messages": len(messages),
+            },
+        )
+        # Debug: mostrar los últimos 3 mensajes
+        for i, msg in enumerate(messages[-3:]):
+            logger.debug(
+                "supervisor: mensaje reciente",
+                extra={
+                    "position": -(3 - i),
+                    "msg_type": getattr(msg, "type", "sin-tipo"),
+                    "msg_name": getattr(msg, "name", "sin-name"),
+                    "content": str(getattr(msg, "content", ""))[:50],
+                },
+            )
     
     # Si BI ya actuó al menos una vez, terminar
     if bi_count >= 1:
-        print("[DEBUG] supervisor: Business intelligence ya actuó, terminando")
-        return {"next": "FINISH"}
+        logger.debug("supervisor: Business intelligence ya actuó, terminando")
+        return "FINISH", researcher_count, bi_count
     
     # Si researcher ya actuó al menos 2 veces, enviar a BI
     if researcher_count >= 2:
-        print("[DEBUG] supervisor: Researcher ya actuó 2+ veces, enviando a business_intelligence")
-        return {"next": "business_intelligence"}
+        logger.debug("supervisor: Researcher ya actuó 2+ veces, enviando a business_intelligence")
+        return "business_intelligence", researcher_count, bi_count
     
+    return None, researcher_count, bi_count
+
+
+def _routing_chain(researcher_count: int, bi_count: int):
+    schema, direct_instructions = RouteResponse, ""
+    if settings.RESEARCHER_MODE == "direct":
+        # La consulta se extrae aquí y el researcher busca sin llamar al modelo
+        schema = RouteWithQueryResponse
+        direct_instructions = (
+            "\nSi eliges 'researcher', escribe en search_query la consulta de búsqueda "
+            "(breve, con los términos clave de la pregunta)."
+        )
     # Si solo hay el mensaje del usuario (no hay agentes que hayan actuado)
     # Dejar que el modelo LLM decida, pero con el nuevo prompt que favorece BI por defecto
-    
     prompt = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
         MessagesPlaceholder(variable_name="messages"),
@@ -74,16 +139,84 @@ def supervisor_node(state: AgentState):
             "Dada la conversación anterior, ¿quién debería actuar a continuación? "
             "Selecciona uno de: {options}. "
             f"\nCONTEXTO: researcher actuó {researcher_count} veces, business_intelligence {bi_count} veces. "
-            "\nRECUERDA: business_intelligence es el agente PRINCIPAL para conversaciones generales.",
+            "\nRECUERDA: business_intelligence es el agente PRINCIPAL para conversaciones generales."
+            + direct_instructions,
         ),
     ]).partial(options=str(options), members=", ".join(members))
 
-    model = get_model()
-    supervisor_chain = prompt | model.with_structured_output(RouteResponse)
+    # La decisión no se muestra al cliente: sin streaming de tokens
+    model = get_model(disable_streaming=True)
+    return prompt | model.with_structured_output(schema)
+
+
+def supervisor_node(state: AgentState):
+    decision, researcher_count, bi_count = _route_by_rules(state)
+    if decision is not None:
+        return {"next": decision}
     
-    result = supervisor_chain.invoke(state)
-    print(f"[DEBUG] supervisor: Decisión del modelo: {result.next}")
-    return {"next": result.next}
+    result = _routing_chain(researcher_count, bi_count).invoke(state)
+    logger.debug("supervisor: Decisión del modelo", extra={"next": result.next})
+    return _decision(result)
+
+
+async def asupervisor_node(state: AgentState, config: RunnableConfig):
+    """
+    Versión async del supervisor.
+    
+    Con ``SPECULATIVE_BI`` activo, al inicio de cada turno lanza la llamada de
+    business_intelligence en paralelo con la decisión de routing. Si el
+    modelo elige BI, la respuesta ya calculada pasa al nodo de BI en
+    ``speculative_bi``; si no, la llamada se cancela.
+    """
+    decision, researcher_count, bi_count = _route_by_rules(state)
+    if decision is not None:
+        return {"next": decision}
+    
+    chain = _routing_chain(researcher_count, bi_count)
+    if not (settings.SPECULATIVE_BI and is_new_turn(state)):
+        result = await chain.ainvoke(state, config)
+        logger.debug("supervisor: Decisión del modelo", extra={"next": result.next})
+        return _decision(result)
+    
+    from src.agents.business_intelligence.nodes import generate_business_intelligence_response
+    
+    # La llamada especulativa se atribuye a business_intelligence en métricas y trazas
+    bi_config = {
+        **config,
+        "metadata": {**config.get("metadata", {}), "langgraph_node": "business_intelligence", "speculative": True},
+    }
+    started = time.perf_counter()
+    
+    async def speculate():
+        response = await generate_business_intelligence_response(state, bi_config)
+        return response, time.perf_counter() - started
+    
+    bi_task = asyncio.create_task(speculate())
+    try:
+        result = await chain.ainvoke(state, config)
+    except BaseException:
+        bi_task.cancel()
+        raise
+    routing_seconds = time.perf_counter() - started
+    logger.debug("supervisor: Decisión del modelo", extra={"next": result.next, "speculative": True})
+    
+    if result.next != "business_intelligence":
+        bi_task.cancel()
+        SPECULATION_OUTCOMES.inc(outcome="miss")
+        return _decision(result)
+    
+    try:
+        response, bi_seconds = await bi_task
+    except Exception as e:
+        # El nodo de BI hará la llamada normal
+        SPECULATION_OUTCOMES.inc(outcome="error")
+        logger.warning("supervisor: Falló la llamada especulativa de BI", extra={"error": str(e)})
+        return {"next": result.next}
+    
+    # Sin especular: routing + BI en serie; especulando: el máximo de ambos
+    SPECULATION_OUTCOMES.inc(outcome="hit")
+    SPECULATION_SAVED_SECONDS.observe(min(routing_seconds, bi_seconds))
+    return {"next": result.next, "speculative_bi": response}
 
 
 def agent_should_continue(state: AgentState) -> str:
@@ -95,31 +228,38 @@ def agent_should_continue(state: AgentState) -> str:
     """
     messages = state.get("messages", [])
     if not messages:
-        print("[DEBUG] agent_should_continue: No hay mensajes, volviendo a supervisor")
+        logger.debug("agent_should_continue: No hay mensajes, volviendo a supervisor")
         return "supervisor"
     
     last_message = messages[-1]
     
-    # Debug: imprimir información del último mensaje
-    print(f"[DEBUG] agent_should_continue - Último mensaje:")
-    print(f"  - Tipo: {getattr(last_message, 'type', 'sin tipo')}")
-    print(f"  - Tiene tool_calls: {hasattr(last_message, 'tool_calls')}")
-    if hasattr(last_message, 'tool_calls'):
-        print(f"  - tool_calls: {last_message.tool_calls}")
-        print(f"  - Cantidad de tool_calls: {len(last_message.tool_calls) if last_message.tool_calls else 0}")
+    # Debug: información del último mensaje
+    if logger.isEnabledFor(logging.DEBUG):
+        tool_calls = getattr(last_message, "tool_calls", None) or []
+        logger.debug(
+            "agent_should_continue: último mensaje",
+            extra={
+                "msg_type": getattr(last_message, "type", "sin tipo"),
+                "tool_calls": tool_calls,
+                "tool_call_count": len(tool_calls),
+            },
+        )
     
     # Si el último mensaje tiene tool_calls, ejecutar tools
     if hasattr(last_message, "tool_calls") and last_message.tool_calls:
-        print(f"[DEBUG] agent_should_continue: Detectados {len(last_message.tool_calls)} tool_calls, yendo a 'tools'")
+        logger.debug(
+            "agent_should_continue: Detectados tool_calls, yendo a 'tools'",
+            extra={"tool_call_count": len(last_message.tool_calls)},
+        )
         return "tools"
     
     # Si el último mensaje es ToolMessage, volver al supervisor
     if hasattr(last_message, "type") and last_message.type == "tool":
-        print("[DEBUG] agent_should_continue: Último mensaje es ToolMessage, volviendo a supervisor")
+        logger.debug("agent_should_continue: Último mensaje es ToolMessage, volviendo a supervisor")
         return "supervisor"
     
     # Por defecto, volver al supervisor
-    print("[DEBUG] agent_should_continue: Sin tool_calls, volviendo a supervisor")
+    logger.debug("agent_should_continue: Sin tool_calls, volviendo a supervisor")
     return "supervisor"
 
 
@@ -127,37 +267,16 @@ def route_after_tools(state: AgentState) -> str:
     """
     Determina a qué agente volver después de ejecutar tools.
     
-    Busca el último AI message con tool_calls para identificar
-    qué agente inició la llamada a tools usando el campo 'name'.
+    Los agentes registran en ``active_agent`` su nombre al pedir tools.
     
     Returns:
-        El nombre del agente que hizo la llamada a tools, o "supervisor" si no se puede determinar
+        El nombre del agente que hizo la llamada a tools, o "researcher" si no se puede determinar
     """
-    messages = state.get("messages", [])
+    agent_name = state.get("active_agent")
+    if agent_name in members:
+        logger.debug("route_after_tools: Retornando agente", extra={"agent": agent_name})
+        return agent_name
     
-    print(f"[DEBUG] route_after_tools: Buscando agente que llamó tools entre {len(messages)} mensajes")
-    
-    # Buscar hacia atrás el último mensaje AI con tool_calls
-    for i, msg in enumerate(reversed(messages)):
-        if (
-            hasattr(msg, "type") 
-            and msg.type == "ai" 
-            and hasattr(msg, "tool_calls") 
-            and msg.tool_calls
-        ):
-            # Verificar si el mensaje tiene metadata 'name' para identificar el agente
-            if hasattr(msg, "name") and msg.name:
-                agent_name = msg.name
-                print(f"[DEBUG] route_after_tools: Encontrado mensaje con name='{agent_name}' en posición -{i}")
-                # Validar que el agente existe en nuestra lista
-                if agent_name in members:
-                    print(f"[DEBUG] route_after_tools: Retornando agente '{agent_name}'")
-                    return agent_name
-            
-            # Si no tiene nombre, asumir que es researcher (compatibilidad)
-            print(f"[DEBUG] route_after_tools: Mensaje sin 'name', asumiendo researcher")
-            return "researcher"
-    
-    # Si no se encuentra, volver al supervisor
-    print("[DEBUG] route_after_tools: No se encontró mensaje con tool_calls, volviendo a supervisor")
-    return "supervisor"
+    # Sin agente registrado (checkpoints antiguos), asumir researcher (compatibilidad)
+    logger.debug("route_after_tools: Sin active_agent, asumiendo researcher")
+    return "researcher"
@@ -0,0 +1,53 @@
+from typing import List
+
+from langchain_core.documents import Document
+from langchain_core.tools import tool
+
+from src.core.logger import get_logger
+from src.core.metrics import TOOL_ERRORS, TOOL_SECONDS
+from src.core.tenants import current_namespace
+
+logger = get_logger(__name__)
+
+# Caracteres de cada chunk incluidos en el resultado de la tool
+_SNIPPET_CHARS = 800
+
+NO_INTERNAL_RESULTS = "No se encontraron documentos internos relevantes."
+
+
+@tool
+def internal_search(query: str) -> str:
+    """Busca en los documentos internos de la empresa (informes, manuales, KPIs y archivos subidos). Úsala antes que web_search para datos propios de la empresa.
+
+    Args:
+        query: Palabras clave o pregunta (ej: "margen bruto 2024", "política de devoluciones")
+
+    Returns:
+        Fragmentos de documentos internos con su fuente
+    """
+    with TOOL_SECONDS.time(tool="internal_search"):
+        try:
+            return format_documents(search_documents(query))
+        except Exception as e:
+            TOOL_ERRORS.inc(tool="internal_search")
+            logger.error("internal_search: Error al buscar", extra={"query": query, "error": str(e)})
+            return f"Error al buscar en documentos internos: {str(e)}. Usa web_search si la información es pública."
+
+
+def search_documents(query: str, require_keyword_match: bool = False) -> List[Document]:
+    """Busca en los documentos del tenant de la petición en curso (``tenant_scope``)."""
+    from src.core.retrieval import get_retriever
+
+    namespace = current_namespace()
+    docs = get_retriever().search(query, require_keyword_match=require_keyword_match, namespace=namespace)
+    logger.debug("internal_search llamada", extra={"query": query, "tenant": namespace, "result_count": len(docs)})
+    return docs
+
+
+def format_documents(docs: List[Document]) -> str:
+    if not docs:
+        return NO_INTERNAL_RESULTS
+    return "\n\n".join(
+        f"{i}. [{doc.metadata.get('source', 'documento')}]\n{doc.page_content[:_SNIPPET_CHARS]}"
+        for i, doc in enumerate(docs, 1)
+    )
@@ -1,17 +1,35 @@
+from functools import lru_cache
 from langchain_core.tools import tool
 import os
 
-# Configurar el wrapper de DuckDuckGo (no requiere API key)
-search_wrapper = None
-try:
-    from duckduckgo_search import DDGS
-    search_wrapper = DDGS()
-    print("[INFO] DuckDuckGo search inicializado correctamente")
-except ImportError as e:
-    print(f"[WARNING] No se pudo importar duckduckgo_search: {e}")
-    print("[WARNING] Las búsquedas usarán datos mock. Instale: poetry add duckduckgo-search")
-except Exception as e:
-    print(f"[WARNING] Error al inicializar DuckDuckGo: {e}")
+from src.core.config import settings
+from src.core.logger import get_logger
+from src.core.metrics import TOOL_ERRORS, TOOL_SECONDS
+from src.tools.retrieval import internal_search
+
+logger = get_logger(__name__)
+
+@lru_cache(maxsize=None)
+def get_search_wrapper():
+    """
+    Wrapper de DuckDuckGo (no requiere API key), creado en la primera búsqueda.
+    
+    Retorna None si duckduckgo_search no está disponible.
+    """
+    try:
+        from duckduckgo_search import DDGS
+        search_wrapper = DDGS()
+        logger.info("DuckDuckGo search inicializado correctamente")
+        return search_wrapper
+    except ImportError as e:
+        logger.warning(
+            "No se pudo importar duckduckgo_search; las búsquedas usarán datos mock. "
+            "Instale: poetry add duckduckgo-search",
+            extra={"error": str(e)},
+        )
+    except Exception as e:
+        logger.warning("Error al inicializar DuckDuckGo", extra={"error": str(e)})
+    return None
 
 @tool
 def web_search(query: str) -> str:
@@ -23,11 +41,16 @@ def web_search(query: str) -> str:
     Returns:
         Resultados de búsqueda relevantes de internet
     """
-    print(f"[DEBUG] web_search llamada con query: '{query}'")
+    with TOOL_SECONDS.time(tool="web_search"):
+        return _run_search(query)
+
+
+def _run_search(query: str) -> str:
+    logger.debug("web_search llamada", extra={"query": query})
     
-    # Si DuckDuckGo no está disponible, usar datos mock
-    if search_wrapper is None:
-        print("[DEBUG] web_search: Usando datos mock (DuckDuckGo no disponible)")
+    # Si DuckDuckGo no está disponible (y no hay API configurada), usar datos mock
+    if not settings.SEARCH_API_URL and get_search_wrapper() is None:
+        logger.debug("web_search: Usando datos mock (DuckDuckGo no disponible)")
         if "apple" in query.lower() or "aapl" in query.lower():
             return "Precio aproximado de Apple (AAPL): $180.50 USD. Nota: Esta es información de ejemplo. Para datos en tiempo real, configure DuckDuckGoSearch."
         if "sf" in query.lower() or "san francisco" in query.lower():
@@ -35,8 +58,7 @@ def web_search(query: str) -> str:
         return f"Resultado de búsqueda genérico para '{query}': 25 grados y sol. Nota: Configure DuckDuckGoSearch para búsquedas reales."
     
     try:
-        # Realizar búsqueda real usando la API directa de duckduckgo_search
-        results = search_wrapper.text(query, max_results=5)
+        results = _fetch_results(query)
         
         # Formatear resultados
         if results:
@@ -47,14 +69,34 @@ def web_search(query: str) -> str:
                 formatted_results.append(f"{i}. {title}\n{body}")
             
             final_text = "\n\n".join(formatted_results)
-            print(f"[DEBUG] web_search: Resultados obtenidos ({len(results)} resultados)")
+            logger.debug("web_search: Resultados obtenidos", extra={"result_count": len(results)})
             return final_text
         else:
             return "No se encontraron resultados para la búsqueda."
             
     except Exception as e:
-        print(f"[ERROR] web_search: Error al buscar: {e}")
+        TOOL_ERRORS.inc(tool="web_search")
+        logger.error("web_search: Error al buscar", extra={"query": query, "error": str(e)})
         return f"Error al realizar la búsqueda: {str(e)}. Por favor, intenta con otra consulta."
 
-# Lista de herramientas disponibles globalmente
-global_tools = [web_search]
+def _fetch_results(query: str) -> list:
+    """
+    Obtiene resultados ``[{"title", "body"}]``.
+    
+    Si ``SEARCH_API_URL`` está configurada se consulta ese endpoint HTTP
+    (ej. el stub de benchmarks); si no, la API directa de duckduckgo_search.
+    """
+    if settings.SEARCH_API_URL:
+        import httpx
+
+        response = httpx.get(
+            settings.SEARCH_API_URL,
+            params={"q": query, "max_results": 5},
+            timeout=10,
+        )
+        response.raise_for_status()
+        return response.json()
+    return get_search_wrapper().text(query, max_results=5)
+
+# Lista de herramientas disponibles globalmente (documentos internos antes que la web)
+global_tools = [internal_search, web_search]
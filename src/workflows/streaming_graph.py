@@ -1,13 +1,15 @@
+from functools import lru_cache
 
 from langgraph.graph import StateGraph, START, END
 from src.agents.video_analysis import AgentState, analyze_video, decide_action, execute_action
+from src.core.metrics import instrument_node
 
 def create_streaming_graph():
     workflow = StateGraph(AgentState)
     
-    workflow.add_node("analyze", analyze_video)
-    workflow.add_node("decide", decide_action)
-    workflow.add_node("act", execute_action)
+    workflow.add_node("analyze", instrument_node("video", "analyze", analyze_video))
+    workflow.add_node("decide", instrument_node("video", "decide", decide_action))
+    workflow.add_node("act", instrument_node("video", "act", execute_action))
     
     workflow.add_edge(START, "analyze")
     workflow.add_edge("analyze", "decide")
@@ -16,4 +18,13 @@ def create_streaming_graph():
     
     return workflow.compile()
 
-streaming_graph = create_streaming_graph()
+@lru_cache(maxsize=None)
+def get_streaming_graph():
+    """Compiles the video analysis graph on first use."""
+    return create_streaming_graph()
+
+def __getattr__(name):
+    # Backwards compatibility: ``streaming_graph`` is compiled on first access
+    if name == "streaming_graph":
+        return get_streaming_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")